@@ -0,0 +1,42 @@
+"""expire idempotency keys
+
+Revision ID: a3c9e1f70b52
+Revises: f2b6c8d14e39
+Create Date: 2026-02-04 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e1f70b52"
+down_revision: Union[str, Sequence[str], None] = "f2b6c8d14e39"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "idempotency_keys",
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # Existing rows get the default BACKEND_IDEMPOTENCY_TTL; most are already
+    # past it and are removed by the purge job in chunks.
+    op.execute(
+        "UPDATE idempotency_keys "
+        "SET expires_at = COALESCE(completed_at, created_at, now()) + interval '3600 seconds'"
+    )
+    op.create_index(
+        "ix_idempotency_keys_expires_at",
+        "idempotency_keys",
+        ["expires_at"],
+        postgresql_where=sa.text("expires_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_column("idempotency_keys", "expires_at")
@@ -0,0 +1,58 @@
+"""add achievement recalculation shard leases
+
+Revision ID: a7c4e2b19d31
+Revises: 7d9b2ae1f8c4
+Create Date: 2026-01-12 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c4e2b19d31"
+down_revision: Union[str, Sequence[str], None] = "7d9b2ae1f8c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "achievement_recalc_shards",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("range_start", sa.Integer(), nullable=False),
+        sa.Column("range_end", sa.Integer(), nullable=False),
+        sa.Column("owner", sa.String(length=255), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "next_run_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("last_started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_duration_ms", sa.Integer(), nullable=True),
+        sa.Column("last_user_count", sa.Integer(), nullable=True),
+        sa.Column("last_granted_count", sa.Integer(), nullable=True),
+        sa.Column("last_owner", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("range_start"),
+    )
+    op.create_index(
+        "ix_achievement_recalc_shards_next_run_at",
+        "achievement_recalc_shards",
+        ["next_run_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_achievement_recalc_shards_next_run_at",
+        table_name="achievement_recalc_shards",
+    )
+    op.drop_table("achievement_recalc_shards")
@@ -0,0 +1,31 @@
+"""index pending invoices by expires_at for the expiry sweeper
+
+Revision ID: b3d8f5a27c61
+Revises: a9c2e7f41d58
+Create Date: 2026-02-16 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d8f5a27c61"
+down_revision: Union[str, Sequence[str], None] = "a9c2e7f41d58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_invoices_pending_expires_at",
+        "invoices",
+        ["expires_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_invoices_pending_expires_at", table_name="invoices")
@@ -0,0 +1,78 @@
+"""turn roblox_sync_events into an outbox
+
+Revision ID: b7d4f2a96c13
+Revises: a3c9e1f70b52
+Create Date: 2026-02-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d4f2a96c13"
+down_revision: Union[str, Sequence[str], None] = "a3c9e1f70b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "roblox_sync_events",
+        sa.Column("status", sa.String(length=32), nullable=False, server_default="pending"),
+    )
+    op.add_column(
+        "roblox_sync_events",
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "roblox_sync_events",
+        sa.Column(
+            "available_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.add_column("roblox_sync_events", sa.Column("last_error", sa.Text(), nullable=True))
+    op.add_column(
+        "roblox_sync_events",
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()
+        ),
+    )
+    op.add_column(
+        "roblox_sync_events",
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # Rows written before the dispatcher existed were never meant to be sent;
+    # they age out through compaction instead of flooding Roblox on deploy.
+    op.execute(
+        "UPDATE roblox_sync_events SET status = 'discarded', updated_at = created_at"
+    )
+    op.create_index(
+        "ix_roblox_sync_events_due",
+        "roblox_sync_events",
+        ["available_at"],
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+    op.create_index(
+        "uq_roblox_sync_events_pending_progress",
+        "roblox_sync_events",
+        ["roblox_user_id", "action"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending' AND action = 'progress'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_roblox_sync_events_pending_progress", table_name="roblox_sync_events")
+    op.drop_index("ix_roblox_sync_events_due", table_name="roblox_sync_events")
+    op.drop_column("roblox_sync_events", "delivered_at")
+    op.drop_column("roblox_sync_events", "updated_at")
+    op.drop_column("roblox_sync_events", "last_error")
+    op.drop_column("roblox_sync_events", "available_at")
+    op.drop_column("roblox_sync_events", "attempts")
+    op.drop_column("roblox_sync_events", "status")
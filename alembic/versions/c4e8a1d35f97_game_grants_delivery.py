@@ -0,0 +1,38 @@
+"""track delivery of game grants
+
+Revision ID: c4e8a1d35f97
+Revises: b7d4f2a96c13
+Create Date: 2026-02-08 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8a1d35f97"
+down_revision: Union[str, Sequence[str], None] = "b7d4f2a96c13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "game_grants",
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # Grants recorded so far were applied by the server that requested them.
+    op.execute("UPDATE game_grants SET delivered_at = COALESCE(created_at, now())")
+    op.create_index(
+        "ix_game_grants_undelivered",
+        "game_grants",
+        ["roblox_user_id", "id"],
+        postgresql_where=sa.text("delivered_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_game_grants_undelivered", table_name="game_grants")
+    op.drop_column("game_grants", "delivered_at")
@@ -0,0 +1,75 @@
+"""add scheduled achievement checks
+
+Revision ID: c5d2a8e4f613
+Revises: b3e91f0c5a27
+Create Date: 2026-01-26 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d2a8e4f613"
+down_revision: Union[str, Sequence[str], None] = "b3e91f0c5a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Pending phrase streaks are no longer caught by the periodic full scan, so
+# seed timers for users whose current profile text already contains a phrase.
+_BACKFILL_PHRASE_CHECKS = """
+INSERT INTO scheduled_achievement_checks (user_id, achievement_id, due_at)
+SELECT u.id,
+       a.id,
+       u.about_text_updated_at + make_interval(hours => COALESCE(a.condition_threshold, 0))
+FROM users AS u
+JOIN achievements AS a
+  ON a.condition_type = 'profile_phrase_streak'
+ AND a.manual_grant_only IS FALSE
+ AND btrim(COALESCE(a.metadata ->> 'phrase', '')) <> ''
+WHERE u.about_text_updated_at IS NOT NULL
+  AND strpos(lower(u.about_text), lower(btrim(a.metadata ->> 'phrase'))) > 0
+  AND NOT EXISTS (
+      SELECT 1
+      FROM user_achievements AS ua
+      WHERE ua.user_id = u.id AND ua.achievement_id = a.id
+  )
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduled_achievement_checks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("achievement_id", sa.Integer(), nullable=False),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["achievement_id"], ["achievements.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id",
+            "achievement_id",
+            name="uq_scheduled_achievement_checks_user_achievement",
+        ),
+    )
+    op.create_index(
+        "ix_scheduled_achievement_checks_due_at",
+        "scheduled_achievement_checks",
+        ["due_at"],
+        unique=False,
+    )
+    op.execute(_BACKFILL_PHRASE_CHECKS)
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_scheduled_achievement_checks_due_at",
+        table_name="scheduled_achievement_checks",
+    )
+    op.drop_table("scheduled_achievement_checks")
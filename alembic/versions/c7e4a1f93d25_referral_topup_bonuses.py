@@ -0,0 +1,80 @@
+"""move referral top-up bonus records to referral_topup_bonuses
+
+Revision ID: c7e4a1f93d25
+Revises: b3d8f5a27c61
+Create Date: 2026-02-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c7e4a1f93d25"
+down_revision: Union[str, Sequence[str], None] = "b3d8f5a27c61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_BACKFILL = """
+INSERT INTO referral_topup_bonuses (
+    source_kind, source_id, referral_id, referrer_id, referred_user_id,
+    credited_amount, bonus_amount, percent, granted_at
+)
+SELECT
+    record->>'kind',
+    (record->>'id')::integer,
+    referrals.id,
+    (record->>'referrer_id')::integer,
+    (record->>'referred_user_id')::integer,
+    COALESCE((record->>'credited_amount')::integer, 0),
+    COALESCE((record->>'bonus_amount')::integer, 0),
+    COALESCE((record->>'percent')::integer, 0),
+    COALESCE((record->>'granted_at')::timestamptz, now())
+FROM {table}
+CROSS JOIN LATERAL jsonb_array_elements({table}.metadata->'referral_bonus_topups') AS record
+JOIN referrals
+  ON referrals.referrer_id = (record->>'referrer_id')::integer
+ AND referrals.referred_id = (record->>'referred_user_id')::integer
+WHERE jsonb_typeof({table}.metadata->'referral_bonus_topups') = 'array'
+ON CONFLICT (source_kind, source_id) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "referral_topup_bonuses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("source_kind", sa.String(length=16), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("referral_id", sa.Integer(), sa.ForeignKey("referrals.id"), nullable=False),
+        sa.Column("referrer_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("referred_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("credited_amount", sa.Integer(), nullable=False),
+        sa.Column("bonus_amount", sa.Integer(), nullable=False),
+        sa.Column("percent", sa.Integer(), nullable=False),
+        sa.Column(
+            "granted_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.UniqueConstraint(
+            "source_kind", "source_id", name="uq_referral_topup_bonuses_source"
+        ),
+    )
+    op.create_index(
+        "ix_referral_topup_bonuses_referrer_id", "referral_topup_bonuses", ["referrer_id"]
+    )
+
+    # Bonuses granted before this revision are only recorded in the JSON list on
+    # the invoice or payment; copy them so a replayed webhook cannot grant again.
+    for table in ("payments", "invoices"):
+        op.execute(_BACKFILL.format(table=table))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_referral_topup_bonuses_referrer_id", table_name="referral_topup_bonuses")
+    op.drop_table("referral_topup_bonuses")
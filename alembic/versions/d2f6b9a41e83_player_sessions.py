@@ -0,0 +1,33 @@
+"""track live player sessions from server heartbeats
+
+Revision ID: d2f6b9a41e83
+Revises: c4e8a1d35f97
+Create Date: 2026-02-10 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f6b9a41e83"
+down_revision: Union[str, Sequence[str], None] = "c4e8a1d35f97"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "player_sessions",
+        sa.Column("roblox_user_id", sa.String(length=255), primary_key=True),
+        sa.Column("job_id", sa.String(length=64), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_seen_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("minutes", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("player_sessions")
@@ -0,0 +1,65 @@
+"""add player playtime
+
+Revision ID: d4e7b2c91a08
+Revises: c5d2a8e4f613
+Create Date: 2026-01-28 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e7b2c91a08"
+down_revision: Union[str, Sequence[str], None] = "c5d2a8e4f613"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Seed the table from the latest progress snapshot per player, using the first
+# numeric playtime key in the same order as PLAYTIME_PROGRESS_KEYS.
+_BACKFILL_PLAYTIME = """
+INSERT INTO player_playtime (roblox_user_id, minutes, source, updated_at)
+SELECT roblox_user_id, minutes, 'progress_push', updated_at
+FROM (
+    SELECT DISTINCT ON (gp.roblox_user_id)
+           gp.roblox_user_id,
+           GREATEST(trunc(playtime.value::text::numeric), 0)::integer AS minutes,
+           COALESCE(gp.updated_at, now()) AS updated_at
+    FROM game_progress AS gp
+    CROSS JOIN LATERAL (
+        SELECT gp.progress -> k.key AS value
+        FROM unnest(ARRAY[
+            'time_in_game', 'timeInGame', 'play_time',
+            'playTime', 'playtime', 'minutes_played'
+        ]) WITH ORDINALITY AS k(key, position)
+        WHERE jsonb_typeof(gp.progress -> k.key) = 'number'
+        ORDER BY k.position
+        LIMIT 1
+    ) AS playtime
+    ORDER BY gp.roblox_user_id, gp.updated_at DESC NULLS LAST, gp.id DESC
+) AS latest
+ON CONFLICT (roblox_user_id) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "player_playtime",
+        sa.Column("roblox_user_id", sa.String(length=255), nullable=False),
+        sa.Column("minutes", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("source", sa.String(length=32), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("roblox_user_id"),
+    )
+    op.create_index(
+        "ix_player_playtime_minutes", "player_playtime", ["minutes"], unique=False
+    )
+    op.execute(_BACKFILL_PLAYTIME)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_player_playtime_minutes", table_name="player_playtime")
+    op.drop_table("player_playtime")
@@ -0,0 +1,71 @@
+"""add sold_count and per-user purchase counters for limited products
+
+Revision ID: d4f9b2c86e13
+Revises: c7e4a1f93d25
+Create Date: 2026-02-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4f9b2c86e13"
+down_revision: Union[str, Sequence[str], None] = "c7e4a1f93d25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "products",
+        sa.Column("sold_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "user_product_purchases",
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "product_id",
+            sa.Integer(),
+            sa.ForeignKey("products.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    # Counters are only maintained for products that have the matching limit.
+    op.execute(
+        """
+        UPDATE products
+        SET sold_count = sold.quantity
+        FROM (
+            SELECT product_id, SUM(quantity) AS quantity
+            FROM purchases
+            WHERE status != 'cancelled'
+            GROUP BY product_id
+        ) AS sold
+        WHERE sold.product_id = products.id AND products.stock_limit IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_product_purchases (user_id, product_id, count)
+        SELECT purchases.user_id, purchases.product_id, COUNT(*)
+        FROM purchases
+        JOIN products ON products.id = purchases.product_id
+        WHERE purchases.status != 'cancelled' AND products.per_user_limit IS NOT NULL
+        GROUP BY purchases.user_id, purchases.product_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_product_purchases")
+    op.drop_column("products", "sold_count")
@@ -0,0 +1,51 @@
+"""forbid negative nuts balances
+
+Revision ID: e5a7c3d92b16
+Revises: d2f6b9a41e83
+Create Date: 2026-02-12 00:00:00.000000
+
+If some users already have a negative balance the constraint is left
+NOT VALID: it still rejects new negative balances, and the offending users are
+logged. Correct those balances, then validate it by hand:
+
+    ALTER TABLE users VALIDATE CONSTRAINT ck_users_nuts_balance_non_negative;
+"""
+import logging
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a7c3d92b16"
+down_revision: Union[str, Sequence[str], None] = "d2f6b9a41e83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade() -> None:
+    # NOT VALID skips the full-table check under an exclusive lock; the
+    # separate VALIDATE only blocks schema changes while it scans.
+    op.execute(
+        "ALTER TABLE users ADD CONSTRAINT ck_users_nuts_balance_non_negative "
+        "CHECK (nuts_balance >= 0) NOT VALID"
+    )
+    if not context.is_offline_mode():
+        negative = op.get_bind().execute(
+            sa.text("SELECT id, nuts_balance FROM users WHERE nuts_balance < 0 ORDER BY id")
+        ).all()
+        if negative:
+            logger.warning(
+                "Leaving ck_users_nuts_balance_non_negative NOT VALID; "
+                "users with a negative nuts balance (id, balance): %s",
+                ", ".join(f"({user_id}, {balance})" for user_id, balance in negative),
+            )
+            return
+    op.execute("ALTER TABLE users VALIDATE CONSTRAINT ck_users_nuts_balance_non_negative")
+
+
+def downgrade() -> None:
+    op.drop_constraint("ck_users_nuts_balance_non_negative", "users", type_="check")
@@ -0,0 +1,54 @@
+"""unique game progress per roblox user
+
+Revision ID: e8a3f5d27b16
+Revises: d4e7b2c91a08
+Create Date: 2026-01-30 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8a3f5d27b16"
+down_revision: Union[str, Sequence[str], None] = "d4e7b2c91a08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Keep the newest snapshot per player: highest version, then latest update.
+_DEDUPE_GAME_PROGRESS = """
+DELETE FROM game_progress AS gp
+USING (
+    SELECT id,
+           row_number() OVER (
+               PARTITION BY roblox_user_id
+               ORDER BY version DESC, updated_at DESC NULLS LAST, id DESC
+           ) AS position
+    FROM game_progress
+) AS ranked
+WHERE gp.id = ranked.id
+  AND ranked.position > 1
+"""
+
+
+def upgrade() -> None:
+    op.execute(_DEDUPE_GAME_PROGRESS)
+    op.drop_index("ix_game_progress_roblox_user_id", table_name="game_progress")
+    op.create_index(
+        "ix_game_progress_roblox_user_id",
+        "game_progress",
+        ["roblox_user_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_game_progress_roblox_user_id", table_name="game_progress")
+    op.create_index(
+        "ix_game_progress_roblox_user_id",
+        "game_progress",
+        ["roblox_user_id"],
+        unique=False,
+    )
@@ -0,0 +1,75 @@
+"""add jsonb_merge_patch function
+
+Revision ID: f2b6c8d14e39
+Revises: e8a3f5d27b16
+Create Date: 2026-02-02 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b6c8d14e39"
+down_revision: Union[str, Sequence[str], None] = "e8a3f5d27b16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# RFC 7396 merge patch. Flat patches (no nested objects) take the operator
+# path: drop keys patched to null, then concatenate the remaining values.
+_CREATE_MERGE_PATCH = """
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+    IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+        target := '{}'::jsonb;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM jsonb_each(patch) AS p WHERE jsonb_typeof(p.value) = 'object'
+    ) THEN
+        RETURN (
+            target - ARRAY(
+                SELECT p.key FROM jsonb_each(patch) AS p WHERE jsonb_typeof(p.value) = 'null'
+            )
+        ) || COALESCE(
+            (
+                SELECT jsonb_object_agg(p.key, p.value)
+                FROM jsonb_each(patch) AS p
+                WHERE jsonb_typeof(p.value) <> 'null'
+            ),
+            '{}'::jsonb
+        );
+    END IF;
+
+    RETURN (
+        SELECT COALESCE(jsonb_object_agg(merged.key, merged.value), '{}'::jsonb)
+        FROM (
+            SELECT t.key, t.value
+            FROM jsonb_each(target) AS t
+            WHERE NOT patch ? t.key
+            UNION ALL
+            SELECT p.key, jsonb_merge_patch(target -> p.key, p.value)
+            FROM jsonb_each(patch) AS p
+            WHERE jsonb_typeof(p.value) <> 'null'
+        ) AS merged
+    );
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.execute(_CREATE_MERGE_PATCH)
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS jsonb_merge_patch(jsonb, jsonb)")
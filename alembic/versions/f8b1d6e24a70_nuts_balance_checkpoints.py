@@ -0,0 +1,47 @@
+"""add nuts balance checkpoints for ledger reconciliation
+
+Revision ID: f8b1d6e24a70
+Revises: e5a7c3d92b16
+Create Date: 2026-02-14 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f8b1d6e24a70"
+down_revision: Union[str, Sequence[str], None] = "e5a7c3d92b16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "nuts_balance_checkpoints",
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("balance", sa.Integer(), nullable=False),
+        sa.Column("last_transaction_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("drift", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "checked_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index(
+        "ix_nuts_transactions_user_id_id", "nuts_transactions", ["user_id", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_nuts_transactions_user_id_id", table_name="nuts_transactions")
+    op.drop_table("nuts_balance_checkpoints")
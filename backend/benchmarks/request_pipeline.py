@@ -0,0 +1,191 @@
+"""Per-request overhead of the signed-endpoint request pipeline.
+
+Drives two minimal FastAPI apps through raw ASGI calls, so neither a socket
+nor an HTTP client is measured:
+
+* ``legacy`` — body parameter parsed by FastAPI, ``request.body()`` re-read
+  for a per-call ``hmac.new(secret.encode(), ...)`` and the default JSON
+  response class;
+* ``current`` — :func:`backend.security.signed_body` (one bounded read, copied
+  HMAC state, ``model_validate_json``) and ``ORJSONResponse``.
+
+Both endpoints accept a ``/game/progress/push-batch`` payload and echo a
+response of the same shape, so the difference is pure pipeline cost::
+
+    python -m backend.benchmarks.request_pipeline --records 100 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from hashlib import sha256
+from typing import Annotated, Any, Dict, List, Sequence
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from ..config import get_settings
+from ..routers.game import ProgressBatchPayload
+from ..security import signed_body
+
+
+@dataclass
+class PipelineResult:
+    pipeline: str
+    requests: int
+    body_bytes: int
+    mean_us: float
+    p50_us: float
+    p95_us: float
+
+
+def _response(payload: ProgressBatchPayload) -> Dict[str, Any]:
+    now = datetime.now(tz=timezone.utc)
+    records = [
+        {"roblox_user_id": record.roblox_user_id, "version": index + 1, "updated_at": now}
+        for index, record in enumerate(payload.records)
+    ]
+    return {"status": "ok", "count": len(records), "records": records, "stale": []}
+
+
+def build_legacy_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/push-batch", response_model=Dict[str, Any])
+    async def push_batch(payload: ProgressBatchPayload, request: Request) -> Dict[str, Any]:
+        signature = request.headers.get("X-Signature")
+        body = await request.body()
+        expected = hmac.new(get_settings().hmac_secret.encode(), body, sha256).hexdigest()
+        if not signature or not hmac.compare_digest(signature, expected):
+            raise HTTPException(status_code=401, detail="Invalid HMAC signature")
+        return _response(payload)
+
+    return app
+
+
+def build_current_app() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(default_response_class=ORJSONResponse)
+
+    @router.post("/push-batch", response_model=Dict[str, Any])
+    async def push_batch(
+        payload: Annotated[ProgressBatchPayload, Depends(signed_body(ProgressBatchPayload))],
+        request: Request,
+    ) -> Dict[str, Any]:
+        return _response(payload)
+
+    app.include_router(router)
+    return app
+
+
+def make_body(records: int) -> bytes:
+    return json.dumps(
+        {
+            "records": [
+                {
+                    "roblox_user_id": str(1_000_000 + index),
+                    "progress": {
+                        "coins": index * 10,
+                        "playtime": index * 3,
+                        "inventory": [f"item-{slot}" for slot in range(8)],
+                        "stats": {"wins": index, "losses": index // 2},
+                    },
+                    "version": index + 2,
+                }
+                for index in range(records)
+            ]
+        }
+    ).encode()
+
+
+async def _call(app: FastAPI, body: bytes, headers: List[tuple[bytes, bytes]]) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/push-batch",
+        "raw_path": b"/push-batch",
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    sent = False
+    status_code = 0
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def measure(name: str, app: FastAPI, body: bytes, requests: int) -> PipelineResult:
+    signature = hmac.new(get_settings().hmac_secret.encode(), body, sha256).hexdigest()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"x-signature", signature.encode()),
+    ]
+    status_code = await _call(app, body, headers)
+    if status_code != 200:
+        raise RuntimeError(f"{name} pipeline answered HTTP {status_code}")
+
+    samples: List[float] = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await _call(app, body, headers)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    return PipelineResult(
+        pipeline=name,
+        requests=requests,
+        body_bytes=len(body),
+        mean_us=round(statistics.fmean(samples), 1),
+        p50_us=round(samples[len(samples) // 2], 1),
+        p95_us=round(samples[int(len(samples) * 0.95) - 1], 1),
+    )
+
+
+async def run_benchmark(*, records: int, requests: int) -> List[PipelineResult]:
+    body = make_body(records)
+    return [
+        await measure("legacy", build_legacy_app(), body, requests),
+        await measure("current", build_current_app(), body, requests),
+    ]
+
+
+def _parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    results = asyncio.run(run_benchmark(records=args.records, requests=args.requests))
+    print(json.dumps([asdict(result) for result in results], indent=2))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark entry point
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+"""Fake Wallet Pay store API and an invoice-creation throughput benchmark.
+
+The fake server implements ``POST /wpay/store-api/v1/orders`` with a
+configurable latency, share of 503 responses and share of 429 responses, and
+answers repeated ``orderId`` values with the invoice it created first, like
+the real API. ``GET /stats`` reports how many requests and distinct client
+connections it has seen, which shows whether keep-alive is doing its job.
+
+Benchmark the pooled client against the fake server started in-process, or
+compare it with the previous thread-per-request ``requests`` client::
+
+    python -m backend.benchmarks.wallet_pay --invoices 2000 --concurrency 64
+    python -m backend.benchmarks.wallet_pay --client threaded --concurrency 64
+    python -m backend.benchmarks.wallet_pay --error-rate 0.05 --throttle-rate 0.02
+
+With ``--serve`` only the fake server runs, so a local bot can be pointed at it
+through ``WALLET_PAY_API_BASE=http://127.0.0.1:8090``::
+
+    python -m backend.benchmarks.wallet_pay --serve --port 8090
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bot.services.wallet import WalletPayClient, WalletPayError, close_wallet_client
+
+ORDERS_PATH = "/wpay/store-api/v1/orders"
+
+
+@dataclass
+class FakeWalletConfig:
+    latency: float = 0.02
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    seed: int = 1
+
+
+def create_fake_wallet_app(config: FakeWalletConfig | None = None) -> FastAPI:
+    """Return an ASGI app that behaves like the Wallet Pay order endpoint."""
+
+    config = config or FakeWalletConfig()
+    rng = random.Random(config.seed)
+    orders: Dict[str, Dict[str, Any]] = {}
+    responses: Counter[int] = Counter()
+    peers: set[Any] = set()
+    app = FastAPI()
+
+    @app.post(ORDERS_PATH)
+    async def create_order(request: Request) -> JSONResponse:
+        peers.add(request.scope.get("client"))
+        if not request.headers.get("X-API-KEY") or not request.headers.get("X-STORE-ID"):
+            responses[401] += 1
+            return JSONResponse({"status": "INVALID_API_KEY"}, status_code=401)
+
+        await asyncio.sleep(config.latency)
+        roll = rng.random()
+        if roll < config.throttle_rate:
+            responses[429] += 1
+            return JSONResponse(
+                {"status": "RATE_LIMITED"}, status_code=429, headers={"Retry-After": "1"}
+            )
+        if roll < config.throttle_rate + config.error_rate:
+            responses[503] += 1
+            return JSONResponse({"status": "INTERNAL_ERROR"}, status_code=503)
+
+        body = await request.json()
+        order_id = str(body.get("orderId") or "")
+        if not order_id:
+            responses[400] += 1
+            return JSONResponse({"status": "INVALID_REQUEST"}, status_code=400)
+        order = orders.get(order_id)
+        if order is None:
+            expires_at = datetime.now(tz=timezone.utc) + timedelta(
+                seconds=int(body.get("expiresIn") or 3600)
+            )
+            invoice_id = uuid.uuid4().hex
+            order = orders[order_id] = {
+                "invoiceId": invoice_id,
+                "orderId": order_id,
+                "status": "ACTIVE",
+                "amount": body.get("amount"),
+                "currencyCode": body.get("currencyCode"),
+                "payLink": f"https://t.me/wallet/start?startapp=wpay_order-orderId__{invoice_id}",
+                "expiresAt": expires_at.isoformat().replace("+00:00", "Z"),
+            }
+        responses[200] += 1
+        return JSONResponse({"status": "SUCCESS", "data": order, **order})
+
+    def snapshot() -> Dict[str, Any]:
+        return {
+            "requests": sum(responses.values()),
+            "responses": {str(code): count for code, count in sorted(responses.items())},
+            "orders": len(orders),
+            "connections": len(peers),
+        }
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return snapshot()
+
+    app.state.snapshot = snapshot
+    return app
+
+
+@dataclass
+class WalletBenchReport:
+    client: str
+    invoices: int
+    concurrency: int
+    created: int = 0
+    failed: int = 0
+    duration_seconds: float = 0.0
+    throughput_per_second: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    server: Dict[str, Any] = field(default_factory=dict)
+
+
+class _ThreadedClient:
+    """The previous client: a blocking ``requests.post`` per invoice in a thread."""
+
+    def __init__(self, api_base: str) -> None:
+        self._url = api_base + ORDERS_PATH
+
+    async def create_invoice(self, **kwargs: Any) -> None:
+        import requests
+
+        payload = {
+            "orderId": kwargs["external_invoice_id"],
+            "amount": str(kwargs["amount"]),
+            "currencyCode": kwargs["currency_code"],
+            "description": kwargs["description"],
+            "expiresIn": kwargs["expires_in"],
+            "customerTelegramUserId": kwargs["customer_telegram_id"],
+        }
+        headers = {"X-API-KEY": "bench", "X-STORE-ID": "bench"}
+
+        def send() -> None:
+            response = requests.post(self._url, json=payload, headers=headers, timeout=10)
+            if not response.ok:
+                raise WalletPayError(f"Wallet Pay responded with {response.status_code}")
+
+        await asyncio.to_thread(send)
+
+
+async def _start_server(app: FastAPI, port: int) -> tuple[uvicorn.Server, asyncio.Task, int]:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, bound_port
+
+
+async def run_benchmark(
+    *,
+    client: str,
+    invoices: int,
+    concurrency: int,
+    max_connections: int,
+    server_config: FakeWalletConfig,
+    port: int = 0,
+) -> WalletBenchReport:
+    app = create_fake_wallet_app(server_config)
+    server, server_task, bound_port = await _start_server(app, port)
+    api_base = f"http://127.0.0.1:{bound_port}"
+    if client == "threaded":
+        wallet: Any = _ThreadedClient(api_base)
+    else:
+        wallet = WalletPayClient(
+            api_base=api_base,
+            api_key="bench",
+            store_id="bench",
+            max_concurrency=max_connections,
+            backoff_seconds=0.05,
+        )
+
+    report = WalletBenchReport(client=client, invoices=invoices, concurrency=concurrency)
+    latencies: List[float] = []
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(invoices):
+        queue.put_nowait(index)
+
+    async def worker() -> None:
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                await wallet.create_invoice(
+                    external_invoice_id=f"bench-{index}",
+                    amount=Decimal("1.5"),
+                    currency_code="TON",
+                    description="Benchmark top-up",
+                    expires_in=3600,
+                    customer_telegram_id=100 + index,
+                )
+            except WalletPayError:
+                report.failed += 1
+            else:
+                report.created += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        report.duration_seconds = round(time.perf_counter() - started, 3)
+        report.server = app.state.snapshot()
+    finally:
+        await close_wallet_client()
+        server.should_exit = True
+        await server_task
+
+    report.throughput_per_second = round(invoices / report.duration_seconds, 1)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100)
+        report.latency_ms = {
+            "p50": round(cuts[49], 2),
+            "p95": round(cuts[94], 2),
+            "max": round(max(latencies), 2),
+        }
+    return report
+
+
+async def _serve(config: FakeWalletConfig, port: int) -> None:
+    server = uvicorn.Server(
+        uvicorn.Config(create_fake_wallet_app(config), host="127.0.0.1", port=port)
+    )
+    await server.serve()
+
+
+def _parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", action="store_true", help="only run the fake server")
+    parser.add_argument("--port", type=int, default=0, help="fake server port (0 picks one)")
+    parser.add_argument("--client", choices=("pooled", "threaded"), default="pooled")
+    parser.add_argument("--invoices", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-connections", type=int, default=8, help="pooled client limit")
+    parser.add_argument("--latency", type=float, default=FakeWalletConfig.latency)
+    parser.add_argument("--error-rate", type=float, default=FakeWalletConfig.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=FakeWalletConfig.throttle_rate)
+    parser.add_argument("--seed", type=int, default=FakeWalletConfig.seed)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    server_config = FakeWalletConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    if args.serve:
+        asyncio.run(_serve(server_config, args.port or 8090))
+        return 0
+
+    report = asyncio.run(
+        run_benchmark(
+            client=args.client,
+            invoices=args.invoices,
+            concurrency=args.concurrency,
+            max_connections=args.max_connections,
+            server_config=server_config,
+            port=args.port,
+        )
+    )
+    print(json.dumps(asdict(report), indent=2))
+    return 0
+
+
+__all__ = ["FakeWalletConfig", "create_fake_wallet_app", "run_benchmark"]
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark entry point
+    raise SystemExit(main())
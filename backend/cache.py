@@ -0,0 +1,32 @@
+"""Shared Redis connection for backend caches."""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from .config import get_settings
+
+_client: Any = None
+
+
+def get_redis() -> Optional[Any]:
+    """Return the process-wide Redis client, or ``None`` without ``REDIS_URL``."""
+
+    global _client
+    if _client is None:
+        url = get_settings().redis_url
+        if not url:
+            return None
+        from redis import asyncio as redis_asyncio
+
+        _client = redis_asyncio.from_url(url, decode_responses=True)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+__all__ = ["close_redis", "get_redis"]
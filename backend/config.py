@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+import socket
 from functools import lru_cache
 
 from bot.config import DATABASE_URL, get_env
@@ -10,21 +12,123 @@ class Settings:
 
     database_url: str = DATABASE_URL
     hmac_secret: str
+    max_request_body_bytes: int
     idempotency_ttl_seconds: int
+    idempotency_lock_seconds: int
+    idempotency_purge_interval_seconds: float
+    idempotency_purge_batch_size: int
     achievements_recalc_interval_seconds: int
+    achievements_recalc_shard_size: int
+    achievements_recalc_lease_seconds: int
+    instance_id: str
+    notifications_poll_interval_seconds: float
+    notifications_batch_size: int
+    notifications_max_attempts: int
     roblox_api_base_url: str
+    roblox_sync_path: str
+    roblox_open_cloud_api_key: str
+    roblox_sync_poll_interval_seconds: float
+    roblox_sync_batch_size: int
+    roblox_sync_max_attempts: int
+    roblox_sync_retention_hours: float
     telegram_payment_secret: str
     telegram_bot_token: str
+    grants_long_poll_max_seconds: float
+    grants_poll_interval_seconds: float
+    servers_heartbeat_ttl_seconds: float
+    ledger_reconcile_enabled: bool
+    ledger_reconcile_interval_seconds: float
+    ledger_reconcile_batch_size: int
+    payment_inbox_workers: int
+    payment_inbox_poll_interval_seconds: float
+    payment_inbox_batch_size: int
+    payment_inbox_max_attempts: int
+    invoice_expiry_interval_seconds: float
+    invoice_expiry_batch_size: int
+    invoice_expiry_grace_seconds: float
+    redis_url: str
+    progress_cache_ttl_seconds: float
+    progress_cache_tombstone_seconds: float
+    progress_cache_max_entries: int
+    progress_cache_local: bool
 
     def __init__(self) -> None:
         self.hmac_secret = get_env("BACKEND_HMAC_SECRET", required=True)
+        self.max_request_body_bytes = int(get_env("BACKEND_MAX_BODY_BYTES", "1048576"))
         self.idempotency_ttl_seconds = int(get_env("BACKEND_IDEMPOTENCY_TTL", "3600"))
+        self.idempotency_lock_seconds = int(get_env("BACKEND_IDEMPOTENCY_LOCK_SECONDS", "60"))
+        self.idempotency_purge_interval_seconds = float(
+            get_env("BACKEND_IDEMPOTENCY_PURGE_INTERVAL", "60")
+        )
+        self.idempotency_purge_batch_size = int(
+            get_env("BACKEND_IDEMPOTENCY_PURGE_BATCH_SIZE", "1000")
+        )
         self.achievements_recalc_interval_seconds = int(
             get_env("BACKEND_ACHIEVEMENTS_RECALC_INTERVAL", "300")
         )
+        self.achievements_recalc_shard_size = int(
+            get_env("BACKEND_ACHIEVEMENTS_SHARD_SIZE", "500")
+        )
+        self.achievements_recalc_lease_seconds = int(
+            get_env("BACKEND_ACHIEVEMENTS_LEASE_SECONDS", "60")
+        )
+        self.instance_id = get_env(
+            "BACKEND_INSTANCE_ID", f"{socket.gethostname()}:{os.getpid()}"
+        )
+        self.notifications_poll_interval_seconds = float(
+            get_env("BACKEND_NOTIFICATIONS_POLL_INTERVAL", "2")
+        )
+        self.notifications_batch_size = int(get_env("BACKEND_NOTIFICATIONS_BATCH_SIZE", "100"))
+        self.notifications_max_attempts = int(
+            get_env("BACKEND_NOTIFICATIONS_MAX_ATTEMPTS", "5")
+        )
         self.roblox_api_base_url = get_env("ROBLOX_API_BASE_URL", "")
+        self.roblox_sync_path = get_env("ROBLOX_SYNC_PATH", "")
+        self.roblox_open_cloud_api_key = get_env("ROBLOX_OPEN_CLOUD_API_KEY", "")
+        self.roblox_sync_poll_interval_seconds = float(
+            get_env("ROBLOX_SYNC_POLL_INTERVAL", "2")
+        )
+        self.roblox_sync_batch_size = int(get_env("ROBLOX_SYNC_BATCH_SIZE", "100"))
+        self.roblox_sync_max_attempts = int(get_env("ROBLOX_SYNC_MAX_ATTEMPTS", "8"))
+        self.roblox_sync_retention_hours = float(get_env("ROBLOX_SYNC_RETENTION_HOURS", "24"))
         self.telegram_payment_secret = get_env("TELEGRAM_PAYMENT_SECRET", "")
         self.telegram_bot_token = get_env("TELEGRAM_TOKEN", "")
+        self.grants_long_poll_max_seconds = float(get_env("BACKEND_GRANTS_LONG_POLL_MAX", "25"))
+        self.grants_poll_interval_seconds = float(
+            get_env("BACKEND_GRANTS_POLL_INTERVAL", "2")
+        )
+        self.servers_heartbeat_ttl_seconds = float(
+            get_env("BACKEND_SERVERS_HEARTBEAT_TTL", "90")
+        )
+        self.ledger_reconcile_enabled = get_env("BACKEND_LEDGER_RECONCILE_ENABLED", "0") == "1"
+        self.ledger_reconcile_interval_seconds = float(
+            get_env("BACKEND_LEDGER_RECONCILE_INTERVAL", "3600")
+        )
+        self.ledger_reconcile_batch_size = int(
+            get_env("BACKEND_LEDGER_RECONCILE_BATCH_SIZE", "1000")
+        )
+        self.payment_inbox_workers = int(get_env("BACKEND_PAYMENT_WORKERS", "4"))
+        self.payment_inbox_poll_interval_seconds = float(
+            get_env("BACKEND_PAYMENT_POLL_INTERVAL", "1")
+        )
+        self.payment_inbox_batch_size = int(get_env("BACKEND_PAYMENT_BATCH_SIZE", "20"))
+        self.payment_inbox_max_attempts = int(get_env("BACKEND_PAYMENT_MAX_ATTEMPTS", "8"))
+        self.invoice_expiry_interval_seconds = float(
+            get_env("BACKEND_INVOICE_EXPIRY_INTERVAL", "60")
+        )
+        self.invoice_expiry_batch_size = int(get_env("BACKEND_INVOICE_EXPIRY_BATCH_SIZE", "500"))
+        self.invoice_expiry_grace_seconds = float(
+            get_env("BACKEND_INVOICE_EXPIRY_GRACE", "120")
+        )
+        self.redis_url = get_env("REDIS_URL", "")
+        self.progress_cache_ttl_seconds = float(get_env("BACKEND_PROGRESS_CACHE_TTL", "300"))
+        self.progress_cache_tombstone_seconds = float(
+            get_env("BACKEND_PROGRESS_CACHE_TOMBSTONE", "10")
+        )
+        self.progress_cache_max_entries = int(
+            get_env("BACKEND_PROGRESS_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.progress_cache_local = get_env("BACKEND_PROGRESS_CACHE_LOCAL", "0") == "1"
 
 
 @lru_cache()
@@ -2,12 +2,36 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import AsyncIterator, Awaitable, Callable
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db import Base, async_engine, async_session
 
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+Hook = Callable[[], Awaitable[object]]
+
+
+def run_after_commit(session: AsyncSession, hook: Hook) -> None:
+    """Run ``hook`` once ``session_scope`` has committed the session."""
+    session.info.setdefault("after_commit", []).append(hook)
+
+
+def run_after_rollback(session: AsyncSession, hook: Hook) -> None:
+    """Run ``hook`` if ``session_scope`` rolls the session back."""
+    session.info.setdefault("after_rollback", []).append(hook)
+
+
+async def _run_hooks(session: AsyncSession, name: str) -> None:
+    for hook in session.info.pop(name, []):
+        try:
+            await hook()
+        except Exception:  # pragma: no cover - hooks must not mask the outcome
+            logger.exception("Session hook failed", extra={"hook": name})
+
 
 @asynccontextmanager
 async def session_scope() -> AsyncIterator[AsyncSession]:
@@ -18,7 +42,9 @@ async def session_scope() -> AsyncIterator[AsyncSession]:
             await session.commit()
         except Exception:
             await session.rollback()
+            await _run_hooks(session, "after_rollback")
             raise
+        await _run_hooks(session, "after_commit")
 
 
 async def init_models() -> None:
@@ -0,0 +1,54 @@
+"""Local stand-in for the Roblox Open Cloud endpoint receiving sync batches.
+
+Run it next to the backend with::
+
+    uvicorn backend.fakes.roblox_open_cloud:app --port 8081
+
+and point ``ROBLOX_API_BASE_URL`` at ``http://127.0.0.1:8081`` with
+``ROBLOX_SYNC_PATH=/sync``. Tests mount the same app on an in-process
+transport via :meth:`FakeOpenCloud.client`.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request, status
+
+
+class FakeOpenCloud:
+    """Records every posted batch and can be told to fail the next requests."""
+
+    def __init__(self, *, api_key: str | None = None) -> None:
+        self.api_key = api_key
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.fail_next = 0
+        self.app = FastAPI(title="Fake Roblox Open Cloud")
+        self.app.add_api_route("/{path:path}", self._receive, methods=["POST"])
+
+    async def _receive(
+        self, path: str, request: Request, x_api_key: str | None = Header(default=None)
+    ) -> Dict[str, Any]:
+        if self.api_key is not None and x_api_key != self.api_key:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Try again later"
+            )
+
+        events = (await request.json())["events"]
+        self.batches.append(events)
+        return {"path": f"/{path}", "accepted": [event["id"] for event in events]}
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        return [event for batch in self.batches for event in batch]
+
+    def client(self, base_url: str = "http://open-cloud.test") -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url=base_url)
+
+
+app = FakeOpenCloud().app
+
+__all__ = ["FakeOpenCloud", "app"]
@@ -3,15 +3,27 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+from typing import Any, Dict, List
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 
 from .config import get_settings
-from .database import init_models
+from .database import init_models, session_scope
 from .logging import get_logger
 from .routers.game import router as game_router
 from .routers.payments import router as payments_router
+from .security import validate_hmac_signature
+from .services.achievement_timers import run_achievement_timers
+from .cache import close_redis
+from .services import progress_cache, server_roster
 from .services.achievements import run_periodic_recalculation
+from .services.idempotency import run_idempotency_purge
+from .services.invoices import run_invoice_expiry_sweeper
+from .services.ledger import run_ledger_reconciliation
+from .services.notifications import run_notification_dispatcher
+from .services.payment_inbox import payment_inbox_metrics, run_payment_inbox_workers
+from .services.roblox import run_roblox_sync_dispatcher
+from .services.shards import list_shard_metrics
 
 logger = get_logger(__name__)
 
@@ -32,21 +44,67 @@ def create_app() -> FastAPI:
         app.state.achievements_task = asyncio.create_task(
             run_periodic_recalculation(stop_event)
         )
+        app.state.achievement_timers_task = asyncio.create_task(
+            run_achievement_timers(stop_event)
+        )
+        app.state.notifications_task = asyncio.create_task(
+            run_notification_dispatcher(stop_event)
+        )
+        app.state.idempotency_purge_task = asyncio.create_task(
+            run_idempotency_purge(stop_event)
+        )
+        app.state.roblox_sync_task = asyncio.create_task(
+            run_roblox_sync_dispatcher(stop_event)
+        )
+        app.state.payment_inbox_task = asyncio.create_task(
+            run_payment_inbox_workers(stop_event)
+        )
+        app.state.invoice_expiry_task = asyncio.create_task(
+            run_invoice_expiry_sweeper(stop_event)
+        )
+        app.state.ledger_reconcile_task = asyncio.create_task(
+            run_ledger_reconciliation(stop_event)
+        )
         logger.info("Backend startup complete")
 
     @app.on_event("shutdown")
     async def _shutdown() -> None:  # pragma: no cover - lifecycle hook
         stop_event.set()
-        task = getattr(app.state, "achievements_task", None)
-        if task:
-            task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await task
+        for name in (
+            "achievements_task",
+            "achievement_timers_task",
+            "notifications_task",
+            "idempotency_purge_task",
+            "roblox_sync_task",
+            "payment_inbox_task",
+            "invoice_expiry_task",
+            "ledger_reconcile_task",
+        ):
+            task = getattr(app.state, name, None)
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        await progress_cache.close()
+        await server_roster.close()
+        await close_redis()
 
     @app.get("/healthz")
     async def healthcheck() -> dict[str, str]:
         return {"status": "ok"}
 
+    # Lease owners and payment backlog are internal: callers sign the empty
+    # body with BACKEND_HMAC_SECRET like every other backend request.
+    @app.get("/metrics/achievements/shards", dependencies=[Depends(validate_hmac_signature)])
+    async def achievement_shard_metrics() -> Dict[str, List[Dict[str, Any]]]:
+        async with session_scope() as session:
+            return {"shards": await list_shard_metrics(session)}
+
+    @app.get("/metrics/payments/inbox", dependencies=[Depends(validate_hmac_signature)])
+    async def payment_inbox_lag() -> Dict[str, Any]:
+        async with session_scope() as session:
+            return await payment_inbox_metrics(session)
+
     return app
 
 
@@ -3,7 +3,10 @@ from db.models import (
     GameProgress,
     GrantEvent,
     IdempotencyKey,
+    PaymentInboxEvent,
     PaymentWebhookEvent,
+    PlayerPlaytime,
+    PlayerSession,
     RobloxSyncEvent,
 )
 
@@ -11,6 +14,9 @@ __all__ = [
     "GameProgress",
     "GrantEvent",
     "IdempotencyKey",
+    "PaymentInboxEvent",
     "PaymentWebhookEvent",
+    "PlayerPlaytime",
+    "PlayerSession",
     "RobloxSyncEvent",
 ]
\ No newline at end of file
@@ -1,33 +1,79 @@
 """Game-related API endpoints."""
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, model_validator
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db import User
 
-from ..database import session_scope
+from ..config import get_settings
+from ..database import run_after_commit, session_scope
 from ..logging import get_logger
 from ..models import GameProgress, GrantEvent
-from ..security import ensure_idempotency, finalize_idempotency, validate_hmac_signature
+from ..security import ensure_idempotency, finalize_idempotency, signed_body
+from ..services import progress_cache, server_roster
+from ..services.achievement_timers import queue_progress_checks
 from ..services.achievements import evaluate_and_grant_achievements
-from ..services.roblox import sync_grant, sync_progress
-
-router = APIRouter(prefix="/game", tags=["game"])
+from ..services.grants import acknowledge_grants, grant_notifier, list_pending_grants
+from ..services.playtime import extract_playtime_minutes, upsert_playtime
+from ..services.progress import (
+    StaleProgressError,
+    apply_progress_patch,
+    apply_progress_patches,
+    upsert_progress,
+    upsert_progress_batch,
+)
+from ..services.roblox import sync_progress, sync_progress_batch
+
+router = APIRouter(prefix="/game", tags=["game"], default_response_class=ORJSONResponse)
 logger = get_logger(__name__)
 
+MAX_PROGRESS_BATCH_SIZE = 200
+MAX_ONLINE_PLAYERS = 500
+MAX_PENDING_GRANTS = 500
+
 
 class ProgressPushPayload(BaseModel):
     roblox_user_id: str = Field(..., description="Unique Roblox user identifier")
-    progress: Dict[str, Any] = Field(..., description="Arbitrary progress payload")
+    progress: Optional[Dict[str, Any]] = Field(
+        default=None, description="Full progress snapshot replacing the stored one"
+    )
+    patch: Optional[Dict[str, Any]] = Field(
+        default=None, description="RFC 7396 merge patch applied to the snapshot at base_version"
+    )
+    base_version: Optional[int] = Field(
+        default=None, description="Stored version the patch was computed against"
+    )
     version: Optional[int] = Field(default=None, description="Client supplied progress version")
     metadata: Optional[Dict[str, Any]] = Field(default=None, description="Extra metadata")
 
+    @model_validator(mode="after")
+    def _check_snapshot_or_patch(self) -> "ProgressPushPayload":
+        if (self.progress is None) == (self.patch is None):
+            raise ValueError("Exactly one of progress or patch is required")
+        if self.patch is not None:
+            if self.base_version is None:
+                raise ValueError("base_version is required with patch")
+            if self.version is not None and self.version <= self.base_version:
+                raise ValueError("version must be greater than base_version")
+        return self
+
+
+class ProgressBatchPayload(BaseModel):
+    records: List[ProgressPushPayload] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_PROGRESS_BATCH_SIZE,
+        description="Progress records of the players saved in this tick",
+    )
+
 
 class ProgressPullRequest(BaseModel):
     roblox_user_id: str = Field(..., description="Unique Roblox user identifier")
@@ -40,6 +86,38 @@ class ProgressPullResponse(BaseModel):
     updated_at: datetime
 
 
+class PendingGrantsRequest(BaseModel):
+    roblox_user_ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_ONLINE_PLAYERS,
+        description="Players currently in the requesting server",
+    )
+    wait_seconds: float = Field(
+        default=0, ge=0, description="Long-poll: hold the request until a grant arrives"
+    )
+
+
+class GrantAckRequest(BaseModel):
+    grant_ids: List[int] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_PENDING_GRANTS,
+        description="Grants applied by the server",
+    )
+
+
+class ServerHeartbeatRequest(BaseModel):
+    job_id: str = Field(..., min_length=1, max_length=64, description="Roblox game.JobId")
+    server: str = Field(..., min_length=1, description="Slug of the server in the bot menu")
+    roblox_user_ids: List[str] = Field(
+        default_factory=list,
+        max_length=MAX_ONLINE_PLAYERS,
+        description="Every player currently in the server",
+    )
+    closing: bool = Field(default=False, description="Sent once from BindToClose")
+
+
 class GrantReward(BaseModel):
     type: str
     amount: Optional[int] = None
@@ -51,6 +129,17 @@ class GrantRequest(BaseModel):
     roblox_user_id: str
     rewards: List[GrantReward]
     source: Optional[str] = None
+    queue: bool = Field(
+        default=False,
+        description="Deliver through /game/grants/pending instead of the calling server",
+    )
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
 
 
 async def get_db_session() -> AsyncSession:
@@ -58,41 +147,64 @@ async def get_db_session() -> AsyncSession:
         yield session
 
 
+async def _invalidate_progress(session: AsyncSession, roblox_user_ids: List[str]) -> None:
+    """Invalidate cached pulls now and again once the push has committed."""
+
+    async def invalidate_committed() -> None:
+        await progress_cache.invalidate(roblox_user_ids)
+
+    await progress_cache.invalidate(roblox_user_ids)
+    # The first tombstone may expire before a slow transaction commits.
+    run_after_commit(session, invalidate_committed)
+
+
 @router.post("/progress/push", response_model=Dict[str, Any])
 async def push_progress(
-    payload: ProgressPushPayload,
+    payload: Annotated[ProgressPushPayload, Depends(signed_body(ProgressPushPayload))],
     request: Request,
     session: AsyncSession = Depends(get_db_session),
 ) -> Dict[str, Any]:
-    await validate_hmac_signature(request)
     idempotency_entry = await ensure_idempotency(session, request, "/game/progress/push")
     if idempotency_entry.completed_at:
         return idempotency_entry.response_body or {"status": "ok"}
 
-    result = await session.execute(
-        select(GameProgress).where(GameProgress.roblox_user_id == payload.roblox_user_id)
-    )
-    progress = result.scalar_one_or_none()
-
     now = datetime.now(tz=timezone.utc)
-
-    if progress:
-        progress.progress = payload.progress
-        progress.version = payload.version or (progress.version + 1)
-        progress.metadata_json = payload.metadata
-        progress.updated_at = now
-    else:
-        progress = GameProgress(
-            roblox_user_id=payload.roblox_user_id,
-            progress=payload.progress,
-            version=payload.version or 1,
-            metadata_json=payload.metadata,
-            updated_at=now,
+    await _invalidate_progress(session, [payload.roblox_user_id])
+    try:
+        if payload.patch is not None:
+            stored = await apply_progress_patch(
+                session,
+                roblox_user_id=payload.roblox_user_id,
+                patch=payload.patch,
+                base_version=payload.base_version,
+                version=payload.version,
+                metadata=payload.metadata,
+                now=now,
+            )
+            progress = stored.pop("progress")
+        else:
+            stored = await upsert_progress(
+                session,
+                roblox_user_id=payload.roblox_user_id,
+                progress=payload.progress,
+                version=payload.version,
+                metadata=payload.metadata,
+                now=now,
+            )
+            progress = payload.progress
+    except StaleProgressError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+
+    playtime_minutes = extract_playtime_minutes(progress)
+    if playtime_minutes is not None:
+        await upsert_playtime(
+            session,
+            {payload.roblox_user_id: playtime_minutes},
+            source="progress_push",
+            observed_at=now,
         )
-        session.add(progress)
 
-    await session.flush()
-    await sync_progress(session, payload.roblox_user_id, payload.progress)
+    await sync_progress(session, payload.roblox_user_id, progress)
 
     db_user = await session.scalar(select(User).where(User.roblox_id == payload.roblox_user_id))
     if db_user:
@@ -100,71 +212,146 @@ async def push_progress(
             session,
             user=db_user,
             trigger="progress_update",
-            payload={"version": progress.version, "metadata": payload.metadata},
+            payload={"version": stored["version"], "metadata": payload.metadata},
         )
 
-    response = {
-        "status": "ok",
-        "roblox_user_id": payload.roblox_user_id,
-        "version": progress.version,
-        "updated_at": progress.updated_at,
-    }
+    response = {"status": "ok", **stored}
 
     await finalize_idempotency(session, idempotency_entry, response, status.HTTP_200_OK)
     logger.info(
         "Progress pushed",
         extra={
             "roblox_user_id": payload.roblox_user_id,
-            "version": progress.version,
+            "version": stored["version"],
             "idempotency_key": idempotency_entry.key,
         },
     )
     return response
 
 
-@router.post("/progress/pull", response_model=ProgressPullResponse)
-async def pull_progress(
-    payload: ProgressPullRequest,
+@router.post("/progress/push-batch", response_model=Dict[str, Any])
+async def push_progress_batch(
+    payload: Annotated[ProgressBatchPayload, Depends(signed_body(ProgressBatchPayload))],
     request: Request,
     session: AsyncSession = Depends(get_db_session),
-) -> ProgressPullResponse:
-    await validate_hmac_signature(request)
-    idempotency_entry = await ensure_idempotency(session, request, "/game/progress/pull")
-    if idempotency_entry.completed_at and idempotency_entry.response_body:
-        return ProgressPullResponse(**idempotency_entry.response_body)
-
-    result = await session.execute(
-        select(GameProgress).where(GameProgress.roblox_user_id == payload.roblox_user_id)
-    )
-    progress = result.scalar_one_or_none()
-    if not progress:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Progress not found")
-
-    response = ProgressPullResponse(
-        roblox_user_id=progress.roblox_user_id,
-        progress=progress.progress,
-        version=progress.version,
-        updated_at=progress.updated_at,
-    )
-    await finalize_idempotency(session, idempotency_entry, response.dict(), status.HTTP_200_OK)
+) -> Dict[str, Any]:
+    idempotency_entry = await ensure_idempotency(session, request, "/game/progress/push-batch")
+    if idempotency_entry.completed_at:
+        return idempotency_entry.response_body or {"status": "ok"}
+
+    now = datetime.now(tz=timezone.utc)
+    records = {record.roblox_user_id: record for record in payload.records}
+    await _invalidate_progress(session, list(records))
+
+    stored, stale = await upsert_progress_batch(
+        session,
+        [
+            {
+                "roblox_user_id": record.roblox_user_id,
+                "progress": record.progress,
+                "version": record.version,
+                "metadata": record.metadata,
+            }
+            for record in records.values()
+            if record.patch is None
+        ],
+        now=now,
+    )
+    patched, stale_patches = await apply_progress_patches(
+        session,
+        [
+            {
+                "roblox_user_id": record.roblox_user_id,
+                "patch": record.patch,
+                "base_version": record.base_version,
+                "version": record.version,
+                "metadata": record.metadata,
+            }
+            for record in records.values()
+            if record.patch is not None
+        ],
+        now=now,
+    )
+
+    progress_by_id = {
+        row["roblox_user_id"]: records[row["roblox_user_id"]].progress for row in stored
+    }
+    for row in patched:
+        progress_by_id[row["roblox_user_id"]] = row.pop("progress")
+    stored.extend(patched)
+    stale.extend(stale_patches)
+
+    playtimes = {
+        roblox_user_id: minutes
+        for roblox_user_id, progress in progress_by_id.items()
+        if (minutes := extract_playtime_minutes(progress)) is not None
+    }
+    await upsert_playtime(session, playtimes, source="progress_push", observed_at=now)
+    await sync_progress_batch(session, progress_by_id)
+    # Evaluated by the achievement timer loop instead of inline per player.
+    await queue_progress_checks(session, list(playtimes), due_at=now)
+
+    response = {"status": "ok", "count": len(stored), "records": stored, "stale": stale}
+
+    await finalize_idempotency(session, idempotency_entry, response, status.HTTP_200_OK)
     logger.info(
-        "Progress pulled",
+        "Progress batch pushed",
         extra={
-            "roblox_user_id": payload.roblox_user_id,
-            "version": progress.version,
+            "records": len(stored),
+            "stale": len(stale),
             "idempotency_key": idempotency_entry.key,
         },
     )
     return response
 
 
+@router.post("/progress/pull", response_model=ProgressPullResponse)
+async def pull_progress(
+    payload: Annotated[ProgressPullRequest, Depends(signed_body(ProgressPullRequest))],
+    request: Request,
+    response: Response,
+) -> Any:
+    # A pull is a pure read: no idempotency row, and hot players never reach the database.
+    cached = await progress_cache.lookup(payload.roblox_user_id)
+    if cached is None:
+        async with session_scope() as session:
+            result = await session.execute(
+                select(
+                    GameProgress.roblox_user_id,
+                    GameProgress.progress,
+                    GameProgress.version,
+                    GameProgress.updated_at,
+                ).where(GameProgress.roblox_user_id == payload.roblox_user_id)
+            )
+            row = result.first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Progress not found")
+        cached = ProgressPullResponse(
+            roblox_user_id=row.roblox_user_id,
+            progress=row.progress,
+            version=row.version,
+            updated_at=row.updated_at,
+        ).model_dump(mode="json")
+        await progress_cache.store(payload.roblox_user_id, cached)
+
+    etag = progress_cache.etag_for(cached["version"])
+    logger.info(
+        "Progress pulled",
+        extra={"roblox_user_id": payload.roblox_user_id, "version": cached["version"]},
+    )
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return cached
+
+
 @router.post("/grant", response_model=Dict[str, Any])
 async def grant_rewards(
-    payload: GrantRequest,
+    payload: Annotated[GrantRequest, Depends(signed_body(GrantRequest))],
     request: Request,
     session: AsyncSession = Depends(get_db_session),
 ) -> Dict[str, Any]:
-    await validate_hmac_signature(request)
     idempotency_entry = await ensure_idempotency(session, request, "/game/grant")
     if idempotency_entry.completed_at:
         return idempotency_entry.response_body or {"status": "ok"}
@@ -180,21 +367,32 @@ async def grant_rewards(
         await finalize_idempotency(session, idempotency_entry, response, status.HTTP_200_OK)
         return response
 
+    # Unless the grant is queued, the calling server applies these rewards
+    # itself, so it is recorded as delivered and the pending queue never hands
+    # it out a second time.
     event = GrantEvent(
         request_id=payload.request_id,
         roblox_user_id=payload.roblox_user_id,
         rewards=[reward.dict() for reward in payload.rewards],
         source=payload.source,
+        delivered_at=None if payload.queue else datetime.now(timezone.utc),
     )
     session.add(event)
     await session.flush()
+    if payload.queue:
+        roblox_user_id = payload.roblox_user_id
 
-    await sync_grant(session, payload.roblox_user_id, event.rewards)
+        async def wake_pending_polls() -> None:
+            grant_notifier.notify([roblox_user_id])
+
+        # Polls woken before the commit would re-query and miss the grant.
+        run_after_commit(session, wake_pending_polls)
 
     response = {
         "status": "ok",
         "roblox_user_id": payload.roblox_user_id,
         "request_id": payload.request_id,
+        "grant_id": event.id,
     }
     await finalize_idempotency(session, idempotency_entry, response, status.HTTP_200_OK)
     logger.info(
@@ -203,7 +401,72 @@ async def grant_rewards(
             "roblox_user_id": payload.roblox_user_id,
             "request_id": payload.request_id,
             "rewards": [reward.dict() for reward in payload.rewards],
+            "queued": payload.queue,
             "idempotency_key": idempotency_entry.key,
         },
     )
-    return response
\ No newline at end of file
+    return response
+
+
+async def _load_pending_grants(roblox_user_ids: List[str]) -> List[Dict[str, Any]]:
+    async with session_scope() as session:
+        return await list_pending_grants(session, roblox_user_ids, limit=MAX_PENDING_GRANTS)
+
+
+@router.post("/grants/pending", response_model=Dict[str, Any])
+async def pending_grants(
+    payload: Annotated[PendingGrantsRequest, Depends(signed_body(PendingGrantsRequest))],
+) -> Dict[str, Any]:
+    # Read-only and retried by design, so no idempotency row; no session is held while waiting.
+    settings = get_settings()
+    roblox_user_ids = list(dict.fromkeys(payload.roblox_user_ids))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(payload.wait_seconds, settings.grants_long_poll_max_seconds)
+
+    grants = await _load_pending_grants(roblox_user_ids)
+    while not grants and (remaining := deadline - loop.time()) > 0:
+        await grant_notifier.wait(
+            roblox_user_ids, min(remaining, settings.grants_poll_interval_seconds)
+        )
+        grants = await _load_pending_grants(roblox_user_ids)
+
+    return {"grants": grants, "count": len(grants)}
+
+
+@router.post("/grants/ack", response_model=Dict[str, Any])
+async def ack_grants(
+    payload: Annotated[GrantAckRequest, Depends(signed_body(GrantAckRequest))],
+    session: AsyncSession = Depends(get_db_session),
+) -> Dict[str, Any]:
+    # Acknowledging twice is a no-op, so retries need no Idempotency-Key bookkeeping.
+    acknowledged = await acknowledge_grants(
+        session, payload.grant_ids, now=datetime.now(tz=timezone.utc)
+    )
+    logger.info(
+        "Grants acknowledged",
+        extra={"requested": len(payload.grant_ids), "acknowledged": len(acknowledged)},
+    )
+    return {"status": "ok", "acknowledged": acknowledged}
+
+
+@router.post("/servers/heartbeat", response_model=Dict[str, Any])
+async def server_heartbeat(
+    payload: Annotated[ServerHeartbeatRequest, Depends(signed_body(ServerHeartbeatRequest))],
+    session: AsyncSession = Depends(get_db_session),
+) -> Dict[str, Any]:
+    # Each heartbeat replaces the previous one, so retries need no Idempotency-Key.
+    if payload.closing:
+        await server_roster.remove_server(payload.job_id)
+        return {"status": "ok", "players": 0}
+
+    roblox_user_ids = list(dict.fromkeys(payload.roblox_user_ids))
+    ttl = timedelta(seconds=get_settings().servers_heartbeat_ttl_seconds)
+    await server_roster.touch_player_sessions(
+        session,
+        payload.job_id,
+        roblox_user_ids,
+        now=datetime.now(tz=timezone.utc),
+        ttl=ttl,
+    )
+    await server_roster.record_heartbeat(payload.job_id, payload.server, len(roblox_user_ids))
+    return {"status": "ok", "players": len(roblox_user_ids)}
@@ -2,48 +2,100 @@
 from __future__ import annotations
 
 import hmac
-import json
 from datetime import datetime, timezone
+from functools import lru_cache
 from hashlib import sha256
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Type, TypeVar
 
 from fastapi import HTTPException, Request, status
-from sqlalchemy import select
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import get_settings
 from .logging import get_logger
-from .models import IdempotencyKey
+from .services.idempotency import IdempotencyEntry, get_idempotency_store
 
 logger = get_logger(__name__)
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@lru_cache()
+def _hmac_template(secret: str) -> "hmac.HMAC":
+    # Keyed once per secret; each request copies the prepared inner/outer state.
+    return hmac.new(secret.encode(), digestmod=sha256)
+
+
+def _payload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Request body too large"
+    )
+
+
+async def read_limited_body(request: Request) -> bytes:
+    """Read the request body once, rejecting it past ``max_request_body_bytes``."""
+    limit = get_settings().max_request_body_bytes
+    content_length = request.headers.get("Content-Length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+        raise _payload_too_large()
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise _payload_too_large()
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 
 async def validate_hmac_signature(request: Request) -> bytes:
-    """Ensure the request carries a valid HMAC signature."""
+    """Ensure the request carries a valid HMAC signature and return its body."""
     signature = request.headers.get("X-Signature")
     if not signature:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing HMAC signature")
 
-    body = await request.body()
-    expected = hmac.new(get_settings().hmac_secret.encode(), body, sha256).hexdigest()
-    if not hmac.compare_digest(signature, expected):
+    body = await read_limited_body(request)
+    mac = _hmac_template(get_settings().hmac_secret).copy()
+    mac.update(body)
+    if not hmac.compare_digest(signature, mac.hexdigest()):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid HMAC signature")
 
     request.state.raw_body = body
     return body
 
 
+def signed_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """Dependency verifying the HMAC signature and parsing the same bytes into ``model``.
+
+    Use it instead of a plain body parameter so the body is read and parsed once.
+    """
+
+    async def dependency(request: Request) -> ModelT:
+        body = await validate_hmac_signature(request)
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as exc:
+            errors = [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in exc.errors(include_url=False)
+            ]
+            raise RequestValidationError(errors, body=body) from exc
+
+    return dependency
+
+
 async def ensure_idempotency(
     session: AsyncSession, request: Request, endpoint: str
-) -> IdempotencyKey:
-    """Persist and return idempotency information for a request."""
+) -> IdempotencyEntry:
+    """Claim the request's Idempotency-Key or return its completed entry for replay."""
     key = request.headers.get("Idempotency-Key")
     if not key:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing Idempotency-Key header")
 
-    result = await session.execute(select(IdempotencyKey).where(IdempotencyKey.key == key))
-    entry = result.scalar_one_or_none()
-    if entry and entry.completed_at:
+    entry = await get_idempotency_store().claim(session, key, endpoint)
+    if entry.completed_at:
         logger.info(
             "Idempotent replay",
             extra={
@@ -52,29 +104,16 @@ async def ensure_idempotency(
                 "status_code": entry.status_code,
             },
         )
-        return entry
-
-    if entry and not entry.completed_at:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Idempotency key already in progress")
-
-    entry = IdempotencyKey(
-        key=key,
-        endpoint=endpoint,
-        created_at=datetime.now(tz=timezone.utc),
-    )
-    session.add(entry)
-    await session.flush()
     return entry
 
 
 async def finalize_idempotency(
     session: AsyncSession,
-    entry: IdempotencyKey,
+    entry: IdempotencyEntry,
     response_body: Dict[str, Any],
     status_code: int,
 ) -> None:
     """Store the response for subsequent idempotent replays."""
-    entry.response_body = json.loads(json.dumps(response_body, default=str))
-    entry.status_code = status_code
-    entry.completed_at = datetime.now(tz=timezone.utc)
-    await session.flush()
\ No newline at end of file
+    await get_idempotency_store().complete(
+        session, entry, response_body, status_code, datetime.now(tz=timezone.utc)
+    )
@@ -0,0 +1,302 @@
+"""Exact-time scheduling for time-based achievement conditions.
+
+``PROFILE_PHRASE_STREAK`` becomes satisfiable at a known moment:
+``about_text_updated_at + threshold``. Instead of rescanning every user, a due
+check is stored in ``scheduled_achievement_checks`` when the phrase is saved,
+replaced when the text changes again, and evaluated only once it is due.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Dict, List
+
+from sqlalchemy import and_, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import (
+    Achievement,
+    AchievementConditionType,
+    ScheduledAchievementCheck,
+    User,
+    UserAchievement,
+)
+
+from ..database import session_scope
+from ..logging import get_logger
+from .achievements import evaluate_and_grant_achievements, profile_phrase_for
+
+logger = get_logger(__name__)
+
+_DUE_BATCH_SIZE = 200
+
+# Conditions whose inputs arrive with Roblox progress pushes.
+PROGRESS_CONDITION_TYPES = (AchievementConditionType.TIME_IN_GAME_AT_LEAST,)
+_MAX_IDLE_SLEEP_SECONDS = 5.0
+
+
+def _upsert_checks(values: List[Dict[str, object]]):
+    stmt = insert(ScheduledAchievementCheck).values(values)
+    return stmt.on_conflict_do_update(
+        constraint="uq_scheduled_achievement_checks_user_achievement",
+        set_={"due_at": stmt.excluded.due_at},
+    )
+
+
+async def _phrase_achievements(session: AsyncSession) -> List[Achievement]:
+    result = await session.scalars(
+        select(Achievement).where(
+            Achievement.condition_type == AchievementConditionType.PROFILE_PHRASE_STREAK,
+            Achievement.manual_grant_only.is_(False),
+        )
+    )
+    return list(result.all())
+
+
+async def schedule_profile_phrase_checks(
+    session: AsyncSession, user: User, *, now: datetime | None = None
+) -> int:
+    """Replace the user's pending phrase checks after ``about_text`` changed.
+
+    Returns the number of checks scheduled.
+    """
+
+    now = now or datetime.now(tz=timezone.utc)
+    achievements = await _phrase_achievements(session)
+    if not achievements:
+        return 0
+
+    await session.execute(
+        delete(ScheduledAchievementCheck).where(
+            ScheduledAchievementCheck.user_id == user.id,
+            ScheduledAchievementCheck.achievement_id.in_(
+                [achievement.id for achievement in achievements]
+            ),
+        )
+    )
+
+    about_text = (user.about_text or "").lower()
+    updated_at = user.about_text_updated_at
+    if not about_text or not updated_at:
+        return 0
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+
+    owned = set(
+        (
+            await session.scalars(
+                select(UserAchievement.achievement_id).where(
+                    UserAchievement.user_id == user.id
+                )
+            )
+        ).all()
+    )
+
+    values: List[Dict[str, object]] = []
+    for achievement in achievements:
+        phrase = profile_phrase_for(achievement)
+        if achievement.id in owned or not phrase or phrase.lower() not in about_text:
+            continue
+        due_at = updated_at + timedelta(hours=achievement.condition_threshold or 0)
+        if due_at <= now:
+            # Already satisfied; the caller's immediate evaluation grants it.
+            continue
+        values.append(
+            {"user_id": user.id, "achievement_id": achievement.id, "due_at": due_at}
+        )
+
+    if values:
+        await session.execute(_upsert_checks(values))
+    return len(values)
+
+
+async def schedule_phrase_checks_for_achievement(
+    session: AsyncSession, achievement: Achievement, *, now: datetime | None = None
+) -> None:
+    """Rebuild pending checks for one achievement after it was created or edited."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    await session.execute(
+        delete(ScheduledAchievementCheck).where(
+            ScheduledAchievementCheck.achievement_id == achievement.id
+        )
+    )
+
+    phrase = profile_phrase_for(achievement)
+    if (
+        achievement.condition_type != AchievementConditionType.PROFILE_PHRASE_STREAK
+        or achievement.manual_grant_only
+        or not phrase
+    ):
+        return
+
+    due_at = User.about_text_updated_at + timedelta(
+        hours=achievement.condition_threshold or 0
+    )
+    candidates = (
+        select(User.id, literal(achievement.id), due_at)
+        .outerjoin(
+            UserAchievement,
+            and_(
+                UserAchievement.user_id == User.id,
+                UserAchievement.achievement_id == achievement.id,
+            ),
+        )
+        .where(
+            UserAchievement.id.is_(None),
+            User.about_text_updated_at.is_not(None),
+            func.lower(User.about_text).contains(phrase.lower(), autoescape=True),
+            due_at > now,
+        )
+    )
+    stmt = insert(ScheduledAchievementCheck).from_select(
+        ["user_id", "achievement_id", "due_at"], candidates
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            constraint="uq_scheduled_achievement_checks_user_achievement",
+            set_={"due_at": stmt.excluded.due_at},
+        )
+    )
+
+
+async def queue_progress_checks(
+    session: AsyncSession,
+    roblox_user_ids: Collection[str],
+    *,
+    due_at: datetime | None = None,
+) -> None:
+    """Schedule immediate checks of progress-based achievements for many players.
+
+    One ``INSERT ... SELECT`` covers every linked user and unowned achievement;
+    an already pending check is moved earlier, never later.
+    """
+
+    if not roblox_user_ids:
+        return
+
+    due_at = due_at or datetime.now(tz=timezone.utc)
+    candidates = (
+        select(User.id, Achievement.id, literal(due_at))
+        .join(
+            Achievement,
+            and_(
+                Achievement.condition_type.in_(PROGRESS_CONDITION_TYPES),
+                Achievement.manual_grant_only.is_(False),
+            ),
+        )
+        .outerjoin(
+            UserAchievement,
+            and_(
+                UserAchievement.user_id == User.id,
+                UserAchievement.achievement_id == Achievement.id,
+            ),
+        )
+        .where(User.roblox_id.in_(list(roblox_user_ids)), UserAchievement.id.is_(None))
+    )
+    stmt = insert(ScheduledAchievementCheck).from_select(
+        ["user_id", "achievement_id", "due_at"], candidates
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            constraint="uq_scheduled_achievement_checks_user_achievement",
+            set_={
+                "due_at": func.least(ScheduledAchievementCheck.due_at, stmt.excluded.due_at)
+            },
+        )
+    )
+
+
+async def claim_due_checks(
+    session: AsyncSession, *, limit: int, now: datetime | None = None
+) -> Dict[int, List[int]]:
+    """Remove due checks from the schedule and return them grouped per user."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    due_ids = (
+        select(ScheduledAchievementCheck.id)
+        .where(ScheduledAchievementCheck.due_at <= now)
+        .order_by(ScheduledAchievementCheck.due_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        delete(ScheduledAchievementCheck)
+        .where(ScheduledAchievementCheck.id.in_(due_ids))
+        .returning(
+            ScheduledAchievementCheck.user_id, ScheduledAchievementCheck.achievement_id
+        )
+    )
+
+    grouped: Dict[int, List[int]] = defaultdict(list)
+    for user_id, achievement_id in result.all():
+        grouped[user_id].append(achievement_id)
+    return dict(grouped)
+
+
+async def process_due_checks(*, limit: int = _DUE_BATCH_SIZE) -> int:
+    """Evaluate one batch of due checks; returns the number of checks consumed."""
+
+    async with session_scope() as session:
+        due = await claim_due_checks(session, limit=limit)
+        if not due:
+            return 0
+
+        users = await session.scalars(select(User).where(User.id.in_(list(due))))
+        for user in users.all():
+            await evaluate_and_grant_achievements(
+                session,
+                user=user,
+                trigger="scheduled_check",
+                payload={"achievement_ids": due[user.id]},
+                achievement_ids=due[user.id],
+            )
+
+    consumed = sum(len(ids) for ids in due.values())
+    logger.info(
+        "Due achievement checks evaluated",
+        extra={"users": len(due), "checks": consumed},
+    )
+    return consumed
+
+
+async def _seconds_until_next_due(now: datetime) -> float:
+    async with session_scope() as session:
+        next_due = await session.scalar(select(func.min(ScheduledAchievementCheck.due_at)))
+    if next_due is None:
+        return _MAX_IDLE_SLEEP_SECONDS
+    return max(0.0, min((next_due - now).total_seconds(), _MAX_IDLE_SLEEP_SECONDS))
+
+
+async def run_achievement_timers(stop_event: asyncio.Event | None = None) -> None:
+    """Background loop evaluating scheduled achievement checks when they fall due."""
+
+    logger.info("Starting achievement timer loop")
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Achievement timer loop stopping")
+            return
+
+        delay = _MAX_IDLE_SLEEP_SECONDS
+        try:
+            if await process_due_checks() >= _DUE_BATCH_SIZE:
+                continue
+            delay = await _seconds_until_next_due(datetime.now(tz=timezone.utc))
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Achievement timer loop failed")
+
+        await asyncio.sleep(delay)
+
+
+__all__ = [
+    "PROGRESS_CONDITION_TYPES",
+    "claim_due_checks",
+    "process_due_checks",
+    "queue_progress_checks",
+    "run_achievement_timers",
+    "schedule_phrase_checks_for_achievement",
+    "schedule_profile_phrase_checks",
+]
@@ -7,9 +7,10 @@ purchases, referrals or progress updates arriving from Roblox/Firebase.
 from __future__ import annotations
 
 import asyncio
+import contextlib
 from datetime import datetime, timedelta, timezone
 import unicodedata
-from typing import Any, Mapping
+from typing import Any, Collection, Mapping
 
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,7 +18,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from bot.db import (
     Achievement,
     AchievementConditionType,
-    GameProgress,
     LogEntry,
     Payment,
     PromocodeRedemption,
@@ -31,11 +31,22 @@ from bot.db import (
 from ..config import get_settings
 from ..database import session_scope
 from ..logging import get_logger
+from .notifications import enqueue_notification
 from .nuts import add_nuts
-from .telegram import send_message
+from .playtime import load_playtime_minutes
+from .shards import (
+    ShardLease,
+    ShardLeaseLostError,
+    claim_shard,
+    ensure_shards,
+    heartbeat_shard,
+    release_shard,
+)
 
 logger = get_logger(__name__)
 
+_SHARD_POLL_SECONDS = 15
+
 ACHIEVEMENT_DATA_SOURCES: Mapping[str, str] = {
     "balance": "internal:db.users.balance",
     "nuts": "internal:db.users.nuts_balance",
@@ -43,7 +54,7 @@ ACHIEVEMENT_DATA_SOURCES: Mapping[str, str] = {
     "purchases": "internal:services.purchases",
     "referrals": "internal:services.referrals",
     "promocodes": "internal:services.promocodes",
-    "playtime": "firebase:game_progress",
+    "playtime": "internal:db.player_playtime",
     "messages": "internal:bot.messages",
     "profile": "internal:bot.profile",
 }
@@ -62,8 +73,15 @@ def _escape_markdown(text: str) -> str:
     return "".join(f"\\{char}" if char in markdown_chars else char for char in text)
 
 
-async def notify_user_achievement_granted(*, user: User, achievement: Achievement) -> None:
-    """Send a Telegram DM informing the user about a newly granted achievement."""
+async def notify_user_achievement_granted(
+    session: AsyncSession, *, user: User, achievement: Achievement
+) -> None:
+    """Queue a Telegram DM informing the user about a newly granted achievement.
+
+    The message goes through the notification outbox and is delivered after the
+    surrounding transaction commits; grants from one evaluation are coalesced
+    into a single digest.
+    """
 
     if not user.tg_id:
         return
@@ -78,13 +96,27 @@ async def notify_user_achievement_granted(*, user: User, achievement: Achievemen
     if description:
         lines.append(description)
 
-    await send_message(
+    enqueue_notification(
+        session,
         chat_id=user.tg_id,
-        text="\n".join(lines),
+        user_id=user.id,
+        kind="achievement_granted",
+        message="\n".join(lines),
         parse_mode="Markdown",
+        payload={"achievement_id": achievement.id},
     )
 
 
+def profile_phrase_for(achievement: Achievement) -> str | None:
+    """Return the configured phrase of a profile phrase streak achievement."""
+
+    if isinstance(achievement.metadata_json, dict):
+        value = achievement.metadata_json.get("phrase")
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
 def _normalize_product_condition_value(
     raw_value: Any,
 ) -> tuple[int | None, str | None]:
@@ -113,15 +145,23 @@ async def evaluate_and_grant_achievements(
     user: User,
     trigger: str,
     payload: Mapping[str, Any] | None = None,
+    achievement_ids: Collection[int] | None = None,
 ) -> list[UserAchievement]:
-    """Recalculate user progress and grant achievements when thresholds are met."""
+    """Recalculate user progress and grant achievements when thresholds are met.
+
+    ``achievement_ids`` restricts evaluation to the given achievements, which is
+    how due timers from the achievement scheduler are checked.
+    """
 
     owned_result = await session.scalars(
         select(UserAchievement.achievement_id).where(UserAchievement.user_id == user.id)
     )
     owned = set(owned_result.all())
 
-    all_achievements = (await session.scalars(select(Achievement))).all()
+    achievements_stmt = select(Achievement)
+    if achievement_ids is not None:
+        achievements_stmt = achievements_stmt.where(Achievement.id.in_(achievement_ids))
+    all_achievements = (await session.scalars(achievements_stmt)).all()
     granted: list[UserAchievement] = []
 
     for achievement in all_achievements:
@@ -136,6 +176,12 @@ async def evaluate_and_grant_achievements(
             if condition_type is AchievementConditionType.SECRET_WORD and trigger != "secret_word":
                 # Skip secret word achievements for non-message triggers
                 continue
+            if (
+                condition_type is AchievementConditionType.PROFILE_PHRASE_STREAK
+                and trigger == "scheduled"
+            ):
+                # Due times are tracked by the achievement scheduler instead
+                continue
 
         condition_met, condition_details = await _check_condition(
             session,
@@ -171,7 +217,7 @@ async def evaluate_and_grant_achievements(
             metadata={"achievement_id": achievement.id, "trigger": trigger},
         )
 
-        await notify_user_achievement_granted(user=user, achievement=achievement)
+        await notify_user_achievement_granted(session, user=user, achievement=achievement)
 
         log_payload = {
             "achievement_id": achievement.id,
@@ -239,12 +285,24 @@ async def evaluate_user_by_id(
 
 
 async def run_periodic_recalculation(stop_event: asyncio.Event | None = None) -> None:
-    """Background loop to periodically recompute achievements for all users."""
+    """Background loop recomputing achievements shard by shard.
 
-    interval = get_settings().achievements_recalc_interval_seconds
+    Every replica runs this loop; shards are claimed through leases so that each
+    ``users.id`` range is processed by exactly one replica per cycle.
+    """
+
+    settings = get_settings()
+    interval = settings.achievements_recalc_interval_seconds
+    poll_interval = min(interval, _SHARD_POLL_SECONDS)
     logger.info(
         "Starting periodic achievement recalculation",
-        extra={"interval_seconds": interval, "data_sources": ACHIEVEMENT_DATA_SOURCES},
+        extra={
+            "interval_seconds": interval,
+            "shard_size": settings.achievements_recalc_shard_size,
+            "lease_seconds": settings.achievements_recalc_lease_seconds,
+            "instance_id": settings.instance_id,
+            "data_sources": ACHIEVEMENT_DATA_SOURCES,
+        },
     )
 
     while True:
@@ -254,18 +312,114 @@ async def run_periodic_recalculation(stop_event: asyncio.Event | None = None) ->
 
         try:
             async with session_scope() as session:
-                user_ids = await session.scalars(select(User.id))
-                for user_id in user_ids:
-                    await evaluate_user_by_id(
-                        session=session,
-                        user_id=user_id,
-                        trigger="scheduled",
-                        payload={"data_sources": ACHIEVEMENT_DATA_SOURCES},
-                    )
+                await ensure_shards(
+                    session, shard_size=settings.achievements_recalc_shard_size
+                )
+            while not (stop_event is not None and stop_event.is_set()):
+                if not await _process_next_shard(settings):
+                    break
         except Exception:  # pragma: no cover - defensive logging
             logger.exception("Periodic achievement recalculation failed")
 
-        await asyncio.sleep(interval)
+        await asyncio.sleep(poll_interval)
+
+
+async def _process_next_shard(settings) -> bool:
+    """Claim one due shard and recalculate it; returns ``False`` when none is due."""
+
+    lease_seconds = settings.achievements_recalc_lease_seconds
+    async with session_scope() as session:
+        lease = await claim_shard(
+            session, owner=settings.instance_id, lease_seconds=lease_seconds
+        )
+    if lease is None:
+        return False
+
+    heartbeat_task = asyncio.create_task(_keep_shard_lease(lease, lease_seconds))
+    try:
+        user_count, granted_count = await _recalculate_shard(lease)
+    except Exception:
+        logger.exception(
+            "Achievement shard recalculation failed",
+            extra={"shard_id": lease.shard_id, "owner": lease.owner},
+        )
+        user_count = granted_count = None
+    finally:
+        heartbeat_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await heartbeat_task
+
+    if lease.lost:
+        return True
+
+    next_run_at = lease.claimed_at + timedelta(
+        seconds=settings.achievements_recalc_interval_seconds
+    )
+    async with session_scope() as session:
+        await release_shard(
+            session,
+            lease,
+            next_run_at=next_run_at,
+            user_count=user_count,
+            granted_count=granted_count,
+        )
+
+    if user_count is not None:
+        logger.info(
+            "Achievement shard recalculated",
+            extra={
+                "shard_id": lease.shard_id,
+                "range_start": lease.range_start,
+                "range_end": lease.range_end,
+                "owner": lease.owner,
+                "users": user_count,
+                "granted": granted_count,
+                "duration_ms": int(
+                    (datetime.now(timezone.utc) - lease.claimed_at).total_seconds() * 1000
+                ),
+            },
+        )
+    return True
+
+
+async def _recalculate_shard(lease: ShardLease) -> tuple[int, int]:
+    user_count = 0
+    granted_count = 0
+    async with session_scope() as session:
+        user_ids = (
+            await session.scalars(
+                select(User.id)
+                .where(User.id >= lease.range_start, User.id < lease.range_end)
+                .order_by(User.id)
+            )
+        ).all()
+        for user_id in user_ids:
+            if lease.lost:
+                # Roll back: the replica that took over will redo this range.
+                raise ShardLeaseLostError(f"Lease lost for shard {lease.shard_id}")
+            granted = await evaluate_user_by_id(
+                session=session,
+                user_id=user_id,
+                trigger="scheduled",
+                payload={"data_sources": ACHIEVEMENT_DATA_SOURCES},
+            )
+            user_count += 1
+            granted_count += len(granted)
+        if lease.lost:
+            raise ShardLeaseLostError(f"Lease lost for shard {lease.shard_id}")
+    return user_count, granted_count
+
+
+async def _keep_shard_lease(lease: ShardLease, lease_seconds: int) -> None:
+    while not lease.lost:
+        await asyncio.sleep(max(lease_seconds / 3, 1))
+        try:
+            async with session_scope() as session:
+                await heartbeat_shard(session, lease, lease_seconds=lease_seconds)
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception(
+                "Achievement shard heartbeat failed", extra={"shard_id": lease.shard_id}
+            )
 
 
 async def _check_condition(
@@ -421,7 +575,7 @@ async def _check_condition(
 
     if condition_type is AchievementConditionType.TIME_IN_GAME_AT_LEAST:
         threshold = achievement.condition_threshold or 0
-        playtime = await _load_playtime_minutes(session, user)
+        playtime = await load_playtime_minutes(session, user.roblox_id)
         observed = playtime or 0
         return (
             bool(playtime) and playtime >= threshold,
@@ -465,12 +619,7 @@ async def _check_condition(
         )
 
     if condition_type is AchievementConditionType.PROFILE_PHRASE_STREAK:
-        phrase: str | None = None
-        if isinstance(achievement.metadata_json, dict):
-            value = achievement.metadata_json.get("phrase")
-            if isinstance(value, str):
-                phrase = value.strip()
-
+        phrase = profile_phrase_for(achievement)
         threshold_hours = achievement.condition_threshold or 0
         if not phrase:
             return False, {"data_sources": [ACHIEVEMENT_DATA_SOURCES["profile"]]}
@@ -479,6 +628,8 @@ async def _check_condition(
         phrase_present = phrase.lower() in about_text
 
         updated_at = user.about_text_updated_at
+        if updated_at is not None and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
         if not phrase_present or not updated_at:
             return (
                 False,
@@ -504,38 +655,11 @@ async def _check_condition(
     return False, {"data_sources": []}
 
 
-async def _load_playtime_minutes(session: AsyncSession, user: User) -> int | None:
-    if not user.roblox_id:
-        return None
-
-    progress = await session.scalar(
-        select(GameProgress.progress)
-        .where(GameProgress.roblox_user_id == str(user.roblox_id))
-        .order_by(GameProgress.updated_at.desc())
-        .limit(1)
-    )
-    if not isinstance(progress, dict):
-        return None
-
-    for key in (
-        "time_in_game",
-        "timeInGame",
-        "play_time",
-        "playTime",
-        "playtime",
-        "minutes_played",
-    ):
-        value = progress.get(key)
-        if isinstance(value, (int, float)):
-            return int(value)
-
-    return None
-
-
 __all__ = [
     "ACHIEVEMENT_DATA_SOURCES",
     "evaluate_and_grant_achievements",
     "evaluate_user_by_id",
     "run_periodic_recalculation",
     "notify_user_achievement_granted",
+    "profile_phrase_for",
 ]
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Pull-based delivery of reward grants to Roblox servers.
+
+A server asks for the undelivered grants of the players currently in it and
+acknowledges the ones it applied. Both queries only touch the partial index
+on ``game_grants`` rows whose ``delivered_at`` is still ``NULL``.
+
+Only grants sent to ``/game/grant`` with ``queue`` set are queued here, e.g.
+by admin tools or by a server granting a player who is elsewhere; any other
+grant is applied by the calling server and recorded as already delivered.
+Long polls wait on an in-process notifier that ``/game/grant`` wakes once the
+queued grant has committed; grants written by other backend processes are
+picked up by re-querying every ``grants_poll_interval_seconds``.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, DefaultDict, Dict, Iterable, List, Sequence, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import GrantEvent
+
+
+async def list_pending_grants(
+    session: AsyncSession, roblox_user_ids: Sequence[str], *, limit: int
+) -> List[Dict[str, Any]]:
+    """Return undelivered grants of ``roblox_user_ids`` in creation order."""
+
+    if not roblox_user_ids:
+        return []
+    result = await session.execute(
+        select(
+            GrantEvent.id,
+            GrantEvent.roblox_user_id,
+            GrantEvent.request_id,
+            GrantEvent.rewards,
+            GrantEvent.source,
+            GrantEvent.created_at,
+        )
+        .where(
+            GrantEvent.delivered_at.is_(None),
+            GrantEvent.roblox_user_id.in_(list(roblox_user_ids)),
+        )
+        .order_by(GrantEvent.id)
+        .limit(limit)
+    )
+    return [
+        {
+            "id": grant_id,
+            "roblox_user_id": roblox_user_id,
+            "request_id": request_id,
+            "rewards": rewards,
+            "source": source,
+            "created_at": created_at,
+        }
+        for grant_id, roblox_user_id, request_id, rewards, source, created_at in result.all()
+    ]
+
+
+async def acknowledge_grants(
+    session: AsyncSession, grant_ids: Sequence[int], *, now: datetime
+) -> List[int]:
+    """Mark grants as delivered and return the ids that were still pending."""
+
+    if not grant_ids:
+        return []
+    result = await session.execute(
+        update(GrantEvent)
+        .where(GrantEvent.id.in_(list(grant_ids)), GrantEvent.delivered_at.is_(None))
+        .values(delivered_at=now)
+        .returning(GrantEvent.id)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(grant_id for (grant_id,) in result.all())
+
+
+class GrantNotifier:
+    """Wakes long polls waiting for grants of specific players."""
+
+    def __init__(self) -> None:
+        self._waiters: DefaultDict[str, Set[asyncio.Event]] = defaultdict(set)
+
+    def notify(self, roblox_user_ids: Iterable[str]) -> None:
+        for roblox_user_id in roblox_user_ids:
+            for event in self._waiters.get(roblox_user_id, ()):
+                event.set()
+
+    async def wait(self, roblox_user_ids: Sequence[str], timeout: float) -> bool:
+        """Wait until one of the players gets a grant; ``False`` on timeout."""
+
+        event = asyncio.Event()
+        for roblox_user_id in roblox_user_ids:
+            self._waiters[roblox_user_id].add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            for roblox_user_id in roblox_user_ids:
+                waiters = self._waiters.get(roblox_user_id)
+                if waiters is not None:
+                    waiters.discard(event)
+                    if not waiters:
+                        del self._waiters[roblox_user_id]
+
+
+grant_notifier = GrantNotifier()
+
+
+__all__ = [
+    "GrantNotifier",
+    "acknowledge_grants",
+    "grant_notifier",
+    "list_pending_grants",
+]
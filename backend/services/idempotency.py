@@ -0,0 +1,238 @@
+"""Idempotency-Key storage with a TTL.
+
+With ``REDIS_URL`` set, keys live in Redis: a request claims its key with
+``SET NX PX`` and, once the transaction commits, the key is overwritten with
+the stored response for ``Settings.idempotency_ttl_seconds``. A rolled back
+request releases its claim so the client can retry right away.
+
+Without Redis, keys are rows of ``idempotency_keys`` carrying ``expires_at``;
+expired rows are treated as absent and deleted in chunks by
+:func:`run_idempotency_purge`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache import get_redis
+from ..config import get_settings
+from ..database import run_after_commit, run_after_rollback, session_scope
+from ..logging import get_logger
+from ..models import IdempotencyKey
+
+logger = get_logger(__name__)
+
+REDIS_KEY_PREFIX = "idempotency:"
+
+
+@dataclass
+class IdempotencyRecord:
+    """Redis-backed counterpart of an ``IdempotencyKey`` row."""
+
+    key: str
+    endpoint: str
+    status_code: Optional[int] = None
+    response_body: Optional[Dict[str, Any]] = None
+    completed_at: Optional[datetime] = None
+
+
+IdempotencyEntry = Union[IdempotencyKey, IdempotencyRecord]
+
+
+def _in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT, detail="Idempotency key already in progress"
+    )
+
+
+class RedisIdempotencyStore:
+    def __init__(self, redis: Any) -> None:
+        self._redis = redis
+
+    async def claim(self, session: AsyncSession, key: str, endpoint: str) -> IdempotencyRecord:
+        settings = get_settings()
+        redis_key = REDIS_KEY_PREFIX + key
+        claimed = await self._redis.set(
+            redis_key,
+            json.dumps({"endpoint": endpoint}),
+            nx=True,
+            px=settings.idempotency_lock_seconds * 1000,
+        )
+        if claimed:
+
+            async def release() -> None:
+                await self._redis.delete(redis_key)
+
+            run_after_rollback(session, release)
+            return IdempotencyRecord(key=key, endpoint=endpoint)
+
+        raw = await self._redis.get(redis_key)
+        stored = json.loads(raw) if raw else {}
+        if not stored.get("completed_at"):
+            raise _in_progress()
+        return IdempotencyRecord(
+            key=key,
+            endpoint=stored["endpoint"],
+            status_code=stored["status_code"],
+            response_body=stored["response_body"],
+            completed_at=datetime.fromisoformat(stored["completed_at"]),
+        )
+
+    async def complete(
+        self,
+        session: AsyncSession,
+        entry: IdempotencyRecord,
+        response_body: Dict[str, Any],
+        status_code: int,
+        now: datetime,
+    ) -> None:
+        entry.response_body = response_body
+        entry.status_code = status_code
+        entry.completed_at = now
+        payload = json.dumps(
+            {
+                "endpoint": entry.endpoint,
+                "status_code": status_code,
+                "response_body": response_body,
+                "completed_at": now.isoformat(),
+            },
+            default=str,
+        )
+        redis_key = REDIS_KEY_PREFIX + entry.key
+        ttl_ms = get_settings().idempotency_ttl_seconds * 1000
+
+        async def publish() -> None:
+            await self._redis.set(redis_key, payload, px=ttl_ms)
+
+        # Publishing before the commit could replay a response whose writes were rolled back.
+        run_after_commit(session, publish)
+
+
+class DatabaseIdempotencyStore:
+    async def claim(self, session: AsyncSession, key: str, endpoint: str) -> IdempotencyKey:
+        now = datetime.now(tz=timezone.utc)
+        expires_at = now + timedelta(seconds=get_settings().idempotency_ttl_seconds)
+
+        entry = await session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == key))
+        if entry is not None and entry.expires_at is not None and entry.expires_at <= now:
+            # Expired but not purged yet: reuse the row as a fresh claim.
+            entry.endpoint = endpoint
+            entry.status_code = None
+            entry.response_body = None
+            entry.created_at = now
+            entry.completed_at = None
+            entry.expires_at = expires_at
+            await session.flush()
+            return entry
+        if entry is not None:
+            if not entry.completed_at:
+                raise _in_progress()
+            return entry
+
+        entry = IdempotencyKey(key=key, endpoint=endpoint, created_at=now, expires_at=expires_at)
+        session.add(entry)
+        await session.flush()
+        return entry
+
+    async def complete(
+        self,
+        session: AsyncSession,
+        entry: IdempotencyKey,
+        response_body: Dict[str, Any],
+        status_code: int,
+        now: datetime,
+    ) -> None:
+        # The JSONB bind serializes the body once; see bot.db's json_serializer.
+        entry.response_body = response_body
+        entry.status_code = status_code
+        entry.completed_at = now
+        entry.expires_at = now + timedelta(seconds=get_settings().idempotency_ttl_seconds)
+        await session.flush()
+
+
+_database_store = DatabaseIdempotencyStore()
+_redis_store: Optional[RedisIdempotencyStore] = None
+
+
+def get_idempotency_store() -> Union[RedisIdempotencyStore, DatabaseIdempotencyStore]:
+    """Return the Redis store when ``REDIS_URL`` is set, else the database store."""
+
+    global _redis_store
+    redis = get_redis()
+    if redis is None:
+        return _database_store
+    if _redis_store is None:
+        _redis_store = RedisIdempotencyStore(redis)
+    return _redis_store
+
+
+async def purge_expired_keys(*, batch_size: int, now: Optional[datetime] = None) -> int:
+    """Delete expired ``idempotency_keys`` rows, one committed chunk at a time."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    purged = 0
+    while True:
+        expired = (
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at.is_not(None), IdempotencyKey.expires_at <= now)
+            .order_by(IdempotencyKey.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with session_scope() as session:
+            result = await session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.id.in_(expired))
+                .returning(IdempotencyKey.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = len(result.all())
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+async def run_idempotency_purge(stop_event: asyncio.Event | None = None) -> None:
+    """Background loop deleting expired idempotency rows."""
+
+    settings = get_settings()
+    logger.info(
+        "Starting idempotency purge",
+        extra={
+            "interval_seconds": settings.idempotency_purge_interval_seconds,
+            "batch_size": settings.idempotency_purge_batch_size,
+        },
+    )
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Idempotency purge stopping")
+            return
+
+        try:
+            purged = await purge_expired_keys(batch_size=settings.idempotency_purge_batch_size)
+            if purged:
+                logger.info("Purged expired idempotency keys", extra={"purged": purged})
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Idempotency purge failed")
+
+        await asyncio.sleep(settings.idempotency_purge_interval_seconds)
+
+
+__all__ = [
+    "DatabaseIdempotencyStore",
+    "IdempotencyEntry",
+    "IdempotencyRecord",
+    "RedisIdempotencyStore",
+    "get_idempotency_store",
+    "purge_expired_keys",
+    "run_idempotency_purge",
+]
@@ -0,0 +1,119 @@
+"""Expiry of abandoned payment invoices.
+
+Pending invoices with an ``expires_at`` are swept in bulk: each batch is one
+``UPDATE ... WHERE id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED)`` served
+by the partial index on ``expires_at`` of pending rows, so replicas sweeping at
+the same time split the work instead of waiting on each other.
+
+``expires_at`` of Wallet Pay invoices comes from the provider's clock. The bot
+never stores it earlier than its own TTL (the skew is kept in
+``ttl_metadata``), and an invoice is only expired ``invoice_expiry_grace_seconds``
+after that, so a payment the provider still accepted is not lost to a clock
+that runs ahead.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from sqlalchemy import select, update
+
+from bot.db import Invoice
+
+from ..config import get_settings
+from ..database import session_scope
+from ..logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ExpirySweep:
+    expired: int = 0
+    batches: int = 0
+    by_provider: Dict[str, int] = field(default_factory=dict)
+
+
+def expiry_cutoff(now: datetime, grace: timedelta | None = None) -> datetime:
+    """Return the latest ``expires_at`` that counts as overdue at ``now``."""
+
+    if grace is None:
+        grace = timedelta(seconds=get_settings().invoice_expiry_grace_seconds)
+    return now - grace
+
+
+async def expire_overdue_invoices(
+    *, batch_size: int, now: datetime | None = None, grace: timedelta | None = None
+) -> ExpirySweep:
+    """Expire every overdue pending invoice in committed batches."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    cutoff = expiry_cutoff(now, grace)
+    providers: Counter[str] = Counter()
+    sweep = ExpirySweep()
+    while True:
+        overdue = (
+            select(Invoice.id)
+            .where(
+                Invoice.status == "pending",
+                Invoice.expires_at.is_not(None),
+                Invoice.expires_at < cutoff,
+            )
+            .order_by(Invoice.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with session_scope() as session:
+            result = await session.execute(
+                update(Invoice)
+                .where(Invoice.id.in_(overdue))
+                .values(status="expired", cancelled_at=now, updated_at=now)
+                .returning(Invoice.provider)
+                .execution_options(synchronize_session=False)
+            )
+            expired = [provider for (provider,) in result.all()]
+        sweep.batches += 1
+        sweep.expired += len(expired)
+        providers.update(expired)
+        if len(expired) < batch_size:
+            sweep.by_provider = dict(providers)
+            return sweep
+
+
+async def run_invoice_expiry_sweeper(stop_event: asyncio.Event | None = None) -> None:
+    """Background loop expiring abandoned invoices."""
+
+    settings = get_settings()
+    logger.info(
+        "Starting invoice expiry sweeper",
+        extra={
+            "interval_seconds": settings.invoice_expiry_interval_seconds,
+            "batch_size": settings.invoice_expiry_batch_size,
+            "grace_seconds": settings.invoice_expiry_grace_seconds,
+        },
+    )
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Invoice expiry sweeper stopping")
+            return
+
+        try:
+            sweep = await expire_overdue_invoices(batch_size=settings.invoice_expiry_batch_size)
+            if sweep.expired:
+                logger.info("Expired overdue invoices", extra=asdict(sweep))
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Invoice expiry sweep failed")
+
+        await asyncio.sleep(settings.invoice_expiry_interval_seconds)
+
+
+__all__ = [
+    "ExpirySweep",
+    "expire_overdue_invoices",
+    "expiry_cutoff",
+    "run_invoice_expiry_sweeper",
+]
@@ -0,0 +1,385 @@
+"""Nuts ledger checkpoints and incremental balance reconciliation.
+
+``nuts_balance_checkpoints`` stores, per user, the balance derived from the
+ledger up to ``last_transaction_id`` and the drift between ``users.nuts_balance``
+and that derived balance. Reconciliation walks users in ``users.id`` chunks and
+only sums the ``nuts_transactions`` rows written after each checkpoint, so a
+pass costs one aggregate over the new rows instead of the whole ledger. New or
+changed drifts are reported to admins through the notification outbox in the
+same transaction that records them, so each one is reported once.
+
+The background loop only runs with ``BACKEND_LEDGER_RECONCILE_ENABLED=1``. Run
+``rebuild`` once before enabling it, so balances that predate the ledger are
+recorded as known drift instead of being reported. A pass holds a Postgres
+advisory lock for its whole duration; replicas that cannot take it skip the
+pass, so concurrent passes never report the same drift twice.
+
+Ledger rows of one user are ordered by id: :mod:`backend.services.nuts` writes
+them after the ``users`` row update, whose row lock serialises concurrent
+writers of the same balance.
+
+Checkpoints are rebuilt from scratch by streaming the full per-user aggregate
+through a server-side cursor::
+
+    python -m backend.services.ledger rebuild --batch-size 5000
+    python -m backend.services.ledger reconcile
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import ROOT_ADMIN_ID
+from bot.db import Admin, NutsBalanceCheckpoint, NutsTransaction, User, async_engine
+
+from ..config import get_settings
+from ..database import session_scope
+from ..logging import get_logger
+from .notifications import enqueue_notification
+
+logger = get_logger(__name__)
+
+_MAX_REPORTED_DRIFTS = 20
+# Key of the session-level advisory lock held for a whole reconciliation pass.
+_RECONCILE_LOCK_KEY = 0x6E757473
+
+_signed_amount = case(
+    (NutsTransaction.status != "completed", 0),
+    (NutsTransaction.transaction_type == "debit", -NutsTransaction.amount),
+    else_=NutsTransaction.amount,
+)
+
+
+@dataclass
+class LedgerDrift:
+    user_id: int
+    telegram_id: int | None
+    balance: int
+    expected: int
+
+    @property
+    def drift(self) -> int:
+        return self.balance - self.expected
+
+
+@dataclass
+class ChunkResult:
+    last_user_id: int | None
+    users: int
+    advanced: int
+    drifts: List[LedgerDrift]
+
+
+async def reconcile_chunk(
+    session: AsyncSession, *, after_user_id: int, limit: int, now: datetime
+) -> ChunkResult:
+    """Reconcile up to ``limit`` users with ``id > after_user_id``.
+
+    Returns the drifts that are new or changed since the previous checkpoint.
+    """
+
+    users = (
+        select(User.id, User.tg_id, User.nuts_balance)
+        .where(User.id > after_user_id)
+        .order_by(User.id)
+        .limit(limit)
+        .subquery()
+    )
+    checkpoint = NutsBalanceCheckpoint
+    result = await session.execute(
+        select(
+            users.c.id,
+            users.c.tg_id,
+            users.c.nuts_balance,
+            checkpoint.balance,
+            checkpoint.last_transaction_id,
+            checkpoint.drift,
+            func.coalesce(func.sum(_signed_amount), 0),
+            func.max(NutsTransaction.id),
+        )
+        .select_from(users)
+        .outerjoin(checkpoint, checkpoint.user_id == users.c.id)
+        .outerjoin(
+            NutsTransaction,
+            (NutsTransaction.user_id == users.c.id)
+            & (NutsTransaction.id > func.coalesce(checkpoint.last_transaction_id, 0)),
+        )
+        .group_by(
+            users.c.id,
+            users.c.tg_id,
+            users.c.nuts_balance,
+            checkpoint.balance,
+            checkpoint.last_transaction_id,
+            checkpoint.drift,
+        )
+        .order_by(users.c.id)
+    )
+    rows = result.all()
+    if not rows:
+        return ChunkResult(last_user_id=None, users=0, advanced=0, drifts=[])
+
+    updates: List[Dict[str, Any]] = []
+    drifts: List[LedgerDrift] = []
+    for (
+        user_id,
+        telegram_id,
+        balance,
+        checkpoint_balance,
+        checkpoint_last_id,
+        previous_drift,
+        delta,
+        last_id,
+    ) in rows:
+        expected = (checkpoint_balance or 0) + int(delta)
+        entry = LedgerDrift(
+            user_id=user_id,
+            telegram_id=telegram_id,
+            balance=int(balance or 0),
+            expected=expected,
+        )
+        if checkpoint_balance is not None and last_id is None and entry.drift == previous_drift:
+            continue
+        updates.append(
+            {
+                "user_id": user_id,
+                "balance": expected,
+                "last_transaction_id": last_id or checkpoint_last_id or 0,
+                "drift": entry.drift,
+                "checked_at": now,
+            }
+        )
+        if entry.drift and entry.drift != (previous_drift or 0):
+            drifts.append(entry)
+
+    if updates:
+        stmt = insert(NutsBalanceCheckpoint).values(updates)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[NutsBalanceCheckpoint.user_id],
+                set_={
+                    "balance": stmt.excluded.balance,
+                    "last_transaction_id": stmt.excluded.last_transaction_id,
+                    "drift": stmt.excluded.drift,
+                    "checked_at": stmt.excluded.checked_at,
+                },
+            )
+        )
+    return ChunkResult(
+        last_user_id=rows[-1][0], users=len(rows), advanced=len(updates), drifts=drifts
+    )
+
+
+def render_drift_report(drifts: Sequence[LedgerDrift]) -> str:
+    lines = ["⚠️ Расхождения баланса орешков с журналом:"]
+    for entry in drifts[:_MAX_REPORTED_DRIFTS]:
+        lines.append(
+            f"• user {entry.user_id} (tg {entry.telegram_id}): "
+            f"баланс {entry.balance}, по журналу {entry.expected} ({entry.drift:+d})"
+        )
+    if len(drifts) > _MAX_REPORTED_DRIFTS:
+        lines.append(f"…и ещё {len(drifts) - _MAX_REPORTED_DRIFTS}")
+    return "\n".join(lines)
+
+
+async def _admin_chat_ids(session: AsyncSession) -> List[int]:
+    chat_ids = set((await session.scalars(select(Admin.telegram_id))).all())
+    chat_ids.add(ROOT_ADMIN_ID)
+    return sorted(chat_id for chat_id in chat_ids if chat_id)
+
+
+@dataclass
+class ReconcileReport:
+    users: int = 0
+    advanced: int = 0
+    drifts: int = 0
+
+
+async def reconcile_ledger(*, batch_size: int) -> ReconcileReport:
+    """Reconcile every user, one transaction per chunk of ``batch_size`` users."""
+
+    report = ReconcileReport()
+    admin_chat_ids: List[int] | None = None
+    after_user_id = 0
+    while True:
+        async with session_scope() as session:
+            chunk = await reconcile_chunk(
+                session,
+                after_user_id=after_user_id,
+                limit=batch_size,
+                now=datetime.now(tz=timezone.utc),
+            )
+            if chunk.drifts:
+                if admin_chat_ids is None:
+                    admin_chat_ids = await _admin_chat_ids(session)
+                message = render_drift_report(chunk.drifts)
+                for chat_id in admin_chat_ids:
+                    enqueue_notification(
+                        session,
+                        chat_id=chat_id,
+                        message=message,
+                        kind="ledger_drift",
+                        payload={"user_ids": [entry.user_id for entry in chunk.drifts]},
+                    )
+        report.users += chunk.users
+        report.advanced += chunk.advanced
+        report.drifts += len(chunk.drifts)
+        if chunk.last_user_id is None or chunk.users < batch_size:
+            return report
+        after_user_id = chunk.last_user_id
+
+
+@asynccontextmanager
+async def _reconcile_lock() -> AsyncIterator[bool]:
+    """Hold the pass lock on a dedicated connection; yields whether it was taken."""
+
+    async with async_engine.connect() as conn:  # type: ignore[union-attr]
+        acquired = bool(await conn.scalar(select(func.pg_try_advisory_lock(_RECONCILE_LOCK_KEY))))
+        # The lock belongs to the connection, so it survives the commit and the
+        # connection does not sit idle in a transaction during the pass.
+        await conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.scalar(select(func.pg_advisory_unlock(_RECONCILE_LOCK_KEY)))
+                await conn.commit()
+
+
+async def try_reconcile_ledger(*, batch_size: int) -> ReconcileReport | None:
+    """Run :func:`reconcile_ledger` unless another process is running a pass."""
+
+    async with _reconcile_lock() as acquired:
+        if not acquired:
+            return None
+        return await reconcile_ledger(batch_size=batch_size)
+
+
+async def rebuild_checkpoints(*, batch_size: int) -> int:
+    """Replace every checkpoint with one computed from the full ledger.
+
+    The aggregate is streamed through a server-side cursor and written in
+    batches; the rebuild runs in a single transaction, so readers never see a
+    half-rebuilt table.
+    """
+
+    totals = (
+        select(
+            NutsTransaction.user_id.label("user_id"),
+            func.sum(_signed_amount).label("balance"),
+            func.max(NutsTransaction.id).label("last_transaction_id"),
+        )
+        .group_by(NutsTransaction.user_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            User.id,
+            User.nuts_balance,
+            func.coalesce(totals.c.balance, 0),
+            func.coalesce(totals.c.last_transaction_id, 0),
+        )
+        .outerjoin(totals, totals.c.user_id == User.id)
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    now = datetime.now(tz=timezone.utc)
+    written = 0
+    async with session_scope() as session:
+        await session.execute(delete(NutsBalanceCheckpoint))
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            await session.execute(
+                insert(NutsBalanceCheckpoint).values(
+                    [
+                        {
+                            "user_id": user_id,
+                            "balance": int(expected),
+                            "last_transaction_id": int(last_id),
+                            "drift": int(balance or 0) - int(expected),
+                            "checked_at": now,
+                        }
+                        for user_id, balance, expected, last_id in partition
+                    ]
+                )
+            )
+            written += len(partition)
+    logger.info("Rebuilt nuts balance checkpoints", extra={"users": written})
+    return written
+
+
+async def run_ledger_reconciliation(stop_event: asyncio.Event | None = None) -> None:
+    """Background loop reconciling balances against the nuts ledger."""
+
+    settings = get_settings()
+    if not settings.ledger_reconcile_enabled:
+        logger.info("BACKEND_LEDGER_RECONCILE_ENABLED is not set; ledger reconciliation disabled")
+        return
+    logger.info(
+        "Starting ledger reconciliation",
+        extra={
+            "interval_seconds": settings.ledger_reconcile_interval_seconds,
+            "batch_size": settings.ledger_reconcile_batch_size,
+        },
+    )
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Ledger reconciliation stopping")
+            return
+
+        try:
+            report = await try_reconcile_ledger(batch_size=settings.ledger_reconcile_batch_size)
+            if report is None:
+                logger.info("Ledger reconciliation pass is running on another replica")
+            else:
+                log = logger.warning if report.drifts else logger.info
+                log("Reconciled nuts ledger", extra=asdict(report))
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Ledger reconciliation failed")
+
+        await asyncio.sleep(settings.ledger_reconcile_interval_seconds)
+
+
+def _parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("rebuild", "reconcile"))
+    parser.add_argument("--batch-size", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    batch_size = args.batch_size or get_settings().ledger_reconcile_batch_size
+    if args.command == "rebuild":
+        summary: Dict[str, Any] = {"users": asyncio.run(rebuild_checkpoints(batch_size=batch_size))}
+    else:
+        report = asyncio.run(try_reconcile_ledger(batch_size=batch_size))
+        summary = asdict(report) if report is not None else {"skipped": "pass already running"}
+    print(json.dumps(summary))
+    return 0
+
+
+__all__ = [
+    "ChunkResult",
+    "LedgerDrift",
+    "ReconcileReport",
+    "rebuild_checkpoints",
+    "reconcile_chunk",
+    "reconcile_ledger",
+    "render_drift_report",
+    "run_ledger_reconciliation",
+    "try_reconcile_ledger",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover - manual maintenance entry point
+    raise SystemExit(main())
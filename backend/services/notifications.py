@@ -0,0 +1,232 @@
+"""Transactional outbox for user-facing Telegram notifications.
+
+Notifications are written to ``notification_outbox`` inside the caller's
+transaction, so a rollback also discards them and no Telegram round trip
+happens while row locks are held. A dispatcher drains committed rows in
+batches, coalescing several messages for the same chat into one digest and
+retrying failed deliveries with backoff.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import Any, List, Mapping, Sequence, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import NotificationOutbox
+
+from ..config import get_settings
+from ..database import session_scope
+from ..logging import get_logger
+from .telegram import TelegramNotificationError, send_message
+
+logger = get_logger(__name__)
+
+_MAX_MESSAGE_LENGTH = 4096
+_SENDING_VISIBILITY_SECONDS = 60
+_MAX_BACKOFF_SECONDS = 900
+_DIGEST_HEADERS: Mapping[str, str] = {
+    "achievement_granted": "🎉 Новые достижения:",
+}
+
+
+def enqueue_notification(
+    session: AsyncSession,
+    *,
+    chat_id: int | None,
+    message: str,
+    kind: str,
+    parse_mode: str | None = None,
+    user_id: int | None = None,
+    payload: Mapping[str, Any] | None = None,
+) -> NotificationOutbox | None:
+    """Stage a notification in the current transaction."""
+
+    if not chat_id:
+        return None
+
+    entry = NotificationOutbox(
+        user_id=user_id,
+        chat_id=chat_id,
+        kind=kind,
+        message=message,
+        parse_mode=parse_mode,
+        payload=dict(payload or {}),
+        status="pending",
+        attempts=0,
+        available_at=datetime.now(tz=timezone.utc),
+    )
+    session.add(entry)
+    return entry
+
+
+async def claim_notifications(
+    session: AsyncSession,
+    *,
+    limit: int,
+    now: datetime | None = None,
+) -> List[NotificationOutbox]:
+    """Mark a batch of due notifications as ``sending`` and return them.
+
+    Claimed rows become visible again after a timeout, so a dispatcher that
+    crashes mid-batch does not lose them.
+    """
+
+    now = now or datetime.now(tz=timezone.utc)
+    candidates = (
+        select(NotificationOutbox.id)
+        .where(
+            NotificationOutbox.status.in_(("pending", "sending")),
+            NotificationOutbox.available_at <= now,
+        )
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(candidates))
+        .values(
+            status="sending",
+            attempts=NotificationOutbox.attempts + 1,
+            available_at=now + timedelta(seconds=_SENDING_VISIBILITY_SECONDS),
+        )
+        .returning(NotificationOutbox)
+        .execution_options(synchronize_session=False)
+    )
+    entries = (await session.scalars(stmt)).all()
+    return sorted(entries, key=lambda entry: entry.id)
+
+
+def coalesce_notifications(
+    entries: Sequence[NotificationOutbox],
+) -> List[Tuple[List[NotificationOutbox], str]]:
+    """Group notifications per chat into digests that fit one Telegram message."""
+
+    def group_key(entry: NotificationOutbox) -> tuple[int, str]:
+        return entry.chat_id, entry.parse_mode or ""
+
+    digests: List[Tuple[List[NotificationOutbox], str]] = []
+    for _, group in groupby(sorted(entries, key=group_key), key=group_key):
+        batch: List[NotificationOutbox] = []
+        for entry in group:
+            candidate = [*batch, entry]
+            if batch and len(_render_digest(candidate)) > _MAX_MESSAGE_LENGTH:
+                digests.append((batch, _render_digest(batch)))
+                candidate = [entry]
+            batch = candidate
+        if batch:
+            digests.append((batch, _render_digest(batch)))
+    return digests
+
+
+def _render_digest(entries: Sequence[NotificationOutbox]) -> str:
+    if len(entries) == 1:
+        return entries[0].message
+
+    body = "\n\n".join(entry.message for entry in entries)
+    kinds = {entry.kind for entry in entries}
+    header = _DIGEST_HEADERS.get(kinds.pop()) if len(kinds) == 1 else None
+    return f"{header}\n\n{body}" if header else body
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(5 * 2 ** max(attempts - 1, 0), _MAX_BACKOFF_SECONDS))
+
+
+async def dispatch_pending_notifications(
+    *, limit: int | None = None, max_attempts: int | None = None
+) -> int:
+    """Deliver one batch of committed notifications; returns the claimed count."""
+
+    settings = get_settings()
+    limit = limit or settings.notifications_batch_size
+    max_attempts = max_attempts or settings.notifications_max_attempts
+
+    async with session_scope() as session:
+        entries = await claim_notifications(session, limit=limit)
+    if not entries:
+        return 0
+
+    delivered: List[int] = []
+    failed: List[Tuple[NotificationOutbox, str]] = []
+    for batch, message in coalesce_notifications(entries):
+        try:
+            await send_message(
+                chat_id=batch[0].chat_id,
+                text=message,
+                parse_mode=batch[0].parse_mode,
+            )
+        except TelegramNotificationError as exc:
+            failed.extend((entry, str(exc)) for entry in batch)
+        else:
+            delivered.extend(entry.id for entry in batch)
+
+    now = datetime.now(tz=timezone.utc)
+    async with session_scope() as session:
+        if delivered:
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(delivered))
+                .values(status="sent", sent_at=now, last_error=None)
+            )
+        for entry, error in failed:
+            exhausted = entry.attempts >= max_attempts
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == entry.id)
+                .values(
+                    status="failed" if exhausted else "pending",
+                    available_at=now + _retry_delay(entry.attempts),
+                    last_error=error,
+                )
+            )
+
+    logger.info(
+        "Notification batch dispatched",
+        extra={
+            "claimed": len(entries),
+            "delivered": len(delivered),
+            "failed": len(failed),
+        },
+    )
+    return len(entries)
+
+
+async def run_notification_dispatcher(stop_event: asyncio.Event | None = None) -> None:
+    """Background loop draining the notification outbox."""
+
+    settings = get_settings()
+    logger.info(
+        "Starting notification dispatcher",
+        extra={
+            "poll_interval_seconds": settings.notifications_poll_interval_seconds,
+            "batch_size": settings.notifications_batch_size,
+        },
+    )
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Notification dispatcher stopping")
+            return
+
+        claimed = 0
+        try:
+            claimed = await dispatch_pending_notifications()
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Notification dispatch failed")
+
+        if claimed < settings.notifications_batch_size:
+            await asyncio.sleep(settings.notifications_poll_interval_seconds)
+
+
+__all__ = [
+    "claim_notifications",
+    "coalesce_notifications",
+    "dispatch_pending_notifications",
+    "enqueue_notification",
+    "run_notification_dispatcher",
+]
@@ -1,11 +1,19 @@
-"""Utility helpers for managing a user's nuts balance."""
+"""Utility helpers for managing a user's nuts balance.
+
+Credits and debits never read the balance into Python: each one is a single
+conditional ``UPDATE users ... RETURNING`` followed by the ledger insert in
+the same transaction, and ``ck_users_nuts_balance_non_negative`` backs the
+debit guard.
+"""
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict, Mapping
+from typing import Any, Dict, Mapping, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
 from bot.db import NutsTransaction, User
 
@@ -34,20 +42,79 @@ async def _resolve_user(
     if user is not None:
         return user
 
-    stmt = select(User)
-    if user_id is not None:
-        stmt = stmt.where(User.id == user_id)
-    elif telegram_id is not None:
-        stmt = stmt.where(User.tg_id == telegram_id)
-    else:
-        raise ValueError("Either user, user_id or telegram_id must be provided")
-
-    db_user = await session.scalar(stmt)
+    db_user = await session.scalar(select(User).where(_user_filter(user_id=user_id, telegram_id=telegram_id)))
     if not db_user:
         raise NutsUserNotFoundError("User not found for nuts operation")
     return db_user
 
 
+def _user_filter(
+    *,
+    user: User | None = None,
+    user_id: int | None = None,
+    telegram_id: int | None = None,
+) -> ColumnElement[bool]:
+    if user is not None:
+        return User.id == user.id
+    if user_id is not None:
+        return User.id == user_id
+    if telegram_id is not None:
+        return User.tg_id == telegram_id
+    raise ValueError("Either user, user_id or telegram_id must be provided")
+
+
+async def _apply_balance_delta(
+    session: AsyncSession,
+    *,
+    delta: int,
+    user: User | None,
+    user_id: int | None,
+    telegram_id: int | None,
+) -> Tuple[int, int, int]:
+    """Change the balance in one ``UPDATE ... RETURNING`` and return the row.
+
+    The new balance is computed by the database, so concurrent credits and
+    debits of the same user cannot overwrite each other. Debits only match
+    while the balance covers them. Returns ``(user_id, telegram_id, balance)``.
+    """
+
+    if user is not None and user.id is None:
+        await session.flush()
+    condition = _user_filter(user=user, user_id=user_id, telegram_id=telegram_id)
+    stmt = update(User).where(condition)
+    if delta < 0:
+        stmt = stmt.where(User.nuts_balance >= -delta)
+    row = (
+        await session.execute(
+            stmt.values(nuts_balance=User.nuts_balance + delta)
+            .returning(User.id, User.tg_id, User.nuts_balance)
+            .execution_options(synchronize_session=False)
+        )
+    ).first()
+
+    if row is None:
+        if delta < 0 and await session.scalar(select(User.id).where(condition)) is not None:
+            raise NutsInsufficientBalanceError("Insufficient nuts balance")
+        raise NutsUserNotFoundError("User not found for nuts operation")
+
+    db_user_id, db_telegram_id, balance = row
+    _refresh_loaded_balance(session, user, db_user_id, balance)
+    return db_user_id, db_telegram_id, balance
+
+
+def _refresh_loaded_balance(
+    session: AsyncSession, user: User | None, user_id: int, balance: int
+) -> None:
+    """Store the returned balance on loaded instances without marking them dirty."""
+
+    identity_map = getattr(session, "identity_map", None)
+    loaded = user
+    if loaded is None and identity_map is not None:
+        loaded = identity_map.get(identity_key(User, user_id))
+    if loaded is not None:
+        set_committed_value(loaded, "nuts_balance", balance)
+
+
 def _metadata_with_source(
     source: str,
     invoice_id: int | None,
@@ -98,18 +165,17 @@ async def add_nuts(
     if amount <= 0:
         raise ValueError("Amount must be positive for add_nuts")
 
-    db_user = await _resolve_user(
+    db_user_id, db_telegram_id, _ = await _apply_balance_delta(
         session,
+        delta=amount,
         user=user,
         user_id=user_id,
         telegram_id=telegram_id,
     )
-    new_balance = (db_user.nuts_balance or 0) + amount
-    db_user.nuts_balance = new_balance
 
     transaction = NutsTransaction(
-        user_id=db_user.id,
-        telegram_id=db_user.tg_id,
+        user_id=db_user_id,
+        telegram_id=db_telegram_id,
         amount=amount,
         transaction_type="credit",
         type=transaction_type,
@@ -143,21 +209,17 @@ async def subtract_nuts(
     if amount <= 0:
         raise ValueError("Amount must be positive for subtract_nuts")
 
-    db_user = await _resolve_user(
+    db_user_id, db_telegram_id, _ = await _apply_balance_delta(
         session,
+        delta=-amount,
         user=user,
         user_id=user_id,
         telegram_id=telegram_id,
     )
-    current_balance = db_user.nuts_balance or 0
-    if current_balance - amount < 0:
-        raise NutsInsufficientBalanceError("Insufficient nuts balance")
-
-    db_user.nuts_balance = current_balance - amount
 
     transaction = NutsTransaction(
-        user_id=db_user.id,
-        telegram_id=db_user.tg_id,
+        user_id=db_user_id,
+        telegram_id=db_telegram_id,
         amount=amount,
         transaction_type="debit",
         type=transaction_type,
@@ -0,0 +1,276 @@
+"""Inbox of verified payment webhooks processed outside the HTTP request.
+
+Webhook endpoints only store the verified event under its idempotency key and
+answer 200, so a slow credit, referral bonus or achievement evaluation never
+pushes a provider into timeouts and retries. A pool of workers claims due
+events with ``FOR UPDATE SKIP LOCKED`` and applies each one in its own
+transaction together with the ``processed`` mark, so an event takes effect at
+most once. Failures are retried with exponential backoff; events rejected by
+validation or out of attempts are moved to ``dead`` for manual review.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..database import session_scope
+from ..logging import get_logger
+from ..models import PaymentInboxEvent
+from .payments import (
+    PaymentEventRejected,
+    process_stars_payment,
+    process_telegram_payment,
+    process_wallet_payment,
+)
+
+logger = get_logger(__name__)
+
+_PROCESSING_VISIBILITY_SECONDS = 120
+_MAX_BACKOFF_SECONDS = 900
+_MAX_RECORDED_ERROR = 2000
+
+Processor = Callable[[AsyncSession, Mapping[str, Any]], Awaitable[None]]
+
+PROCESSORS: Dict[str, Processor] = {
+    "telegram": process_telegram_payment,
+    "stars": process_stars_payment,
+    "wallet": process_wallet_payment,
+}
+
+
+async def enqueue_payment_event(
+    session: AsyncSession,
+    *,
+    provider: str,
+    idempotency_key: str,
+    payload: Mapping[str, Any],
+) -> Tuple[int | None, bool]:
+    """Store a verified webhook; returns ``(event_id, created)``.
+
+    A repeated delivery with the same key is acknowledged without a new row.
+    """
+
+    if provider not in PROCESSORS:
+        raise ValueError(f"Unknown payment provider: {provider}")
+    event_id = await session.scalar(
+        insert(PaymentInboxEvent)
+        .values(provider=provider, idempotency_key=idempotency_key, payload=dict(payload))
+        .on_conflict_do_nothing(
+            index_elements=[PaymentInboxEvent.provider, PaymentInboxEvent.idempotency_key]
+        )
+        .returning(PaymentInboxEvent.id)
+    )
+    return event_id, event_id is not None
+
+
+async def claim_payment_events(
+    session: AsyncSession,
+    *,
+    limit: int,
+    max_attempts: int,
+    now: datetime | None = None,
+) -> List[Tuple[int, int]]:
+    """Mark due events as ``processing``; returns ``(id, attempts)`` in id order.
+
+    A claim stays invisible to other workers for a visibility timeout, after
+    which an event left behind by a crashed worker is claimed again, unless
+    it is already out of attempts: such events are moved to ``dead``.
+    """
+
+    now = now or datetime.now(tz=timezone.utc)
+    await session.execute(
+        update(PaymentInboxEvent)
+        .where(
+            PaymentInboxEvent.status == "processing",
+            PaymentInboxEvent.available_at <= now,
+            PaymentInboxEvent.attempts >= max_attempts,
+        )
+        .values(
+            status="dead",
+            updated_at=now,
+            last_error="Claim expired with no attempts left",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    candidates = (
+        select(PaymentInboxEvent.id)
+        .where(
+            PaymentInboxEvent.status.in_(("pending", "processing")),
+            PaymentInboxEvent.available_at <= now,
+        )
+        .order_by(PaymentInboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        update(PaymentInboxEvent)
+        .where(PaymentInboxEvent.id.in_(candidates))
+        .values(
+            status="processing",
+            attempts=PaymentInboxEvent.attempts + 1,
+            available_at=now + timedelta(seconds=_PROCESSING_VISIBILITY_SECONDS),
+            updated_at=now,
+        )
+        .returning(PaymentInboxEvent.id, PaymentInboxEvent.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted((event_id, attempts) for event_id, attempts in result.all())
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(5 * 2 ** max(attempts - 1, 0), _MAX_BACKOFF_SECONDS))
+
+
+async def process_payment_event(event_id: int, attempts: int, *, max_attempts: int) -> str:
+    """Apply one claimed event and return its resulting status.
+
+    The ``processed`` mark is written first and fenced on ``attempts``: if the
+    claim expired and another worker re-claimed the event, nothing is applied.
+    """
+
+    error: Exception | None = None
+    try:
+        async with session_scope() as session:
+            now = datetime.now(tz=timezone.utc)
+            claimed = await session.execute(
+                update(PaymentInboxEvent)
+                .where(
+                    PaymentInboxEvent.id == event_id,
+                    PaymentInboxEvent.status == "processing",
+                    PaymentInboxEvent.attempts == attempts,
+                )
+                .values(status="processed", processed_at=now, updated_at=now, last_error=None)
+                .returning(PaymentInboxEvent.provider, PaymentInboxEvent.payload)
+                .execution_options(synchronize_session=False)
+            )
+            row = claimed.first()
+            if row is None:
+                logger.warning(
+                    "Payment event claim lost", extra={"event_id": event_id, "attempts": attempts}
+                )
+                return "skipped"
+            provider, payload = row
+            await PROCESSORS[provider](session, payload)
+        return "processed"
+    except Exception as exc:
+        error = exc
+
+    dead = isinstance(error, PaymentEventRejected) or attempts >= max_attempts
+    status = "dead" if dead else "pending"
+    now = datetime.now(tz=timezone.utc)
+    async with session_scope() as session:
+        await session.execute(
+            update(PaymentInboxEvent)
+            .where(PaymentInboxEvent.id == event_id, PaymentInboxEvent.attempts == attempts)
+            .values(
+                status=status,
+                available_at=now + _retry_delay(attempts),
+                updated_at=now,
+                last_error=f"{type(error).__name__}: {error}"[:_MAX_RECORDED_ERROR],
+            )
+            .execution_options(synchronize_session=False)
+        )
+    log = logger.error if dead else logger.warning
+    log(
+        "Payment event failed",
+        extra={"event_id": event_id, "attempts": attempts, "status": status, "error": str(error)},
+        exc_info=not isinstance(error, PaymentEventRejected),
+    )
+    return status
+
+
+async def dispatch_payment_events(*, limit: int, max_attempts: int) -> int:
+    """Claim one batch and process it event by event; returns the claimed count."""
+
+    async with session_scope() as session:
+        claimed = await claim_payment_events(
+            session, limit=limit, max_attempts=max_attempts
+        )
+    for event_id, attempts in claimed:
+        await process_payment_event(event_id, attempts, max_attempts=max_attempts)
+    return len(claimed)
+
+
+async def payment_inbox_metrics(
+    session: AsyncSession, *, now: datetime | None = None
+) -> Dict[str, Any]:
+    """Return per-status counts and the age of the oldest unprocessed event."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    counts = dict(
+        (
+            await session.execute(
+                select(PaymentInboxEvent.status, func.count())
+                .where(PaymentInboxEvent.status.in_(("pending", "processing", "dead")))
+                .group_by(PaymentInboxEvent.status)
+            )
+        ).all()
+    )
+    oldest = await session.scalar(
+        select(func.min(PaymentInboxEvent.received_at)).where(
+            PaymentInboxEvent.status.in_(("pending", "processing"))
+        )
+    )
+    if oldest is not None and oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "dead": counts.get("dead", 0),
+        "oldest_received_at": oldest,
+        "lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
+
+
+async def _run_worker(index: int, stop_event: asyncio.Event | None) -> None:
+    settings = get_settings()
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            return
+
+        claimed = 0
+        try:
+            claimed = await dispatch_payment_events(
+                limit=settings.payment_inbox_batch_size,
+                max_attempts=settings.payment_inbox_max_attempts,
+            )
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Payment inbox dispatch failed", extra={"worker": index})
+
+        if claimed < settings.payment_inbox_batch_size:
+            await asyncio.sleep(settings.payment_inbox_poll_interval_seconds)
+
+
+async def run_payment_inbox_workers(stop_event: asyncio.Event | None = None) -> None:
+    """Run ``payment_inbox_workers`` concurrent workers until ``stop_event`` is set."""
+
+    settings = get_settings()
+    logger.info(
+        "Starting payment inbox workers",
+        extra={
+            "workers": settings.payment_inbox_workers,
+            "poll_interval_seconds": settings.payment_inbox_poll_interval_seconds,
+            "batch_size": settings.payment_inbox_batch_size,
+        },
+    )
+    await asyncio.gather(
+        *(_run_worker(index, stop_event) for index in range(settings.payment_inbox_workers))
+    )
+    logger.info("Payment inbox workers stopping")
+
+
+__all__ = [
+    "PROCESSORS",
+    "claim_payment_events",
+    "dispatch_payment_events",
+    "enqueue_payment_event",
+    "payment_inbox_metrics",
+    "process_payment_event",
+    "run_payment_inbox_workers",
+]
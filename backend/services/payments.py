@@ -1,22 +1,36 @@
-"""Payment webhook processing utilities."""
+"""Payment webhook processing utilities.
+
+The ``process_*`` functions apply one verified webhook event stored in the
+payment inbox (see :mod:`backend.services.payment_inbox`). They run inside the
+worker's transaction and are safe to repeat for an event that was already
+applied.
+"""
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Mapping
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.db import LogEntry, Payment, User
+from bot.constants.stars import STARS_PACKAGES_BY_PRODUCT_ID
+from bot.db import Invoice, LogEntry, Payment, User
 from ..logging import get_logger
 from ..models import PaymentWebhookEvent
 from .achievements import evaluate_and_grant_achievements
+from .invoices import expiry_cutoff
 from .nuts import add_nuts
 from .referrals import grant_referral_topup_bonus
 
 logger = get_logger(__name__)
 
 
+class PaymentEventRejected(RuntimeError):
+    """Raised for events that can never be applied; they are not retried."""
+
+
 async def record_payment(
     session: AsyncSession,
     payment_id: str,
@@ -24,45 +38,42 @@ async def record_payment(
     amount: int,
     currency: str,
     payload: Dict[str, Any],
-) -> PaymentWebhookEvent:
-    """Persist the payment webhook event for auditing."""
-
-    # Проверяем, есть ли платеж
-    payment = await session.scalar(
-        select(Payment).where(Payment.provider_payment_id == payment_id)
-    )
-
-    if payment:
-        # Проверяем ивент вебхука
-        event = await session.scalar(
-            select(PaymentWebhookEvent).where(PaymentWebhookEvent.telegram_payment_id == payment_id)
-        )
-        if event:
-            logger.info(
-                "Payment replay detected",
-                extra={"telegram_payment_id": payment_id, "telegram_user_id": telegram_user_id},
-            )
-            return event
+) -> PaymentWebhookEvent | None:
+    """Persist the payment and its webhook event; ``None`` for a replay.
 
-    else:
-        user = await session.scalar(select(User).where(User.tg_id == telegram_user_id))
+    One ``INSERT ... ON CONFLICT (provider_payment_id) DO NOTHING RETURNING``
+    resolves the payer through a CTE and detects replays, including a
+    concurrent duplicate, which waits on the unique index and inserts nothing.
+    """
 
-        payment = Payment(
+    payer = select(User.id).where(User.tg_id == telegram_user_id).limit(1).cte("payer")
+    stmt = (
+        insert(Payment)
+        .add_cte(payer)
+        .values(
             provider="telegram",
             provider_payment_id=payment_id,
-            user_id=user.id if user else None,
+            user_id=select(payer.c.id).scalar_subquery(),
             telegram_id=telegram_user_id,
             amount=amount,
             currency=currency,
             status="received",
             metadata_json=payload,
         )
-        session.add(payment)
-        await session.flush()
+        .on_conflict_do_nothing(index_elements=[Payment.provider_payment_id])
+        .returning(Payment)
+    )
+    payment = await session.scalar(stmt)
+    if payment is None:
+        logger.info(
+            "Payment replay detected",
+            extra={"telegram_payment_id": payment_id, "telegram_user_id": telegram_user_id},
+        )
+        return None
 
     # Регистрируем событие вебхука
     event = PaymentWebhookEvent(
-        payment_id=payment.id,
+        payment=payment,
         telegram_payment_id=payment_id,
         telegram_user_id=telegram_user_id,
         amount=amount,
@@ -83,8 +94,6 @@ async def record_payment(
             data={"payment_id": payment.id, "provider": payment.provider},
         )
     )
-
-    await session.flush()
     return event
 
 
@@ -95,7 +104,7 @@ async def apply_payment_to_user(
     amount: int,
 ) -> None:
     """Increase the user's balance according to the payment amount."""
-    user = await session.scalar(select(User).where(User.tg_id == telegram_user_id))
+    user = await session.get(User, payment.user_id) if payment.user_id else None
 
     if not user:
         logger.info(
@@ -132,9 +141,6 @@ async def apply_payment_to_user(
         },
     )
     payment.status = "applied"
-    payment.user_id = user.id
-
-    await session.flush()
 
     logger.info(
         "User balance updated from payment",
@@ -165,3 +171,269 @@ async def mark_payment_processed(event: PaymentWebhookEvent) -> None:
     if event.payment:
         event.payment.status = "processed"
         event.payment.completed_at = datetime.now(tz=timezone.utc)
+
+
+async def process_telegram_payment(session: AsyncSession, payload: Mapping[str, Any]) -> None:
+    """Record a Telegram payment and credit it to the payer once."""
+
+    event = await record_payment(
+        session,
+        payment_id=payload["payment_id"],
+        telegram_user_id=payload["telegram_user_id"],
+        amount=payload["amount"],
+        currency=payload["currency"],
+        payload=payload.get("payload") or {},
+    )
+    if event is None:
+        return
+
+    await apply_payment_to_user(
+        session, event.payment, payload["telegram_user_id"], payload["amount"]
+    )
+    await mark_payment_processed(event)
+    logger.info(
+        "Payment webhook processed",
+        extra={
+            "payment_id": payload["payment_id"],
+            "telegram_user_id": payload["telegram_user_id"],
+            "amount": payload["amount"],
+        },
+    )
+
+
+async def process_stars_payment(session: AsyncSession, payload: Mapping[str, Any]) -> None:
+    """Mark a Stars invoice as paid and credit its nuts once."""
+
+    invoice = await session.scalar(
+        select(Invoice).where(Invoice.provider_invoice_id == payload["invoice_id"])
+    )
+    if not invoice:
+        raise PaymentEventRejected("Invoice not found")
+
+    user = await session.get(User, invoice.user_id)
+    if not user:
+        raise PaymentEventRejected("User not found")
+
+    package = STARS_PACKAGES_BY_PRODUCT_ID.get(payload["product_id"])
+    if not package:
+        raise PaymentEventRejected("Unknown product id")
+
+    if invoice.telegram_id != payload["telegram_user_id"]:
+        raise PaymentEventRejected("User mismatch")
+
+    stored_product = (invoice.metadata_json or {}).get("product_id") if invoice.metadata_json else None
+    if stored_product and stored_product != payload["product_id"]:
+        raise PaymentEventRejected("Product mismatch")
+
+    if invoice.status == "paid":
+        return
+
+    invoice.status = "paid"
+    invoice.paid_at = datetime.now(tz=timezone.utc)
+    metadata = dict(invoice.metadata_json or {})
+    metadata.update(
+        {
+            "package_code": package.code,
+            "product_id": payload["product_id"],
+            "stars_amount": payload["stars_amount"],
+            "payload": payload.get("payload") or {},
+        }
+    )
+    invoice.metadata_json = metadata
+
+    await add_nuts(
+        session,
+        user=user,
+        amount=invoice.amount_nuts,
+        source="stars",
+        transaction_type="stars",
+        invoice_id=invoice.id,
+        metadata={
+            "package_code": package.code,
+            "product_id": payload["product_id"],
+            "stars_amount": payload["stars_amount"],
+        },
+    )
+
+    await grant_referral_topup_bonus(
+        session,
+        payer=user,
+        nuts_amount=invoice.amount_nuts,
+        invoice=invoice,
+    )
+
+    await evaluate_and_grant_achievements(
+        session,
+        user=user,
+        trigger="stars_topup",
+        payload={
+            "invoice_id": invoice.id,
+            "provider_invoice_id": payload["invoice_id"],
+            "product_id": payload["product_id"],
+            "stars_amount": payload["stars_amount"],
+        },
+    )
+    logger.info(
+        "Stars invoice paid",
+        extra={
+            "invoice_id": payload["invoice_id"],
+            "product_id": payload["product_id"],
+            "telegram_user_id": payload["telegram_user_id"],
+        },
+    )
+
+
+async def process_wallet_payment(session: AsyncSession, payload: Mapping[str, Any]) -> None:
+    """Apply a Wallet Pay invoice status change."""
+
+    wallet_payload = payload["payload"]
+    invoice = await session.scalar(
+        select(Invoice).where(
+            Invoice.external_invoice_id == wallet_payload["external_invoice_id"]
+        )
+    )
+    if not invoice:
+        raise PaymentEventRejected("Invoice not found")
+
+    user = await session.get(User, invoice.user_id)
+    if not user:
+        raise PaymentEventRejected("User not found")
+
+    now = datetime.now(tz=timezone.utc)
+    normalized_status = wallet_payload["status"].lower()
+    # Overdue invoices are never credited, whether this webhook or the sweeper
+    # expires them first.
+    if _expire_if_overdue(invoice, now) or invoice.status == "expired":
+        if normalized_status == "paid":
+            logger.warning(
+                "Wallet payment for expired invoice ignored",
+                extra={
+                    "invoice_id": invoice.id,
+                    "external_invoice_id": invoice.external_invoice_id,
+                },
+            )
+        return
+
+    metadata = dict(invoice.metadata_json or {})
+    metadata["wallet_payload"] = dict(payload)
+    invoice.metadata_json = metadata
+
+    if normalized_status == "paid":
+        if invoice.status == "paid":
+            return
+        invoice.status = "paid"
+        invoice.paid_at = now
+        paid_ton_amount, nuts_to_add_decimal = _calculate_wallet_nuts(
+            invoice, wallet_payload.get("amount")
+        )
+        metadata.update(
+            {
+                "wallet_paid_ton_amount": str(paid_ton_amount),
+                "wallet_nuts_calculated": str(nuts_to_add_decimal),
+            }
+        )
+        invoice.metadata_json = metadata
+        nuts_amount = int(nuts_to_add_decimal)
+        audit_metadata = {
+            "external_invoice_id": invoice.external_invoice_id,
+            "currency_amount": str(paid_ton_amount),
+            "currency_code": invoice.currency_code,
+            "wallet_paid_ton_amount": str(paid_ton_amount),
+            "wallet_nuts_calculated": str(nuts_to_add_decimal),
+        }
+        audit_metadata = {k: v for k, v in audit_metadata.items() if v is not None}
+        await add_nuts(
+            session,
+            user=user,
+            amount=nuts_amount,
+            source="ton",
+            transaction_type="ton",
+            invoice_id=invoice.id,
+            metadata=audit_metadata,
+            rate_snapshot=_compose_rate_snapshot(invoice),
+        )
+
+        await grant_referral_topup_bonus(
+            session,
+            payer=user,
+            nuts_amount=nuts_amount,
+            invoice=invoice,
+        )
+
+        await evaluate_and_grant_achievements(
+            session,
+            user=user,
+            trigger="wallet_topup",
+            payload={
+                "invoice_id": invoice.id,
+                "external_invoice_id": invoice.external_invoice_id,
+                "wallet_status": normalized_status,
+                "paid_amount": str(paid_ton_amount),
+                "wallet_payload": dict(wallet_payload),
+            },
+        )
+        logger.info(
+            "Wallet invoice paid",
+            extra={
+                "invoice_id": invoice.id,
+                "external_invoice_id": invoice.external_invoice_id,
+            },
+        )
+    elif normalized_status in {"cancelled", "canceled"}:
+        if invoice.status not in {"paid", "cancelled", "expired"}:
+            invoice.status = "cancelled"
+            invoice.cancelled_at = now
+            logger.info(
+                "Wallet invoice cancelled",
+                extra={
+                    "invoice_id": invoice.id,
+                    "external_invoice_id": invoice.external_invoice_id,
+                },
+            )
+
+
+def _expire_if_overdue(invoice: Invoice, now: datetime) -> bool:
+    if invoice.status != "pending":
+        return False
+    expires_at = invoice.expires_at
+    if expires_at is not None and expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if expires_at and expires_at < expiry_cutoff(now):
+        invoice.status = "expired"
+        invoice.cancelled_at = now
+        return True
+    return False
+
+
+def _compose_rate_snapshot(invoice: Invoice) -> Dict[str, Any]:
+    snapshot: Dict[str, Any] = {}
+    if invoice.rate_snapshot:
+        snapshot.update(invoice.rate_snapshot)
+    if invoice.ton_rate_at_invoice is not None:
+        snapshot.setdefault("ton_rate_at_invoice", str(Decimal(invoice.ton_rate_at_invoice)))
+    return snapshot
+
+
+def _calculate_wallet_nuts(invoice: Invoice, amount: Any) -> tuple[Decimal, Decimal]:
+    paid_ton = _resolve_paid_ton_amount(invoice, amount)
+    if invoice.ton_rate_at_invoice is None:
+        raise PaymentEventRejected("TON rate missing on invoice")
+    ton_rate = Decimal(str(invoice.ton_rate_at_invoice))
+    nuts_to_add = paid_ton * ton_rate
+    if nuts_to_add % Decimal("1") != 0:
+        raise PaymentEventRejected("Computed nuts amount must be a whole number")
+    return paid_ton, nuts_to_add
+
+
+def _resolve_paid_ton_amount(invoice: Invoice, amount: Any) -> Decimal:
+    if amount is not None:
+        raw_amount: Any = amount
+    elif invoice.currency_amount is not None:
+        raw_amount = str(invoice.currency_amount)
+    else:
+        raise PaymentEventRejected("TON amount missing from payload and invoice")
+
+    try:
+        return Decimal(str(raw_amount))
+    except (InvalidOperation, TypeError) as exc:  # pragma: no cover - defensive
+        raise PaymentEventRejected("Invalid TON amount provided") from exc
@@ -0,0 +1,111 @@
+"""Typed storage for per-player playtime used by achievement conditions.
+
+Playtime arrives from two places: Firebase ``playerTimes`` (pulled by the bot's
+Firebase sync loop) and ``/game/progress/push`` payloads. Both write the
+``player_playtime`` table, so ``TIME_IN_GAME_AT_LEAST`` is a plain indexed
+integer compare instead of a JSONB key hunt.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Mapping
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import PlayerPlaytime
+
+PLAYTIME_PROGRESS_KEYS = (
+    "time_in_game",
+    "timeInGame",
+    "play_time",
+    "playTime",
+    "playtime",
+    "minutes_played",
+)
+
+_UPSERT_CHUNK_SIZE = 1000
+
+
+def extract_playtime_minutes(progress: Mapping[str, Any] | None) -> int | None:
+    """Return playtime minutes from a Roblox progress payload, if present."""
+
+    if not isinstance(progress, Mapping):
+        return None
+
+    for key in PLAYTIME_PROGRESS_KEYS:
+        value = progress.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return int(value)
+    return None
+
+
+async def upsert_playtime(
+    session: AsyncSession,
+    minutes_by_roblox_id: Mapping[str, int],
+    *,
+    source: str,
+    observed_at: datetime | None = None,
+) -> None:
+    """Store playtime for many players with multi-row upserts.
+
+    Playtime only grows, so a row is rewritten only when the new value is
+    larger; stale or repeated reports do not touch the table.
+    """
+
+    if not minutes_by_roblox_id:
+        return
+
+    observed_at = observed_at or datetime.now(tz=timezone.utc)
+    # Keyed by the normalised id: one statement may not touch a row twice.
+    latest = {
+        str(roblox_id): max(int(minutes), 0)
+        for roblox_id, minutes in minutes_by_roblox_id.items()
+    }
+    rows = [
+        {
+            "roblox_user_id": roblox_id,
+            "minutes": minutes,
+            "source": source,
+            "updated_at": observed_at,
+        }
+        for roblox_id, minutes in latest.items()
+    ]
+
+    for start in range(0, len(rows), _UPSERT_CHUNK_SIZE):
+        stmt = insert(PlayerPlaytime).values(rows[start : start + _UPSERT_CHUNK_SIZE])
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[PlayerPlaytime.roblox_user_id],
+                set_={
+                    "minutes": stmt.excluded.minutes,
+                    "source": stmt.excluded.source,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+                where=stmt.excluded.minutes > PlayerPlaytime.minutes,
+            )
+        )
+
+
+async def load_playtime_minutes(
+    session: AsyncSession, roblox_user_id: str | None
+) -> int | None:
+    """Return the stored playtime for a Roblox user."""
+
+    if not roblox_user_id:
+        return None
+
+    return await session.scalar(
+        select(PlayerPlaytime.minutes).where(
+            PlayerPlaytime.roblox_user_id == str(roblox_user_id)
+        )
+    )
+
+
+__all__ = [
+    "PLAYTIME_PROGRESS_KEYS",
+    "extract_playtime_minutes",
+    "load_playtime_minutes",
+    "upsert_playtime",
+]
@@ -0,0 +1,262 @@
+"""Storage helpers for Roblox game progress snapshots.
+
+Snapshots are written with a single ``INSERT ... ON CONFLICT DO UPDATE``.
+Records carrying a client ``version`` only replace a stored snapshot with a
+lower version; the guard lives in the statement's ``WHERE`` clause, so a stale
+write simply returns no row and needs no extra read. Records without a
+version always apply and bump the stored one.
+
+Deltas are RFC 7396 merge patches against ``base_version``. They are applied
+in Postgres by ``jsonb_merge_patch`` inside one ``UPDATE ... FROM (VALUES ...)``
+that only matches rows still at ``base_version``.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from sqlalchemy import Integer, String, column, func, update, values
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import GameProgress
+
+
+class StaleProgressError(RuntimeError):
+    """Raised when a versioned push is not newer than the stored snapshot."""
+
+    def __init__(self, roblox_user_id: str, version: int, message: str | None = None) -> None:
+        super().__init__(
+            message
+            or f"Progress version {version} for {roblox_user_id} is not newer than the stored one"
+        )
+        self.roblox_user_id = roblox_user_id
+        self.version = version
+
+
+def _upsert_statement(rows: List[Dict[str, Any]], *, explicit_version: bool):
+    stmt = insert(GameProgress).values(rows)
+    if explicit_version:
+        version = stmt.excluded.version
+        where = GameProgress.version < stmt.excluded.version
+    else:
+        version = GameProgress.version + 1
+        where = None
+    return stmt.on_conflict_do_update(
+        index_elements=[GameProgress.roblox_user_id],
+        set_={
+            GameProgress.progress: stmt.excluded.progress,
+            GameProgress.version: version,
+            GameProgress.metadata_json: stmt.excluded["metadata"],
+            GameProgress.updated_at: stmt.excluded.updated_at,
+        },
+        where=where,
+    ).returning(GameProgress.roblox_user_id, GameProgress.version, GameProgress.updated_at)
+
+
+def _row(roblox_user_id: str, record: Mapping[str, Any], now: datetime) -> Dict[str, Any]:
+    version: Optional[int] = record.get("version")
+    return {
+        "roblox_user_id": roblox_user_id,
+        "progress": record["progress"],
+        "version": version if version is not None else 1,
+        "metadata_json": record.get("metadata"),
+        "updated_at": now,
+    }
+
+
+async def upsert_progress(
+    session: AsyncSession,
+    *,
+    roblox_user_id: str,
+    progress: Mapping[str, Any],
+    version: Optional[int] = None,
+    metadata: Optional[Mapping[str, Any]] = None,
+    now: datetime,
+) -> Dict[str, Any]:
+    """Store one snapshot and return its ``version`` and ``updated_at``.
+
+    Raises :class:`StaleProgressError` when ``version`` is not newer than the
+    stored snapshot.
+    """
+
+    record = {"progress": progress, "version": version, "metadata": metadata}
+    result = await session.execute(
+        _upsert_statement(
+            [_row(roblox_user_id, record, now)], explicit_version=version is not None
+        )
+    )
+    rows = result.all()
+    if not rows:
+        raise StaleProgressError(roblox_user_id, version)
+    _, stored_version, updated_at = rows[0]
+    return {"roblox_user_id": roblox_user_id, "version": stored_version, "updated_at": updated_at}
+
+
+async def upsert_progress_batch(
+    session: AsyncSession,
+    records: Sequence[Mapping[str, Any]],
+    *,
+    now: datetime,
+) -> tuple[List[Dict[str, Any]], List[str]]:
+    """Upsert many snapshots with multi-row ``INSERT ... ON CONFLICT``.
+
+    ``records`` hold ``roblox_user_id``, ``progress`` and optional ``version``
+    and ``metadata``; a later record for the same player replaces an earlier
+    one. Returns the stored ``roblox_user_id``/``version``/``updated_at`` rows
+    and the ids whose versioned record was stale.
+    """
+
+    latest: Dict[str, Mapping[str, Any]] = {}
+    for record in records:
+        latest[str(record["roblox_user_id"])] = record
+
+    versioned: List[Dict[str, Any]] = []
+    unversioned: List[Dict[str, Any]] = []
+    for roblox_user_id, record in latest.items():
+        row = _row(roblox_user_id, record, now)
+        (versioned if record.get("version") is not None else unversioned).append(row)
+
+    stored: List[Dict[str, Any]] = []
+    for rows, explicit_version in ((versioned, True), (unversioned, False)):
+        if not rows:
+            continue
+        result = await session.execute(
+            _upsert_statement(rows, explicit_version=explicit_version)
+        )
+        stored.extend(
+            {"roblox_user_id": roblox_user_id, "version": version, "updated_at": updated_at}
+            for roblox_user_id, version, updated_at in result.all()
+        )
+
+    written = {row["roblox_user_id"] for row in stored}
+    stale = [row["roblox_user_id"] for row in versioned if row["roblox_user_id"] not in written]
+    return stored, stale
+
+
+def _patch_statement(rows: List[Dict[str, Any]], *, now: datetime):
+    patches = values(
+        column("roblox_user_id", String),
+        column("patch", JSONB),
+        column("base_version", Integer),
+        column("version", Integer),
+        column("metadata", JSONB),
+        name="patches",
+    ).data(
+        [
+            (
+                row["roblox_user_id"],
+                row["patch"],
+                row["base_version"],
+                row["version"],
+                row["metadata"],
+            )
+            for row in rows
+        ]
+    )
+    return (
+        update(GameProgress)
+        .where(
+            GameProgress.roblox_user_id == patches.c.roblox_user_id,
+            GameProgress.version == patches.c.base_version,
+        )
+        .values(
+            progress=func.jsonb_merge_patch(GameProgress.progress, patches.c.patch),
+            version=patches.c.version,
+            metadata_json=patches.c.metadata,
+            updated_at=now,
+        )
+        .returning(
+            GameProgress.roblox_user_id,
+            GameProgress.version,
+            GameProgress.updated_at,
+            GameProgress.progress,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_progress_patches(
+    session: AsyncSession,
+    records: Sequence[Mapping[str, Any]],
+    *,
+    now: datetime,
+) -> tuple[List[Dict[str, Any]], List[str]]:
+    """Apply merge-patch records to snapshots that are still at their base version.
+
+    ``records`` hold ``roblox_user_id``, ``patch``, ``base_version`` and
+    optional ``version`` (defaults to ``base_version + 1``) and ``metadata``.
+    Returns the stored rows, including the merged ``progress``, and the ids
+    whose base version no longer matched.
+    """
+
+    latest: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        base_version = record["base_version"]
+        version = record.get("version")
+        latest[str(record["roblox_user_id"])] = {
+            "roblox_user_id": str(record["roblox_user_id"]),
+            "patch": record["patch"],
+            "base_version": base_version,
+            "version": version if version is not None else base_version + 1,
+            "metadata": record.get("metadata"),
+        }
+    if not latest:
+        return [], []
+
+    result = await session.execute(_patch_statement(list(latest.values()), now=now))
+    stored = [
+        {
+            "roblox_user_id": roblox_user_id,
+            "version": version,
+            "updated_at": updated_at,
+            "progress": progress,
+        }
+        for roblox_user_id, version, updated_at, progress in result.all()
+    ]
+    written = {row["roblox_user_id"] for row in stored}
+    return stored, [roblox_user_id for roblox_user_id in latest if roblox_user_id not in written]
+
+
+async def apply_progress_patch(
+    session: AsyncSession,
+    *,
+    roblox_user_id: str,
+    patch: Mapping[str, Any],
+    base_version: int,
+    version: Optional[int] = None,
+    metadata: Optional[Mapping[str, Any]] = None,
+    now: datetime,
+) -> Dict[str, Any]:
+    """Apply one merge patch; raises :class:`StaleProgressError` on a base mismatch."""
+
+    stored, stale = await apply_progress_patches(
+        session,
+        [
+            {
+                "roblox_user_id": roblox_user_id,
+                "patch": patch,
+                "base_version": base_version,
+                "version": version,
+                "metadata": metadata,
+            }
+        ],
+        now=now,
+    )
+    if stale:
+        raise StaleProgressError(
+            roblox_user_id,
+            base_version,
+            f"Stored progress for {roblox_user_id} is not at base version {base_version}; "
+            "send the full snapshot",
+        )
+    return stored[0]
+
+
+__all__ = [
+    "StaleProgressError",
+    "apply_progress_patch",
+    "apply_progress_patches",
+    "upsert_progress",
+    "upsert_progress_batch",
+]
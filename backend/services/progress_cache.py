@@ -0,0 +1,181 @@
+"""Read-through cache for pulled progress snapshots.
+
+Entries are keyed by ``roblox_user_id`` and hold the JSON-ready pull
+response. With ``REDIS_URL`` set the cache lives in Redis and is shared by
+every backend process. Without Redis a push handled by one replica cannot
+invalidate another replica's copy, so the cache is disabled unless
+``BACKEND_PROGRESS_CACHE_LOCAL=1`` declares a single backend process, in which
+case it is an in-process LRU.
+
+Pushes call :func:`invalidate` before writing and again once the write has
+committed. It replaces the entry with a short-lived tombstone instead of
+deleting it. :func:`store` only writes absent keys, so a pull that read the old
+row before the push committed cannot put it back.
+"""
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from ..cache import get_redis
+from ..config import get_settings
+from ..logging import get_logger
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "progress:pull:"
+TOMBSTONE = "-"
+
+
+def etag_for(version: int) -> str:
+    """Return the strong ETag of a stored snapshot version."""
+
+    return f'"v{version}"'
+
+
+class _MemoryBackend:
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def _live(self, key: str) -> Optional[str]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._live(key)
+
+    async def set_if_absent(self, key: str, value: str, ttl_seconds: float) -> None:
+        if self._live(key) is not None:
+            return
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._trim()
+
+    async def set_many(self, keys: Iterable[str], value: str, ttl_seconds: float) -> None:
+        expires_at = time.monotonic() + ttl_seconds
+        for key in keys:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+        self._trim()
+
+    def _trim(self) -> None:
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+class _RedisBackend:
+    def __init__(self, redis: Any) -> None:
+        self._redis = redis
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+
+    async def set_if_absent(self, key: str, value: str, ttl_seconds: float) -> None:
+        await self._redis.set(key, value, px=int(ttl_seconds * 1000), nx=True)
+
+    async def set_many(self, keys: Iterable[str], value: str, ttl_seconds: float) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, value, px=int(ttl_seconds * 1000))
+            await pipe.execute()
+
+    async def close(self) -> None:
+        """The shared client is closed by :func:`backend.cache.close_redis`."""
+
+
+class _DisabledBackend:
+    async def get(self, key: str) -> Optional[str]:
+        return None
+
+    async def set_if_absent(self, key: str, value: str, ttl_seconds: float) -> None:
+        return None
+
+    async def set_many(self, keys: Iterable[str], value: str, ttl_seconds: float) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+_backend: Any = None
+
+
+def _get_backend() -> Any:
+    global _backend
+    if _backend is None:
+        redis = get_redis()
+        settings = get_settings()
+        if redis is not None:
+            _backend = _RedisBackend(redis)
+        elif settings.progress_cache_local:
+            _backend = _MemoryBackend(settings.progress_cache_max_entries)
+        else:
+            logger.info(
+                "REDIS_URL is not set; progress cache disabled "
+                "(set BACKEND_PROGRESS_CACHE_LOCAL=1 for a single backend process)"
+            )
+            _backend = _DisabledBackend()
+    return _backend
+
+
+async def lookup(roblox_user_id: str) -> Optional[Dict[str, Any]]:
+    """Return the cached pull response, or ``None`` on a miss or tombstone."""
+
+    try:
+        raw = await _get_backend().get(KEY_PREFIX + roblox_user_id)
+    except Exception:  # pragma: no cover - cache outages fall back to the database
+        logger.warning("Progress cache lookup failed", exc_info=True)
+        return None
+    if raw is None or raw == TOMBSTONE:
+        return None
+    return json.loads(raw)
+
+
+async def store(roblox_user_id: str, response: Dict[str, Any]) -> None:
+    """Cache a pull response unless the key is present or tombstoned."""
+
+    ttl = get_settings().progress_cache_ttl_seconds
+    if ttl <= 0:
+        return
+    try:
+        await _get_backend().set_if_absent(
+            KEY_PREFIX + roblox_user_id, json.dumps(response, default=str), ttl
+        )
+    except Exception:  # pragma: no cover - cache outages fall back to the database
+        logger.warning("Progress cache store failed", exc_info=True)
+
+
+async def invalidate(roblox_user_ids: Iterable[str]) -> None:
+    """Drop cached snapshots of pushed players until their write has committed."""
+
+    keys = [KEY_PREFIX + roblox_user_id for roblox_user_id in roblox_user_ids]
+    if not keys:
+        return
+    try:
+        await _get_backend().set_many(
+            keys, TOMBSTONE, get_settings().progress_cache_tombstone_seconds
+        )
+    except Exception:  # pragma: no cover - logged; entries still expire by TTL
+        logger.warning("Progress cache invalidation failed", exc_info=True)
+
+
+async def close() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+__all__ = ["close", "etag_for", "invalidate", "lookup", "store"]
@@ -1,22 +1,20 @@
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple
+from typing import Tuple
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from bot.db import Invoice, LogEntry, Payment, Referral, User
+from bot.db import Invoice, LogEntry, Payment, Referral, ReferralTopupBonus, User
 from bot.utils.referrals import DEFAULT_REFERRAL_TOPUP_SHARE_PERCENT
 
 from ..logging import get_logger
 from .achievements import evaluate_and_grant_achievements
+from .notifications import enqueue_notification
 from .nuts import add_nuts
-from .telegram import TelegramNotificationError, send_message
 
 logger = get_logger(__name__)
 
-_REFERRAL_METADATA_KEY = "referral_bonus_topups"
-
 
 async def grant_referral_topup_bonus(
     session: AsyncSession,
@@ -26,7 +24,12 @@ async def grant_referral_topup_bonus(
     payment: Payment | None = None,
     invoice: Invoice | None = None,
 ) -> None:
-    """Grant a referral bonus for a balance top-up if applicable."""
+    """Grant a referral bonus for a balance top-up if applicable.
+
+    The bonus is claimed by inserting its ``referral_topup_bonuses`` row first;
+    the unique ``(source_kind, source_id)`` key makes a replayed or concurrent
+    webhook for the same payment or invoice a no-op.
+    """
 
     if nuts_amount <= 0:
         return
@@ -53,16 +56,37 @@ async def grant_referral_topup_bonus(
     if bonus_amount <= 0:
         return
 
-    source_target, source_kind, source_id, request_id = _resolve_source(payment, invoice)
-    metadata_bundle = None
-    if source_target is not None:
-        metadata_bundle = _load_referral_metadata(source_target)
-        if _has_bonus_record(metadata_bundle.records, source_kind, source_id):
-            logger.info(
-                "Referral bonus already granted for source",
-                extra={"source_kind": source_kind, "source_id": source_id},
-            )
-            return
+    source_kind, source_id, request_id = _resolve_source(payment, invoice)
+    if source_id is None:
+        logger.warning(
+            "Skipping referral bonus without a payment or invoice",
+            extra={"user_id": payer.id, "referral_id": referral.id},
+        )
+        return
+
+    claimed = await session.scalar(
+        insert(ReferralTopupBonus)
+        .values(
+            source_kind=source_kind,
+            source_id=source_id,
+            referral_id=referral.id,
+            referrer_id=referrer.id,
+            referred_user_id=payer.id,
+            credited_amount=nuts_amount,
+            bonus_amount=bonus_amount,
+            percent=DEFAULT_REFERRAL_TOPUP_SHARE_PERCENT,
+        )
+        .on_conflict_do_nothing(
+            index_elements=[ReferralTopupBonus.source_kind, ReferralTopupBonus.source_id]
+        )
+        .returning(ReferralTopupBonus.id)
+    )
+    if claimed is None:
+        logger.info(
+            "Referral bonus already granted for source",
+            extra={"source_kind": source_kind, "source_id": source_id},
+        )
+        return
 
     bonus_metadata = {
         "referral_id": referral.id,
@@ -108,18 +132,6 @@ async def grant_referral_topup_bonus(
         },
     )
 
-    if metadata_bundle is not None:
-        _append_bonus_record(
-            source_target,
-            metadata_bundle,
-            source_kind,
-            source_id,
-            payer,
-            referrer,
-            nuts_amount,
-            bonus_amount,
-        )
-
     notification_text = _format_notification_text(payer, nuts_amount, bonus_amount)
     log_payload = {
         "referral_id": referral.id,
@@ -161,20 +173,18 @@ async def grant_referral_topup_bonus(
         )
     )
 
-    try:
-        await send_message(referrer.tg_id, notification_text)
-    except TelegramNotificationError:
-        logger.warning(
-            "Failed to notify referrer about bonus",
-            extra={
-                "referrer_id": referrer.id,
-                "referrer_tg_id": referrer.tg_id,
-                "referred_id": payer.id,
-                "source_kind": source_kind,
-                "source_id": source_id,
-            },
-            exc_info=True,
-        )
+    enqueue_notification(
+        session,
+        chat_id=referrer.tg_id,
+        user_id=referrer.id,
+        kind="referral_topup_bonus",
+        message=notification_text,
+        payload={
+            "referred_id": payer.id,
+            "source_kind": source_kind,
+            "source_id": source_id,
+        },
+    )
 
 
 def _format_notification_text(payer: User, nuts_amount: int, bonus_amount: int) -> str:
@@ -196,66 +206,14 @@ async def _load_confirmed_referral(
     return await session.scalar(stmt)
 
 
-class _MetadataBundle:
-    def __init__(self, metadata: Dict[str, Any], records: List[Dict[str, Any]]):
-        self.metadata = metadata
-        self.records = records
-
-
-def _load_referral_metadata(target: Payment | Invoice) -> _MetadataBundle:
-    metadata = dict(getattr(target, "metadata_json", {}) or {})
-    raw_records = metadata.get(_REFERRAL_METADATA_KEY)
-    records: List[Dict[str, Any]]
-    if isinstance(raw_records, list):
-        records = list(raw_records)
-    else:
-        records = []
-    return _MetadataBundle(metadata, records)
-
-
-def _has_bonus_record(records: List[Dict[str, Any]], kind: str, identifier: int | None) -> bool:
-    if identifier is None:
-        return False
-    return any(
-        record.get("kind") == kind and record.get("id") == identifier for record in records
-    )
-
-
-def _append_bonus_record(
-    target: Payment | Invoice,
-    bundle: _MetadataBundle,
-    kind: str,
-    identifier: int | None,
-    payer: User,
-    referrer: User,
-    nuts_amount: int,
-    bonus_amount: int,
-) -> None:
-    if identifier is None:
-        return
-    record = {
-        "kind": kind,
-        "id": identifier,
-        "bonus_amount": bonus_amount,
-        "credited_amount": nuts_amount,
-        "percent": DEFAULT_REFERRAL_TOPUP_SHARE_PERCENT,
-        "referrer_id": referrer.id,
-        "referred_user_id": payer.id,
-        "granted_at": datetime.now(tz=timezone.utc).isoformat(),
-    }
-    bundle.records.append(record)
-    bundle.metadata[_REFERRAL_METADATA_KEY] = bundle.records
-    target.metadata_json = bundle.metadata
-
-
 def _resolve_source(
     payment: Payment | None, invoice: Invoice | None
-) -> Tuple[Payment | Invoice | None, str, int | None, str | None]:
+) -> Tuple[str, int | None, str | None]:
     if payment is not None:
-        return payment, "payment", payment.id, payment.request_id
+        return "payment", payment.id, payment.request_id
     if invoice is not None:
-        return invoice, "invoice", invoice.id, invoice.request_id
-    return None, "unknown", None, None
+        return "invoice", invoice.id, invoice.request_id
+    return "unknown", None, None
 
 
 __all__ = ["grant_referral_topup_bonus"]
\ No newline at end of file
@@ -1,37 +1,362 @@
-"""Utilities for synchronising state with Roblox services."""
+"""Outbox for state that has to be pushed to Roblox.
+
+Progress events are written to ``roblox_sync_events`` inside the caller's
+transaction and coalesced per ``(roblox_user_id, action)`` while pending, so
+only the latest payload is delivered. A dispatcher claims due rows with
+``FOR UPDATE SKIP LOCKED``, posts them in batches to the configured Roblox
+Open Cloud endpoint, records the response, and compacts delivered rows once
+they are older than the retention window.
+
+Grants do not go through the outbox; servers pull them from
+:mod:`backend.services.grants`.
+"""
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
+import httpx
+from sqlalchemy import and_, delete, exists, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..config import get_settings
+from ..database import session_scope
 from ..logging import get_logger
 from ..models import RobloxSyncEvent
 
 logger = get_logger(__name__)
 
+DEFAULT_OPEN_CLOUD_BASE_URL = "https://apis.roblox.com"
+_SENDING_VISIBILITY_SECONDS = 60
+_MAX_BACKOFF_SECONDS = 900
+_MAX_RECORDED_BODY = 2000
+_COMPACTION_INTERVAL_SECONDS = 600
+_COMPACTED_STATUSES = ("delivered", "discarded")
+
+
+class RobloxSyncError(RuntimeError):
+    """Raised when Roblox rejects or does not answer a sync batch."""
+
+    def __init__(self, message: str, response: Optional[Dict[str, Any]] = None) -> None:
+        super().__init__(message)
+        self.response = response
+
 
 async def sync_progress(session, roblox_user_id: str, payload: Dict[str, Any]) -> None:
-    """Persist a record describing the sync operation.
+    """Queue the latest progress of a player for delivery to Roblox."""
+    await sync_progress_batch(session, {roblox_user_id: payload})
 
-    Real integration would call the Roblox API; for now we store a record so the
-    action can be traced and retried by operators.
+
+async def sync_progress_batch(session, payloads: Mapping[str, Dict[str, Any]]) -> None:
+    """Queue progress for many players, replacing their still-pending payloads."""
+    if not payloads:
+        return
+
+    now = datetime.now(tz=timezone.utc)
+    stmt = insert(RobloxSyncEvent).values(
+        [
+            {
+                "roblox_user_id": roblox_user_id,
+                "action": "progress",
+                "payload": payload,
+                "updated_at": now,
+            }
+            for roblox_user_id, payload in payloads.items()
+        ]
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[RobloxSyncEvent.roblox_user_id, RobloxSyncEvent.action],
+            index_where=text("status = 'pending' AND action = 'progress'"),
+            set_={
+                RobloxSyncEvent.payload: stmt.excluded.payload,
+                RobloxSyncEvent.updated_at: stmt.excluded.updated_at,
+            },
+        )
+    )
+    logger.info(
+        "Roblox sync enqueued",
+        extra={"action": "progress", "roblox_user_ids": list(payloads)},
+    )
+
+
+async def claim_sync_events(
+    session: AsyncSession,
+    *,
+    limit: int,
+    now: datetime | None = None,
+) -> List[RobloxSyncEvent]:
+    """Mark a batch of due events as ``sending`` and return them in id order.
+
+    Claimed rows become visible again after a timeout, so a dispatcher that
+    crashes mid-batch does not lose them.
     """
-    await _store_sync_event(session, roblox_user_id, "progress", payload)
 
+    now = now or datetime.now(tz=timezone.utc)
+    candidates = (
+        select(RobloxSyncEvent.id)
+        .where(
+            RobloxSyncEvent.status.in_(("pending", "sending")),
+            RobloxSyncEvent.available_at <= now,
+        )
+        .order_by(RobloxSyncEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(RobloxSyncEvent)
+        .where(RobloxSyncEvent.id.in_(candidates))
+        .values(
+            status="sending",
+            attempts=RobloxSyncEvent.attempts + 1,
+            available_at=now + timedelta(seconds=_SENDING_VISIBILITY_SECONDS),
+            updated_at=now,
+        )
+        .returning(RobloxSyncEvent)
+        .execution_options(synchronize_session=False)
+    )
+    events = (await session.scalars(stmt)).all()
+    return sorted(events, key=lambda event: event.id)
+
+
+def _sync_url() -> str:
+    settings = get_settings()
+    base_url = settings.roblox_api_base_url or DEFAULT_OPEN_CLOUD_BASE_URL
+    return base_url.rstrip("/") + settings.roblox_sync_path
+
+
+def _recorded_response(response: httpx.Response) -> Dict[str, Any]:
+    try:
+        body: Any = response.json()
+    except ValueError:
+        body = response.text[:_MAX_RECORDED_BODY]
+    return {"status_code": response.status_code, "body": body}
+
+
+async def deliver_sync_batch(
+    client: httpx.AsyncClient, events: Sequence[RobloxSyncEvent]
+) -> Dict[str, Any]:
+    """Post one batch of events to Roblox and return the recorded response."""
+
+    headers: Dict[str, str] = {}
+    api_key = get_settings().roblox_open_cloud_api_key
+    if api_key:
+        headers["x-api-key"] = api_key
+
+    body = {
+        "events": [
+            {
+                "id": event.id,
+                "roblox_user_id": event.roblox_user_id,
+                "action": event.action,
+                "payload": event.payload,
+            }
+            for event in events
+        ]
+    }
+    try:
+        response = await client.post(_sync_url(), json=body, headers=headers)
+    except httpx.HTTPError as exc:
+        raise RobloxSyncError(f"Roblox sync request failed: {exc}") from exc
 
-async def sync_grant(session, roblox_user_id: str, payload: Dict[str, Any]) -> None:
-    """Record reward grants intended for Roblox delivery."""
-    await _store_sync_event(session, roblox_user_id, "grant", payload)
+    recorded = _recorded_response(response)
+    if response.is_error:
+        raise RobloxSyncError(f"Roblox responded with HTTP {response.status_code}", recorded)
+    return recorded
 
 
-async def _store_sync_event(session, roblox_user_id: str, action: str, payload: Dict[str, Any]) -> None:
-    event = RobloxSyncEvent(roblox_user_id=roblox_user_id, action=action, payload=payload)
-    session.add(event)
-    await session.flush()
+def _has_pending_progress_sibling():
+    sibling = aliased(RobloxSyncEvent)
+    return and_(
+        RobloxSyncEvent.action == "progress",
+        exists().where(
+            sibling.roblox_user_id == RobloxSyncEvent.roblox_user_id,
+            sibling.action == "progress",
+            sibling.status == "pending",
+            sibling.id != RobloxSyncEvent.id,
+        ),
+    )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(5 * 2 ** max(attempts - 1, 0), _MAX_BACKOFF_SECONDS))
+
+
+async def dispatch_sync_events(
+    client: httpx.AsyncClient,
+    *,
+    limit: int | None = None,
+    max_attempts: int | None = None,
+) -> int:
+    """Deliver one batch of committed events; returns the claimed count."""
+
+    settings = get_settings()
+    limit = limit or settings.roblox_sync_batch_size
+    max_attempts = max_attempts or settings.roblox_sync_max_attempts
+
+    async with session_scope() as session:
+        events = await claim_sync_events(session, limit=limit)
+    if not events:
+        return 0
+
+    error: Optional[RobloxSyncError] = None
+    try:
+        recorded = await deliver_sync_batch(client, events)
+    except RobloxSyncError as exc:
+        error = exc
+        recorded = exc.response
+
+    now = datetime.now(tz=timezone.utc)
+    async with session_scope() as session:
+        if error is None:
+            await session.execute(
+                update(RobloxSyncEvent)
+                .where(RobloxSyncEvent.id.in_([event.id for event in events]))
+                .values(
+                    status="delivered",
+                    delivered_at=now,
+                    updated_at=now,
+                    response=recorded,
+                    last_error=None,
+                )
+            )
+        else:
+            # A progress row that got a newer pending sibling while it was being
+            # sent is stale, and resetting it to pending would violate
+            # uq_roblox_sync_events_pending_progress; drop it instead.
+            superseded = _has_pending_progress_sibling()
+            await session.execute(
+                update(RobloxSyncEvent)
+                .where(RobloxSyncEvent.id.in_([event.id for event in events]), superseded)
+                .values(
+                    status="discarded",
+                    updated_at=now,
+                    response=recorded,
+                    last_error=str(error),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+            # Rows claimed together can differ in attempts; one update per backoff step.
+            def attempts_of(event: RobloxSyncEvent) -> int:
+                return event.attempts
+
+            for attempts, group in groupby(sorted(events, key=attempts_of), key=attempts_of):
+                await session.execute(
+                    update(RobloxSyncEvent)
+                    .where(
+                        RobloxSyncEvent.id.in_([event.id for event in group]),
+                        ~superseded,
+                    )
+                    .values(
+                        status="failed" if attempts >= max_attempts else "pending",
+                        available_at=now + _retry_delay(attempts),
+                        updated_at=now,
+                        response=recorded,
+                        last_error=str(error),
+                    )
+                )
+
     logger.info(
-        "Roblox sync enqueued",
-        extra={"roblox_user_id": roblox_user_id, "action": action, "payload": payload},
+        "Roblox sync batch dispatched",
+        extra={
+            "claimed": len(events),
+            "delivered": 0 if error else len(events),
+            "error": str(error) if error else None,
+        },
     )
+    return len(events)
+
+
+async def compact_sync_events(
+    *, retention: timedelta, batch_size: int, now: datetime | None = None
+) -> int:
+    """Delete delivered events older than ``retention`` in committed chunks."""
+
+    cutoff = (now or datetime.now(tz=timezone.utc)) - retention
+    compacted = 0
+    while True:
+        expired = (
+            select(RobloxSyncEvent.id)
+            .where(
+                RobloxSyncEvent.status.in_(_COMPACTED_STATUSES),
+                RobloxSyncEvent.updated_at < cutoff,
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with session_scope() as session:
+            result = await session.execute(
+                delete(RobloxSyncEvent)
+                .where(RobloxSyncEvent.id.in_(expired))
+                .returning(RobloxSyncEvent.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = len(result.all())
+        compacted += deleted
+        if deleted < batch_size:
+            return compacted
+
+
+async def run_roblox_sync_dispatcher(
+    stop_event: asyncio.Event | None = None,
+    *,
+    client: httpx.AsyncClient | None = None,
+) -> None:
+    """Background loop draining the Roblox sync outbox."""
+
+    settings = get_settings()
+    if not settings.roblox_sync_path:
+        logger.info("ROBLOX_SYNC_PATH is not set; Roblox sync dispatcher disabled")
+        return
+
+    logger.info(
+        "Starting Roblox sync dispatcher",
+        extra={
+            "url": _sync_url(),
+            "poll_interval_seconds": settings.roblox_sync_poll_interval_seconds,
+            "batch_size": settings.roblox_sync_batch_size,
+        },
+    )
+    retention = timedelta(hours=settings.roblox_sync_retention_hours)
+    next_compaction = time.monotonic()
+
+    async with client or httpx.AsyncClient(timeout=10) as http_client:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                logger.info("Roblox sync dispatcher stopping")
+                return
+
+            claimed = 0
+            try:
+                claimed = await dispatch_sync_events(http_client)
+                if time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + _COMPACTION_INTERVAL_SECONDS
+                    compacted = await compact_sync_events(
+                        retention=retention, batch_size=settings.roblox_sync_batch_size * 10
+                    )
+                    if compacted:
+                        logger.info("Roblox sync events compacted", extra={"deleted": compacted})
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Roblox sync dispatch failed")
+
+            if claimed < settings.roblox_sync_batch_size:
+                await asyncio.sleep(settings.roblox_sync_poll_interval_seconds)
+
 
-    # Simulate asynchronous work with Roblox.
-    await asyncio.sleep(0)
\ No newline at end of file
+__all__ = [
+    "RobloxSyncError",
+    "claim_sync_events",
+    "compact_sync_events",
+    "deliver_sync_batch",
+    "dispatch_sync_events",
+    "run_roblox_sync_dispatcher",
+    "sync_progress",
+    "sync_progress_batch",
+]
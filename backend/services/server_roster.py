@@ -0,0 +1,210 @@
+"""Live roster of running Roblox servers fed by ``/game/servers/heartbeat``.
+
+Every server reports its job id, the ``servers.slug`` it belongs to and the
+full list of players in it. The roster keeps one entry per job that expires
+``servers_heartbeat_ttl_seconds`` after the last heartbeat, so crashed servers
+drop out on their own. With ``REDIS_URL`` set the roster lives in Redis and
+the bot reads live counts from it; otherwise it is in-process only.
+
+Session minutes are written to ``player_sessions`` with one multi-row upsert
+per heartbeat, whatever the number of players. A player whose row was not
+refreshed within the TTL starts a new session.
+"""
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Sequence, Tuple
+
+from sqlalchemy import Integer, case, cast, extract, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import PlayerSession
+
+from ..cache import get_redis
+from ..config import get_settings
+from ..logging import get_logger
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "servers:roster:"
+JOBS_KEY = "servers:roster:jobs"
+
+
+class _MemoryRoster:
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Tuple[float, str, int]] = {}
+
+    async def put(self, job_id: str, server: str, players: int, ttl_seconds: float) -> None:
+        self._jobs[job_id] = (time.monotonic() + ttl_seconds, server, players)
+
+    async def remove(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    async def counts(self) -> Dict[str, int]:
+        now = time.monotonic()
+        expired = [job_id for job_id, (expires_at, _, _) in self._jobs.items() if expires_at <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        totals: Counter[str] = Counter()
+        for _, server, players in self._jobs.values():
+            totals[server] += players
+        return dict(totals)
+
+    async def close(self) -> None:
+        self._jobs.clear()
+
+
+class _RedisRoster:
+    """One expiring key per job plus a sorted set of jobs scored by expiry."""
+
+    def __init__(self, redis: Any) -> None:
+        self._redis = redis
+
+    async def put(self, job_id: str, server: str, players: int, ttl_seconds: float) -> None:
+        value = json.dumps({"server": server, "players": players})
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(KEY_PREFIX + job_id, value, px=int(ttl_seconds * 1000))
+            pipe.zadd(JOBS_KEY, {job_id: time.time() + ttl_seconds})
+            await pipe.execute()
+
+    async def remove(self, job_id: str) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(KEY_PREFIX + job_id)
+            pipe.zrem(JOBS_KEY, job_id)
+            await pipe.execute()
+
+    async def counts(self) -> Dict[str, int]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(JOBS_KEY, "-inf", time.time())
+            pipe.zrange(JOBS_KEY, 0, -1)
+            _, job_ids = await pipe.execute()
+        if not job_ids:
+            return {}
+        totals: Counter[str] = Counter()
+        for raw in await self._redis.mget([KEY_PREFIX + job_id for job_id in job_ids]):
+            if raw is not None:
+                entry = json.loads(raw)
+                totals[entry["server"]] += int(entry["players"])
+        return dict(totals)
+
+    async def close(self) -> None:
+        """The shared client is closed by :func:`backend.cache.close_redis`."""
+
+
+_backend: Any = None
+
+
+def _get_backend() -> Any:
+    global _backend
+    if _backend is None:
+        redis = get_redis()
+        _backend = _RedisRoster(redis) if redis is not None else _MemoryRoster()
+    return _backend
+
+
+async def record_heartbeat(job_id: str, server: str, players: int) -> None:
+    """Replace the roster entry of ``job_id`` and extend its expiry."""
+
+    ttl = get_settings().servers_heartbeat_ttl_seconds
+    try:
+        await _get_backend().put(job_id, server, players, ttl)
+    except Exception:  # pragma: no cover - the entry is refreshed by the next heartbeat
+        logger.warning("Server roster update failed", exc_info=True)
+
+
+async def remove_server(job_id: str) -> None:
+    """Drop a job that announced its shutdown."""
+
+    try:
+        await _get_backend().remove(job_id)
+    except Exception:  # pragma: no cover - the entry still expires by TTL
+        logger.warning("Server roster removal failed", exc_info=True)
+
+
+async def online_counts() -> Dict[str, int]:
+    """Return live player counts per server slug; empty if the roster is down."""
+
+    try:
+        return await _get_backend().counts()
+    except Exception:  # pragma: no cover - the play menu renders without counts
+        logger.warning("Server roster lookup failed", exc_info=True)
+        return {}
+
+
+async def read_online_counts(redis: Any) -> Dict[str, int]:
+    """Return live player counts from the Redis roster behind ``redis``.
+
+    The bot shares ``REDIS_URL`` with the backend but not its settings, so it
+    reads the roster with its own client instead of :func:`online_counts`.
+    """
+
+    return await _RedisRoster(redis).counts()
+
+
+async def touch_player_sessions(
+    session: AsyncSession,
+    job_id: str,
+    roblox_user_ids: Sequence[str],
+    *,
+    now: datetime,
+    ttl: timedelta,
+) -> None:
+    """Extend the sessions of every listed player with one multi-row upsert.
+
+    ``minutes`` is derived from ``started_at`` instead of incremented, so a
+    repeated or late heartbeat cannot count the same minutes twice.
+    """
+
+    if not roblox_user_ids:
+        return
+
+    rows = [
+        {
+            "roblox_user_id": roblox_user_id,
+            "job_id": job_id,
+            "started_at": now,
+            "last_seen_at": now,
+            "minutes": 0,
+        }
+        for roblox_user_id in dict.fromkeys(roblox_user_ids)
+    ]
+    stmt = insert(PlayerSession).values(rows)
+    stale = PlayerSession.last_seen_at < now - ttl
+    elapsed_minutes = cast(
+        func.floor(extract("epoch", stmt.excluded.last_seen_at - PlayerSession.started_at) / 60),
+        Integer,
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[PlayerSession.roblox_user_id],
+            set_={
+                "job_id": stmt.excluded.job_id,
+                "started_at": case(
+                    (stale, stmt.excluded.started_at), else_=PlayerSession.started_at
+                ),
+                "last_seen_at": stmt.excluded.last_seen_at,
+                "minutes": case((stale, 0), else_=func.greatest(elapsed_minutes, 0)),
+            },
+        )
+    )
+
+
+async def close() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+__all__ = [
+    "close",
+    "online_counts",
+    "read_online_counts",
+    "record_heartbeat",
+    "remove_server",
+    "touch_player_sessions",
+]
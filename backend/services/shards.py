@@ -0,0 +1,222 @@
+"""Lease-based sharding for the periodic achievement recalculation.
+
+Users are split into contiguous ``users.id`` ranges stored in
+``achievement_recalc_shards``. Every backend replica claims due shards with
+``FOR UPDATE SKIP LOCKED``, keeps the lease alive with heartbeats while it works
+and releases the shard with the next due time, so each shard is processed by
+exactly one replica per cycle.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import AchievementRecalcShard, User
+
+from ..logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ShardLeaseLostError(RuntimeError):
+    """Raised when another replica took over a shard that was being processed."""
+
+
+@dataclass
+class ShardLease:
+    """A shard currently owned by this replica."""
+
+    shard_id: int
+    range_start: int
+    range_end: int
+    owner: str
+    claimed_at: datetime
+    lost: bool = False
+
+
+def shard_ranges(max_user_id: int | None, shard_size: int) -> list[tuple[int, int]]:
+    """Return ``[start, end)`` id ranges covering users up to ``max_user_id``."""
+
+    if shard_size <= 0:
+        raise ValueError("shard_size must be positive")
+    if not max_user_id or max_user_id < 0:
+        return [(0, shard_size)]
+    return [
+        (start, start + shard_size)
+        for start in range(0, max_user_id + 1, shard_size)
+    ]
+
+
+async def ensure_shards(session: AsyncSession, *, shard_size: int) -> int:
+    """Create missing shard rows and drop rows left over from another shard size."""
+
+    await session.execute(
+        delete(AchievementRecalcShard).where(
+            AchievementRecalcShard.range_end - AchievementRecalcShard.range_start
+            != shard_size
+        )
+    )
+
+    max_user_id = await session.scalar(select(func.max(User.id)))
+    ranges = shard_ranges(max_user_id, shard_size)
+    stmt = insert(AchievementRecalcShard).values(
+        [{"range_start": start, "range_end": end} for start, end in ranges]
+    )
+    await session.execute(stmt.on_conflict_do_nothing(index_elements=["range_start"]))
+    return len(ranges)
+
+
+async def claim_shard(
+    session: AsyncSession,
+    *,
+    owner: str,
+    lease_seconds: int,
+    now: datetime | None = None,
+) -> ShardLease | None:
+    """Atomically claim the most overdue shard that nobody holds a live lease on."""
+
+    now = now or datetime.now(tz=timezone.utc)
+    candidate = (
+        select(AchievementRecalcShard.id)
+        .where(
+            AchievementRecalcShard.next_run_at <= now,
+            or_(
+                AchievementRecalcShard.lease_expires_at.is_(None),
+                AchievementRecalcShard.lease_expires_at < now,
+            ),
+        )
+        .order_by(AchievementRecalcShard.next_run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(AchievementRecalcShard)
+        .where(AchievementRecalcShard.id == candidate)
+        .values(
+            owner=owner,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+        )
+        .returning(
+            AchievementRecalcShard.id,
+            AchievementRecalcShard.range_start,
+            AchievementRecalcShard.range_end,
+        )
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None
+
+    shard_id, range_start, range_end = row
+    return ShardLease(
+        shard_id=shard_id,
+        range_start=range_start,
+        range_end=range_end,
+        owner=owner,
+        claimed_at=now,
+    )
+
+
+async def heartbeat_shard(
+    session: AsyncSession, lease: ShardLease, *, lease_seconds: int
+) -> bool:
+    """Extend the lease; returns ``False`` when the shard is no longer ours."""
+
+    now = datetime.now(tz=timezone.utc)
+    result = await session.execute(
+        update(AchievementRecalcShard)
+        .where(
+            AchievementRecalcShard.id == lease.shard_id,
+            AchievementRecalcShard.owner == lease.owner,
+        )
+        .values(
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+        )
+    )
+    if result.rowcount == 0:
+        lease.lost = True
+        logger.warning(
+            "Achievement shard lease lost",
+            extra={"shard_id": lease.shard_id, "owner": lease.owner},
+        )
+    return not lease.lost
+
+
+async def release_shard(
+    session: AsyncSession,
+    lease: ShardLease,
+    *,
+    next_run_at: datetime,
+    user_count: int | None = None,
+    granted_count: int | None = None,
+) -> None:
+    """Give the shard back, recording run metrics when the run completed."""
+
+    finished_at = datetime.now(tz=timezone.utc)
+    values: Dict[str, Any] = {
+        "owner": None,
+        "lease_expires_at": None,
+        "next_run_at": next_run_at,
+    }
+    if user_count is not None:
+        values.update(
+            last_started_at=lease.claimed_at,
+            last_finished_at=finished_at,
+            last_duration_ms=int((finished_at - lease.claimed_at).total_seconds() * 1000),
+            last_user_count=user_count,
+            last_granted_count=granted_count or 0,
+            last_owner=lease.owner,
+        )
+
+    await session.execute(
+        update(AchievementRecalcShard)
+        .where(
+            AchievementRecalcShard.id == lease.shard_id,
+            AchievementRecalcShard.owner == lease.owner,
+        )
+        .values(**values)
+    )
+
+
+async def list_shard_metrics(session: AsyncSession) -> List[Dict[str, Any]]:
+    """Return per-shard lease state and last run metrics across all replicas."""
+
+    shards = await session.scalars(
+        select(AchievementRecalcShard).order_by(AchievementRecalcShard.range_start)
+    )
+    return [
+        {
+            "shard_id": shard.id,
+            "range_start": shard.range_start,
+            "range_end": shard.range_end,
+            "owner": shard.owner,
+            "lease_expires_at": shard.lease_expires_at,
+            "next_run_at": shard.next_run_at,
+            "last_started_at": shard.last_started_at,
+            "last_finished_at": shard.last_finished_at,
+            "last_duration_ms": shard.last_duration_ms,
+            "last_user_count": shard.last_user_count,
+            "last_granted_count": shard.last_granted_count,
+            "last_owner": shard.last_owner,
+        }
+        for shard in shards.all()
+    ]
+
+
+__all__ = [
+    "ShardLease",
+    "ShardLeaseLostError",
+    "claim_shard",
+    "ensure_shards",
+    "heartbeat_shard",
+    "list_shard_metrics",
+    "release_shard",
+    "shard_ranges",
+]
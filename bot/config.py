@@ -96,12 +96,17 @@ WEBAPP_PORT = int(os.getenv("PORT", "10000"))
 
 ADMIN_LOGIN_PASSWORD = get_env("ADMIN_LOGIN_PASSWORD", required=True)
 
+REDIS_URL = get_env("REDIS_URL", "")
+SHOP_CATALOG_TTL_SECONDS = int(get_env("SHOP_CATALOG_TTL_SECONDS", "300"))
+
 ADMINS = _parse_int_list(os.getenv("ADMINS"))
 ADMIN_ROOT_IDS = _parse_int_list(os.getenv("ADMIN_ROOT_IDS"))
 
 WALLET_PAY_API_BASE = get_env("WALLET_PAY_API_BASE", "https://pay.wallet.tg")
 WALLET_PAY_API_KEY = get_env("WALLET_PAY_API_KEY", "")
 WALLET_PAY_SHOP_ID = get_env("WALLET_PAY_SHOP_ID", "")
+WALLET_PAY_MAX_CONCURRENCY = int(get_env("WALLET_PAY_MAX_CONCURRENCY", "8"))
+WALLET_PAY_MAX_RETRIES = int(get_env("WALLET_PAY_MAX_RETRIES", "3"))
 
 TON_PAYMENT_MARKUP_PERCENT = _get_decimal_env("TON_PAYMENT_MARKUP_PERCENT", "0")
 TON_INVOICE_TTL_SECONDS = int(get_env("TON_INVOICE_TTL_SECONDS", "900"))
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import json
 import os
 import ssl
 from typing import Optional
@@ -13,6 +14,7 @@ from db import (
     Base,
     Achievement,
     AchievementConditionType,
+    AchievementRecalcShard,
     Admin,
     AdminRequest,
     BannedRobloxAccount,
@@ -21,21 +23,29 @@ from db import (
     IdempotencyKey,
     Invoice,
     LogEntry,
+    NotificationOutbox,
+    NutsBalanceCheckpoint,
     NutsTransaction,
     Payment,
+    PaymentInboxEvent,
     PaymentWebhookEvent,
+    PlayerPlaytime,
+    PlayerSession,
     Product,
     PromoCode,
     PromocodeRedemption,
     Purchase,
     Referral,
     ReferralReward,
+    ReferralTopupBonus,
     RobloxSyncEvent,
+    ScheduledAchievementCheck,
     Setting,
     Server,
     TopUpRequest,
     User,
     UserAchievement,
+    UserProductPurchase,
     Withdrawal,
 )
 
@@ -70,6 +80,8 @@ async_engine = create_async_engine(
     echo=False,
     pool_pre_ping=True,
     connect_args={"ssl": _ssl_context},
+    # Lets JSON columns take values such as datetimes without a pre-serialization pass.
+    json_serializer=lambda value: json.dumps(value, default=str),
 )
 
 async_session = async_sessionmaker(
@@ -99,6 +111,7 @@ __all__ = [
     "init_db",
     "Achievement",
     "AchievementConditionType",
+    "AchievementRecalcShard",
     "Admin",
     "AdminRequest",
     "BannedRobloxAccount",
@@ -107,20 +120,28 @@ __all__ = [
     "IdempotencyKey",
     "Invoice",
     "LogEntry",
+    "NotificationOutbox",
+    "NutsBalanceCheckpoint",
     "NutsTransaction",
     "Payment",
+    "PaymentInboxEvent",
     "PaymentWebhookEvent",
+    "PlayerPlaytime",
+    "PlayerSession",
     "Product",
     "PromoCode",
     "PromocodeRedemption",
     "Purchase",
     "Referral",
     "ReferralReward",
+    "ReferralTopupBonus",
     "RobloxSyncEvent",
+    "ScheduledAchievementCheck",
     "Setting",
     "Server",
     "TopUpRequest",
     "User",
     "UserAchievement",
+    "UserProductPurchase",
     "Withdrawal",
 ]
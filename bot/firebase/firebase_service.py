@@ -13,6 +13,7 @@ from firebase_admin.db import Reference
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
+from backend.services.playtime import PLAYTIME_PROGRESS_KEYS, upsert_playtime
 from bot.db import BannedRobloxAccount, User, async_session
 
 
@@ -24,6 +25,8 @@ logger = logging.getLogger(__name__)
 
 FIREBASE_ENV_VAR = "FIREBASE_SERVICE_ACCOUNT"
 FIREBASE_DATABASE_URL_ENV = "FIREBASE_DATABASE_URL"
+PLAYER_TIMES_UPDATED_KEY = "updatedAt"
+_PLAYER_TIMES_MINUTES_KEYS = ("minutes", "totalMinutes", *PLAYTIME_PROGRESS_KEYS)
 
 
 def load_credentials() -> credentials.Certificate:
@@ -251,9 +254,23 @@ async def fetch_whitelist() -> Dict[str, Any]:
         return {}
 
 
-async def fetch_player_times() -> Dict[str, Any]:
+async def fetch_player_times(since: Optional[int] = None) -> Dict[str, Any]:
+    """Fetch `/playerTimes`, only entries updated at or after `since` when given."""
+
+    ref = _get_reference("playerTimes")
+    if since is not None:
+        try:
+            query = ref.order_by_child(PLAYER_TIMES_UPDATED_KEY).start_at(since)
+            data = await _run_in_thread(query.get)
+            return dict(data or {})
+        except Exception:
+            logger.warning(
+                "Incremental playerTimes query failed, falling back to full fetch",
+                exc_info=True,
+            )
+
     try:
-        data = await _run_in_thread(_get_reference("playerTimes").get)
+        data = await _run_in_thread(ref.get)
         return data or {}
     except Exception:
         logger.exception("Failed to fetch player times")
@@ -264,6 +281,86 @@ async def fetch_player_times() -> Dict[str, Any]:
 # SYNC LOGIC
 # ----------------------------------------
 
+# Cursor and last ingested values for incremental playerTimes pulls. The seen
+# values only save redundant writes (upsert_playtime never lowers minutes), so
+# the least recently changed players are forgotten past the cap.
+_PLAYER_TIMES_SEEN_LIMIT = 50_000
+_player_times_cursor: Optional[int] = None
+_player_times_seen: Dict[str, int] = {}
+
+
+def _remember_player_times(changed: Dict[str, int]) -> None:
+    for key, minutes in changed.items():
+        _player_times_seen.pop(key, None)
+        _player_times_seen[key] = minutes
+    while len(_player_times_seen) > _PLAYER_TIMES_SEEN_LIMIT:
+        del _player_times_seen[next(iter(_player_times_seen))]
+
+
+def _parse_player_time(value: Any) -> tuple[Optional[int], Optional[int]]:
+    """Return `(minutes, updated_at)` from a `/playerTimes` entry."""
+
+    if isinstance(value, bool):
+        return None, None
+    if isinstance(value, (int, float)):
+        return int(value), None
+    if not isinstance(value, dict):
+        return None, None
+
+    minutes = None
+    for key in _PLAYER_TIMES_MINUTES_KEYS:
+        raw = value.get(key)
+        if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+            minutes = int(raw)
+            break
+
+    updated_at = value.get(PLAYER_TIMES_UPDATED_KEY)
+    if not isinstance(updated_at, (int, float)) or isinstance(updated_at, bool):
+        updated_at = None
+    return minutes, int(updated_at) if updated_at is not None else None
+
+
+async def sync_player_times() -> int:
+    """Ingest changed `/playerTimes` entries into the `player_playtime` table.
+
+    When every entry carries `updatedAt`, the next pull only asks Firebase for
+    newer entries; otherwise the full node is read and only changed values are
+    written.
+    """
+
+    global _player_times_cursor
+
+    raw_times = await fetch_player_times(since=_player_times_cursor)
+    changed: Dict[str, int] = {}
+    cursor: Optional[int] = None
+    all_stamped = bool(raw_times)
+
+    for roblox_id, value in raw_times.items():
+        minutes, updated_at = _parse_player_time(value)
+        if updated_at is None:
+            all_stamped = False
+        else:
+            cursor = updated_at if cursor is None else max(cursor, updated_at)
+        if minutes is None or not roblox_id:
+            continue
+        key = str(roblox_id).strip()
+        if _player_times_seen.get(key) != minutes:
+            changed[key] = minutes
+
+    if changed:
+        async with async_session() as session:
+            await upsert_playtime(session, changed, source="firebase")
+            await session.commit()
+        _remember_player_times(changed)
+
+    if raw_times:
+        _player_times_cursor = cursor if all_stamped else None
+
+    if changed:
+        logger.info("Ingested %s playerTimes entries", len(changed))
+    return len(changed)
+
+
 async def sync_bans() -> None:
     firebase_bans = await fetch_all_firebase_bans()
     firebase_ids = set(firebase_bans.keys())
@@ -382,6 +479,11 @@ async def firebase_sync_loop(interval_seconds: int = 60) -> None:
         except Exception:
             logger.exception("sync_whitelist failed")
 
+        try:
+            await sync_player_times()
+        except Exception:
+            logger.exception("sync_player_times failed")
+
         await asyncio.sleep(interval_seconds)
 
 
@@ -399,6 +501,7 @@ __all__ = [
     "fetch_whitelist",
     "fetch_player_times",
     "sync_bans",
+    "sync_player_times",
     "sync_whitelist",
     "firebase_sync_loop",
 ]
@@ -22,6 +22,7 @@ from bot.db import (
     async_session,
 )
 from backend.database import session_scope
+from backend.services.achievement_timers import schedule_phrase_checks_for_achievement
 from backend.services.achievements import (
     ACHIEVEMENT_DATA_SOURCES,
     evaluate_user_by_id,
@@ -1065,6 +1066,7 @@ async def ach_set_manual_grant(message: types.Message, state: FSMContext):
                 else:
                     metadata.pop("phrase", None)
                 achievement.metadata_json = metadata or None
+                await schedule_phrase_checks_for_achievement(session, achievement)
                 await session.commit()
                 await message.answer(
                     "Достижение обновлено", reply_markup=admin_achievements_kb()
@@ -1092,6 +1094,8 @@ async def ach_set_manual_grant(message: types.Message, state: FSMContext):
                     metadata_json=metadata or None,
                 )
                 session.add(achievement)
+                await session.flush()
+                await schedule_phrase_checks_for_achievement(session, achievement)
                 await session.commit()
                 await message.answer("✅ Достижение создано!", reply_markup=admin_achievements_kb())
                 save_successful = True
@@ -8,6 +8,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select
 
 from bot.db import PromoCode, async_session
+from bot.handlers.user.promocode_use import forget_unavailable_promocode
 from bot.keyboards.admin_keyboards import (
     promo_management_menu_kb,
     promo_reward_type_kb,
@@ -340,6 +341,7 @@ async def promo_finalize(call: types.CallbackQuery, state: FSMContext):
         session.add(promo)
         await session.commit()
 
+    forget_unavailable_promocode(data["code_text"])
     await state.clear()
 
     type_label = "🥜 Орешки" if reward_type == "nuts" else "💸 Скидка"
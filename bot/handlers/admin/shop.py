@@ -13,6 +13,7 @@ from bot.db import LogEntry, Product, Server, async_session
 from bot.keyboards.admin_keyboards import admin_shop_menu_kb, shop_type_kb
 from bot.states.shop_states import ShopCreateState
 from bot.services.admin_access import is_admin
+from bot.services.shop_catalog import rebuild_shop_catalog
 from db.models import SERVER_DEFAULT_CLOSED_MESSAGE
 
 
@@ -190,6 +191,7 @@ async def shop_finish(message: types.Message, state: FSMContext):
 
         await session.commit()
 
+    await rebuild_shop_catalog()
     await message.answer("✅ Товар добавлен!", reply_markup=admin_shop_menu_kb())
     await state.clear()
 
@@ -269,6 +271,9 @@ async def shop_delete(call: types.CallbackQuery):
             await session.delete(product)
             await session.commit()
 
+    if product:
+        await rebuild_shop_catalog()
+
     # <-- этот блок должен быть СЛЕВА, на том же уровне что и `async with`
     text, reply_markup = await _build_shop_list()
 
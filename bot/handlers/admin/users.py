@@ -18,7 +18,7 @@ from sqlalchemy.orm import selectinload
 
 from bot.config import ROOT_ADMIN_ID
 from bot.db import Admin, LogEntry, User, async_session
-from backend.services.nuts import add_nuts, subtract_nuts
+from backend.services.nuts import NutsInsufficientBalanceError, add_nuts, subtract_nuts
 from bot.keyboards.admin_keyboards import (
     admin_demote_confirm_kb,
     admin_main_menu_kb,
@@ -1813,14 +1813,20 @@ async def process_remove_reason(message: types.Message, state: FSMContext):
             return await message.reply(
                 "❌ Баланс пользователя изменился, удержание невозможно"
             )
-        await subtract_nuts(
-            session,
-            user=user,
-            amount=remove_amount,
-            source="admin_debit",
-            transaction_type="admin_debit",
-            reason=reason,
-        )
+        try:
+            await subtract_nuts(
+                session,
+                user=user,
+                amount=remove_amount,
+                source="admin_debit",
+                transaction_type="admin_debit",
+                reason=reason,
+            )
+        except NutsInsufficientBalanceError:
+            await state.clear()
+            return await message.reply(
+                "❌ Баланс пользователя изменился, удержание невозможно"
+            )
         await session.commit()
 
     logger.info(
@@ -12,10 +12,10 @@ from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import func, select
 
+from backend.services.playtime import load_playtime_minutes
 from bot.db import (
     Achievement,
     AchievementConditionType,
-    GameProgress,
     Payment,
     PromocodeRedemption,
     Product,
@@ -241,7 +241,7 @@ async def _load_metrics(session, user: User) -> AchievementMetrics:
         or 0
     )
 
-    metrics.time_in_game_minutes = await _load_playtime_minutes(session, user)
+    metrics.time_in_game_minutes = await load_playtime_minutes(session, user.roblox_id)
 
     metrics.spent_sum = (
         await session.scalar(
@@ -279,34 +279,6 @@ async def _load_metrics(session, user: User) -> AchievementMetrics:
     return metrics
 
 
-async def _load_playtime_minutes(session, user: User) -> int | None:
-    if not user.roblox_id:
-        return None
-
-    progress = await session.scalar(
-        select(GameProgress.progress)
-        .where(GameProgress.roblox_user_id == str(user.roblox_id))
-        .order_by(GameProgress.updated_at.desc())
-        .limit(1)
-    )
-    if not isinstance(progress, dict):
-        return None
-
-    for key in (
-        "time_in_game",
-        "timeInGame",
-        "play_time",
-        "playTime",
-        "playtime",
-        "minutes_played",
-    ):
-        value = progress.get(key)
-        if isinstance(value, (int, float)):
-            return int(value)
-
-    return None
-
-
 def _normalize_condition_type(
     condition_type: AchievementConditionType | str | None,
 ) -> AchievementConditionType:
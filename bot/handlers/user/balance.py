@@ -17,6 +17,8 @@ from bot.config import (
     TON_PAYMENT_MARKUP_PERCENT,
     WALLET_PAY_API_BASE,
     WALLET_PAY_API_KEY,
+    WALLET_PAY_MAX_CONCURRENCY,
+    WALLET_PAY_MAX_RETRIES,
     WALLET_PAY_SHOP_ID,
 )
 from bot.constants.stars import STARS_PACKAGES, STARS_PACKAGES_BY_CODE
@@ -92,6 +94,8 @@ def _wallet_client() -> WalletPayClient:
         api_base=WALLET_PAY_API_BASE,
         api_key=WALLET_PAY_API_KEY,
         store_id=WALLET_PAY_SHOP_ID,
+        max_concurrency=WALLET_PAY_MAX_CONCURRENCY,
+        max_retries=WALLET_PAY_MAX_RETRIES,
     )
 
 
@@ -257,6 +261,7 @@ async def topup_create_ton_invoice(call: types.CallbackQuery, state: FSMContext)
             return
 
         external_invoice_id = f"ton:{uuid4().hex}"
+        ttl_seconds = max(TON_INVOICE_TTL_SECONDS, 60)
 
         try:
             wallet_invoice = await _wallet_client().create_invoice(
@@ -264,7 +269,7 @@ async def topup_create_ton_invoice(call: types.CallbackQuery, state: FSMContext)
                 amount=ton_amount,
                 currency_code="TON",
                 description=f"{package.title}",
-                expires_in=max(TON_INVOICE_TTL_SECONDS, 60),
+                expires_in=ttl_seconds,
                 customer_telegram_id=user.tg_id,
                 metadata={
                     "package_code": package.code,
@@ -279,11 +284,13 @@ async def topup_create_ton_invoice(call: types.CallbackQuery, state: FSMContext)
             await call.answer("Не удалось создать счёт", show_alert=True)
             return
 
-        expires_at = wallet_invoice.expires_at
-        if not expires_at:
-            expires_at = datetime.now(tz=timezone.utc) + timedelta(
-                seconds=TON_INVOICE_TTL_SECONDS
-            )
+        # Wallet reports expiry on its own clock; never expire earlier than our TTL.
+        issued_at = datetime.now(tz=timezone.utc)
+        local_expires_at = issued_at + timedelta(seconds=ttl_seconds)
+        wallet_expires_at = wallet_invoice.expires_at or local_expires_at
+        if wallet_expires_at.tzinfo is None:
+            wallet_expires_at = wallet_expires_at.replace(tzinfo=timezone.utc)
+        expires_at = max(wallet_expires_at, local_expires_at)
 
         invoice = Invoice(
             user_id=user.id,
@@ -298,8 +305,12 @@ async def topup_create_ton_invoice(call: types.CallbackQuery, state: FSMContext)
             currency_amount=ton_amount,
             ton_rate_at_invoice=ton_rate,
             ttl_metadata={
-                "ttl_seconds": TON_INVOICE_TTL_SECONDS,
-                "wallet_expires_at": expires_at.isoformat(),
+                "ttl_seconds": ttl_seconds,
+                "issued_at": issued_at.isoformat(),
+                "wallet_expires_at": wallet_expires_at.isoformat(),
+                "clock_skew_seconds": round(
+                    (wallet_expires_at - local_expires_at).total_seconds()
+                ),
             },
             rate_snapshot={
                 "ton_to_nuts_rate": str(ton_rate),
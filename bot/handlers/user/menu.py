@@ -26,7 +26,7 @@ from bot.handlers.user.shop import user_shop
 from bot.handlers.user.balance import topup_start
 from bot.keyboards.main_menu import main_menu, profile_menu, shop_menu
 from bot.services.profile_renderer import ProfileView, render_profile
-from bot.services.servers import get_ordered_servers, get_server_by_id
+from bot.services.servers import ServerInfo, get_ordered_servers, get_server_by_id
 from bot.services.stats import format_top_users, get_top_users
 from bot.services.user_search import (
     SearchRenderOptions,
@@ -39,6 +39,7 @@ from bot.states.user_states import (
     PromoInputState,
     UserSearchState,
 )
+from backend.services.achievement_timers import schedule_profile_phrase_checks
 from backend.services.achievements import evaluate_and_grant_achievements
 from bot.utils.referrals import ensure_referral_code
 from bot.utils.roblox import get_roblox_profile
@@ -159,6 +160,12 @@ def _shorten_button_text(text: str, limit: int = 32) -> str:
     return text[: limit - 1] + "…"
 
 
+def _server_button_text(idx: int, server: ServerInfo) -> str:
+    if server.online is None:
+        return f"Сервер {idx}"
+    return f"Сервер {idx} · {server.online} онлайн"
+
+
 def _normalize_user_text(text: str) -> str:
     return unicodedata.normalize("NFKC", text).strip()
 
@@ -356,12 +363,12 @@ async def open_play_menu(message: types.Message, state: FSMContext):
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text=f"Сервер {idx}",
+                    text=_server_button_text(idx, server),
                     url=server.url,
                 )
                 if server.url
                 else InlineKeyboardButton(
-                    text=f"Сервер {idx}",
+                    text=_server_button_text(idx, server),
                     callback_data=f"server_closed:{server.id}",
                 )
             ]
@@ -745,6 +752,7 @@ async def profile_save_about(message: types.Message, state: FSMContext):
             trigger="profile_updated",
             payload={"field": "about_text", "updated_at": now.isoformat()},
         )
+        await schedule_profile_phrase_checks(session, user, now=now)
 
         await session.commit()
 
@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
 import re
+import time
 
 from aiogram import F, Router, types
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
 
 from bot.db import LogEntry, PromoCode, PromocodeRedemption, User, async_session
 from bot.middleware.user_sync import normalize_tg_username
@@ -21,9 +24,213 @@ router = Router(name="user_promocode_use")
 
 PROMOCODE_PATTERN = re.compile(r"^[A-Z0-9-]{4,32}$", re.IGNORECASE)
 
+PROMO_NOT_FOUND = "❌ Такой промокод не существует"
+PROMO_EXHAUSTED = "⚠️ Этот промокод больше недоступен"
+PROMO_EXPIRED = "⛔ Срок действия промокода истёк"
+PROMO_ALREADY_USED = "⚠️ Вы уже активировали этот промокод"
+USER_NOT_REGISTERED = "❗ Ошибка: вы не зарегистрированы"
+
+# Codes that do not exist or can no longer be redeemed are answered from memory
+# for a short while, so a flood of retries does not reach the database.
+_UNAVAILABLE_TTL_SECONDS = 30.0
+_UNAVAILABLE_MAX_ENTRIES = 10_000
+_unavailable_codes: dict[str, tuple[float, str]] = {}
+
+
+class _PromoRejected(Exception):
+    def __init__(self, reply: str, *, unavailable: bool = False) -> None:
+        super().__init__(reply)
+        self.reply = reply
+        self.unavailable = unavailable
+
+
+@dataclass
+class _Redemption:
+    user: User
+    reward_text: str
+
+
+def _cached_rejection(code: str) -> str | None:
+    cached = _unavailable_codes.get(code)
+    if cached is None:
+        return None
+    expires_at, reply = cached
+    if time.monotonic() >= expires_at:
+        _unavailable_codes.pop(code, None)
+        return None
+    return reply
+
+
+def _remember_unavailable(code: str, reply: str) -> None:
+    if len(_unavailable_codes) >= _UNAVAILABLE_MAX_ENTRIES:
+        _unavailable_codes.clear()
+    _unavailable_codes[code] = (time.monotonic() + _UNAVAILABLE_TTL_SECONDS, reply)
+
+
+def forget_unavailable_promocode(code: str) -> None:
+    """Drop a cached rejection, e.g. after an admin creates the code."""
+
+    _unavailable_codes.pop((code or "").strip().upper(), None)
+
+
+def _unavailable_reason(promo: PromoCode | None, now: datetime) -> str | None:
+    if not promo or not promo.active:
+        return PROMO_NOT_FOUND
+    max_uses = promo.max_uses or 0
+    if max_uses > 0 and (promo.uses or 0) >= max_uses:
+        return PROMO_EXHAUSTED
+    if promo.expires_at:
+        expires_at = (
+            promo.expires_at
+            if promo.expires_at.tzinfo
+            else promo.expires_at.replace(tzinfo=timezone.utc)
+        )
+        if now > expires_at:
+            return PROMO_EXPIRED
+    return None
+
+
+async def _claim_use(session, promo_id: int, now: datetime) -> int | None:
+    """Take one use of the promo code; ``None`` when it is exhausted or expired.
+
+    The conditional UPDATE is the only statement that locks the promocode row,
+    so it runs last and the lock is held just until the commit.
+    """
+
+    return await session.scalar(
+        update(PromoCode)
+        .where(
+            PromoCode.id == promo_id,
+            PromoCode.active.is_(True),
+            or_(
+                PromoCode.max_uses.is_(None),
+                PromoCode.max_uses == 0,
+                PromoCode.uses < PromoCode.max_uses,
+            ),
+            or_(PromoCode.expires_at.is_(None), PromoCode.expires_at > now),
+        )
+        .values(uses=PromoCode.uses + 1)
+        .returning(PromoCode.uses)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _apply_redemption(
+    session, *, code: str, telegram_id: int, sender_username: str | None
+) -> _Redemption:
+    now = datetime.now(tz=timezone.utc)
+    promo = await session.scalar(select(PromoCode).where(PromoCode.code == code))
+    reason = _unavailable_reason(promo, now)
+    if reason:
+        raise _PromoRejected(reason, unavailable=True)
+
+    user = await session.scalar(select(User).where(User.tg_id == telegram_id))
+    if not user:
+        raise _PromoRejected(USER_NOT_REGISTERED)
+
+    already_used = await session.scalar(
+        select(PromocodeRedemption).where(
+            PromocodeRedemption.promocode_id == promo.id,
+            PromocodeRedemption.user_id == user.id,
+        )
+    )
+    if already_used:
+        raise _PromoRejected(PROMO_ALREADY_USED)
+
+    reward_amount = promo.reward_amount or 0
+    reward_type = (promo.reward_type or "balance").lower()
+    promo_type_label = str(promo.promo_type or reward_type or "balance")
+    reward_text = "🎁 Промокод активирован."
+    reward_effect: dict[str, object] = {}
+
+    if reward_type == "nuts":
+        reward_amount = int(reward_amount)
+        await add_nuts(
+            session,
+            user=user,
+            amount=reward_amount,
+            source="promocode",
+            transaction_type="promocode",
+            reason=f"Промокод {promo.code}",
+            metadata={"promo_id": promo.id},
+        )
+        reward_text = f"🥜 На баланс начислено {reward_amount} орешков."
+        reward_effect = {"nuts": reward_amount}
+    elif reward_type == "discount":
+        raw_value = promo.value or reward_amount or 0
+        try:
+            discount_value = float(raw_value)
+        except (TypeError, ValueError):
+            discount_value = float(reward_amount or 0)
+
+        previous_discount = user.discount or 0
+        user.discount = discount_value
+        if previous_discount and previous_discount != discount_value:
+            reward_text = (
+                f"💸 Скидка {discount_value:g}% активирована (было {previous_discount:g}%)."
+            )
+        else:
+            reward_text = f"💸 Скидка {discount_value:g}% активирована."
+        reward_effect = {"discount_percent": discount_value}
+    else:
+        reward_text = f"🎁 Промокод типа {promo_type_label} активирован."
+        reward_effect = {"value": promo.value or reward_amount}
+
+    redemption = PromocodeRedemption(
+        promocode_id=promo.id,
+        user_id=user.id,
+        telegram_id=user.tg_id,
+        reward_amount=reward_amount,
+        reward_type=reward_type,
+        metadata_json={
+            "promo_type": promo.promo_type,
+            "promo_type_label": promo_type_label,
+            "reward_type": reward_type,
+            "reward_effect": reward_effect,
+        },
+    )
+    session.add(redemption)
+    try:
+        await session.flush()
+    except IntegrityError as exc:
+        # A concurrent message from the same user redeemed it first.
+        raise _PromoRejected(PROMO_ALREADY_USED) from exc
+
+    log_data = {
+        "promo_id": promo.id,
+        "promo_code": promo.code,
+        "promo_type": promo.promo_type,
+        "promo_type_label": promo_type_label,
+        "reward_type": reward_type,
+        "reward_amount": reward_amount,
+        "reward_effect": reward_effect,
+        "reward_text": reward_text,
+        "redeemed_by_username": sender_username,
+    }
+
+    session.add(
+        LogEntry(
+            user_id=user.id,
+            telegram_id=user.tg_id,
+            request_id=redemption.request_id,
+            event_type="promocode_redeemed",
+            message=f"Активация промокода {promo.code}",
+            data=log_data,
+        )
+    )
+
+    if await _claim_use(session, promo.id, now) is None:
+        raise _PromoRejected(_unavailable_reason(promo, now) or PROMO_EXHAUSTED, unavailable=True)
+
+    return _Redemption(user=user, reward_text=reward_text)
+
 
 async def redeem_promocode(message: types.Message, raw_code: str) -> bool:
-    """Redeem the provided promo code for the message author."""
+    """Redeem the provided promo code for the message author.
+
+    Everything is written in one transaction that is rolled back on any
+    rejection; replies are only sent once it is closed.
+    """
 
     if not message.from_user:
         return False
@@ -36,134 +243,28 @@ async def redeem_promocode(message: types.Message, raw_code: str) -> bool:
         await message.reply("⚠️ Промокод не должен быть пустым")
         return False
 
-    async with async_session() as session:
-        async with session.begin():
-            promo = await session.scalar(
-                select(PromoCode).where(PromoCode.code == code)
-            )
-
-            if not promo or not promo.active:
-                await message.reply("❌ Такой промокод не существует")
-                return False
-
-            uses_count = promo.uses or 0
-            max_uses = promo.max_uses or 0
-            if max_uses > 0 and uses_count >= max_uses:
-                await message.reply("⚠️ Этот промокод больше недоступен")
-                return False
-
-            if promo.expires_at:
-                now = datetime.now(tz=timezone.utc)
-                expires_at = (
-                    promo.expires_at
-                    if promo.expires_at.tzinfo
-                    else promo.expires_at.replace(tzinfo=timezone.utc)
-                )
-                if now > expires_at:
-                    await message.reply("⛔ Срок действия промокода истёк")
-                    return False
+    cached_reply = _cached_rejection(code)
+    if cached_reply:
+        await message.reply(cached_reply)
+        return False
 
-            user = await session.scalar(
-                select(User).where(User.tg_id == message.from_user.id)
-            )
-            if not user:
-                await message.reply("❗ Ошибка: вы не зарегистрированы")
-                return False
-
-            already_used = await session.scalar(
-                select(PromocodeRedemption).where(
-                    PromocodeRedemption.promocode_id == promo.id,
-                    PromocodeRedemption.user_id == user.id,
-                )
-            )
-            if already_used:
-                await message.reply("⚠️ Вы уже активировали этот промокод")
-                return False
-
-            reward_amount = promo.reward_amount or 0
-            reward_type = (promo.reward_type or "balance").lower()
-            promo_type_label = str(promo.promo_type or reward_type or "balance")
-            reward_text = "🎁 Промокод активирован."
-            reward_effect: dict[str, object] = {}
-            
-            if reward_type == "nuts":
-                reward_amount = int(reward_amount)
-                await add_nuts(
+    try:
+        async with async_session() as session:
+            async with session.begin():
+                redemption = await _apply_redemption(
                     session,
-                    user=user,
-                    amount=reward_amount,
-                    source="promocode",
-                    transaction_type="promocode",
-                    reason=f"Промокод {promo.code}",
-                    metadata={"promo_id": promo.id},
-                )
-                reward_text = f"🥜 На баланс начислено {reward_amount} орешков."
-                reward_effect = {"nuts": reward_amount}
-            elif reward_type == "discount":
-                raw_value = promo.value or reward_amount or 0
-                try:
-                    discount_value = float(raw_value)
-                except (TypeError, ValueError):
-                    discount_value = float(reward_amount or 0)
-
-                previous_discount = user.discount or 0
-                user.discount = discount_value
-                if previous_discount and previous_discount != discount_value:
-                    reward_text = (
-                        f"💸 Скидка {discount_value:g}% активирована (было {previous_discount:g}%)."
-                    )
-                else:
-                    reward_text = f"💸 Скидка {discount_value:g}% активирована."
-                reward_effect = {"discount_percent": discount_value}
-            else:
-                reward_text = f"🎁 Промокод типа {promo_type_label} активирован."
-                reward_effect = {"value": promo.value or reward_amount}
-
-            promo.uses = uses_count + 1
-
-            redemption = PromocodeRedemption(
-                promocode_id=promo.id,
-                user_id=user.id,
-                telegram_id=user.tg_id,
-                reward_amount=reward_amount,
-                reward_type=reward_type,
-                metadata_json={
-                    "promo_type": promo.promo_type,
-                    "promo_type_label": promo_type_label,
-                    "reward_type": reward_type,
-                    "reward_effect": reward_effect,
-                },
-            )
-            session.add(redemption)
-            await session.flush()
-
-            log_data = {
-                "promo_id": promo.id,
-                "promo_code": promo.code,
-                "promo_type": promo.promo_type,
-                "promo_type_label": promo_type_label,
-                "reward_type": reward_type,
-                "reward_amount": reward_amount,
-                "reward_effect": reward_effect,
-                "reward_text": reward_text,
-                "redeemed_by_username": sender_username,
-            }
-
-            session.add(
-                LogEntry(
-                    user_id=user.id,
-                    telegram_id=user.tg_id,
-                    request_id=redemption.request_id,
-                    event_type="promocode_redeemed",
-                    message=f"Активация промокода {promo.code}",
-                    data=log_data,
+                    code=code,
+                    telegram_id=message.from_user.id,
+                    sender_username=sender_username,
                 )
-            )
-
-    await check_achievements(user)
+    except _PromoRejected as rejection:
+        if rejection.unavailable:
+            _remember_unavailable(code, rejection.reply)
+        await message.reply(rejection.reply)
+        return False
 
-    reward_message = f"🎉 Промокод {code} активирован!\n{reward_text}"
-    await message.reply(reward_message)
+    await message.reply(f"🎉 Промокод {code} активирован!\n{redemption.reward_text}")
+    await check_achievements(redemption.user)
 
     return True
 
@@ -7,7 +7,8 @@ from typing import Optional
 from aiogram import F, Router, types
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import func, select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from bot.config import ROOT_ADMIN_ID
 from bot.db import (
@@ -17,10 +18,12 @@ from bot.db import (
     Referral,
     ReferralReward,
     User,
+    UserProductPurchase,
     async_session,
 )
-from backend.services.nuts import add_nuts, subtract_nuts
+from backend.services.nuts import NutsInsufficientBalanceError, add_nuts, subtract_nuts
 from bot.middleware.user_sync import normalize_tg_username
+from bot.services.shop_catalog import get_shop_catalog
 from bot.utils.achievement_checker import check_achievements
 
 
@@ -28,18 +31,6 @@ router = Router(name="user_shop")
 logger = logging.getLogger(__name__)
 
 
-def user_shop_kb(items: list[Product]):
-    builder = InlineKeyboardBuilder()
-    for item in items:
-        builder.button(
-            text=f"{item.name} — {item.price}💰", callback_data=f"user_buy:{item.id}"
-        )
-    if not builder.export():
-        return None
-    builder.adjust(1)
-    return builder.as_markup()
-
-
 def _calculate_price_with_discount(product: Product, user: User) -> tuple[int, int, float]:
     """Return final price, discount amount, and discount percent."""
 
@@ -55,11 +46,8 @@ def _calculate_price_with_discount(product: Product, user: User) -> tuple[int, i
 
 
 async def user_shop(message: types.Message, item_type: Optional[str] = None):
-    async with async_session() as session:
-        stmt = select(Product).where(Product.status == "active")
-        if item_type:
-            stmt = stmt.where(Product.item_type == item_type)
-        items = (await session.execute(stmt.order_by(Product.price))).scalars().all()
+    catalog = await get_shop_catalog()
+    items, reply_markup = catalog.listing(item_type or None)
 
     if not items:
         if item_type:
@@ -74,33 +62,68 @@ async def user_shop(message: types.Message, item_type: Optional[str] = None):
     elif item_type == "item":
         header = "🎁 <b>Roblox-предметы</b>"
 
-    reply_markup = user_shop_kb(items)
     if reply_markup:
         await message.answer(header, reply_markup=reply_markup, parse_mode="HTML")
     else:
         await message.answer(header, parse_mode="HTML")
 
 
+_USER_LIMIT_REACHED = "⚠️ Вы достигли лимита покупок этого товара"
+_SOLD_OUT = "❌ Этот товар распродан"
+
+
 async def _check_purchase_limits(session, user: User, product: Product) -> Optional[str]:
-    """Проверка лимитов покупок для пользователя"""
+    """Проверка лимитов покупок по счётчикам (без блокировок, для подтверждения)"""
     if product.per_user_limit is not None:
-        count_stmt = select(func.count(Purchase.id)).where(
-            Purchase.user_id == user.id,
-            Purchase.product_id == product.id,
-            Purchase.status != "cancelled",
+        bought = await session.scalar(
+            select(UserProductPurchase.count).where(
+                UserProductPurchase.user_id == user.id,
+                UserProductPurchase.product_id == product.id,
+            )
+        )
+        if (bought or 0) >= product.per_user_limit:
+            return _USER_LIMIT_REACHED
+
+    if product.stock_limit is not None and (product.sold_count or 0) >= product.stock_limit:
+        return _SOLD_OUT
+    return None
+
+
+async def _reserve_purchase_limits(
+    session, user: User, product: Product, quantity: int = 1
+) -> Optional[str]:
+    """Атомарно резервирует лимиты покупки в текущей транзакции.
+
+    Счётчики ведутся только для товаров с соответствующим лимитом; при отказе
+    транзакция не фиксируется, и резерв откатывается вместе с покупкой.
+    """
+    if product.per_user_limit is not None:
+        reserved = await session.scalar(
+            insert(UserProductPurchase)
+            .values(user_id=user.id, product_id=product.id, count=1)
+            .on_conflict_do_update(
+                index_elements=[UserProductPurchase.user_id, UserProductPurchase.product_id],
+                set_={"count": UserProductPurchase.count + 1},
+                where=UserProductPurchase.count < product.per_user_limit,
+            )
+            .returning(UserProductPurchase.count)
         )
-        purchases_count = (await session.execute(count_stmt)).scalar_one()
-        if purchases_count >= product.per_user_limit:
-            return "⚠️ Вы достигли лимита покупок этого товара"
+        if reserved is None:
+            return _USER_LIMIT_REACHED
 
     if product.stock_limit is not None:
-        quantity_stmt = select(func.coalesce(func.sum(Purchase.quantity), 0)).where(
-            Purchase.product_id == product.id,
-            Purchase.status != "cancelled",
+        reserved = await session.scalar(
+            update(Product)
+            .where(
+                Product.id == product.id,
+                Product.sold_count + quantity <= Product.stock_limit,
+            )
+            .values(sold_count=Product.sold_count + quantity)
+            .returning(Product.sold_count)
+            .execution_options(synchronize_session=False)
         )
-        sold_quantity = (await session.execute(quantity_stmt)).scalar_one()
-        if sold_quantity >= product.stock_limit:
-            return "❌ Этот товар распродан"
+        if reserved is None:
+            return _SOLD_OUT
     return None
 
 
@@ -177,15 +200,15 @@ async def user_buy_finish(call: types.CallbackQuery):
         if not product or not user:
             return await call.answer("❌ Ошибка. Попробуйте снова.", show_alert=True)
 
-        limit_error = await _check_purchase_limits(session, user, product)
-        if limit_error:
-            return await call.answer(limit_error, show_alert=True)
-
         price_to_pay, discount_amount, discount_percent = _calculate_price_with_discount(
             product, user
         )
         if (user.nuts_balance or 0) < price_to_pay:
             return await call.answer("❌ Не хватает валюты!", show_alert=True)
+
+        limit_error = await _reserve_purchase_limits(session, user, product)
+        if limit_error:
+            return await call.answer(limit_error, show_alert=True)
         purchase = Purchase(
             user_id=user.id,
             telegram_id=user.tg_id,
@@ -199,15 +222,19 @@ async def user_buy_finish(call: types.CallbackQuery):
         session.add(purchase)
         await session.flush()
 
-        await subtract_nuts(
-            session,
-            user=user,
-            amount=price_to_pay,
-            source="purchase",
-            transaction_type="spend",
-            reason=f"Покупка {product.name}",
-            metadata={"product_id": product.id, "purchase_id": purchase.id},
-        )
+        try:
+            await subtract_nuts(
+                session,
+                user=user,
+                amount=price_to_pay,
+                source="purchase",
+                transaction_type="spend",
+                reason=f"Покупка {product.name}",
+                metadata={"product_id": product.id, "purchase_id": purchase.id},
+            )
+        except NutsInsufficientBalanceError:
+            # A concurrent spend got there first; the purchase is rolled back.
+            return await call.answer("❌ Не хватает валюты!", show_alert=True)
 
         if discount_amount > 0:
             user.discount = 0
@@ -32,6 +32,9 @@ from bot.middleware.block_attachments import BlockAttachmentsMiddleware
 from bot.firebase.firebase_service import init_firebase, firebase_sync_loop
 from bot.services.user_blocking import unblock_blocked_admins
 from bot.services.username_blocker import username_blocking_loop
+from bot.services.servers import close_server_roster
+from bot.services.shop_catalog import close_shop_catalog, run_shop_catalog_listener
+from bot.services.wallet import close_wallet_client
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +50,7 @@ else:
 firebase_sync_task: Optional[asyncio.Task] = None
 username_block_task: Optional[asyncio.Task] = None
 username_block_stop_event: Optional[asyncio.Event] = None
+shop_catalog_task: Optional[asyncio.Task] = None
 
 
 async def ensure_root_admin() -> None:
@@ -114,6 +118,7 @@ async def on_startup(dispatcher: Dispatcher) -> None:
     global firebase_sync_task
     global username_block_task
     global username_block_stop_event
+    global shop_catalog_task
     firebase_sync_task = asyncio.create_task(firebase_sync_loop())
     logger.info("🔄 Firebase sync task запущен")
 
@@ -123,6 +128,8 @@ async def on_startup(dispatcher: Dispatcher) -> None:
     )
     logger.info("🚫 Username blocking task запущен")
 
+    shop_catalog_task = asyncio.create_task(run_shop_catalog_listener())
+
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("🤖 Бот запущен (polling)")
 
@@ -131,6 +138,7 @@ async def on_shutdown(dispatcher: Dispatcher) -> None:
     global firebase_sync_task
     global username_block_task
     global username_block_stop_event
+    global shop_catalog_task
 
     if firebase_sync_task:
         firebase_sync_task.cancel()
@@ -146,6 +154,14 @@ async def on_shutdown(dispatcher: Dispatcher) -> None:
             await username_block_task
         logger.info("🚫 Username blocking task остановлен")
 
+    if shop_catalog_task:
+        shop_catalog_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await shop_catalog_task
+
+    await close_shop_catalog()
+    await close_server_roster()
+    await close_wallet_client()
     await bot.session.close()
     logger.info("🛑 Бот остановлен")
 
@@ -1,12 +1,21 @@
 """Services for retrieving Roblox server metadata for user interactions."""
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
+from typing import Any
 
 from sqlalchemy import select
 
+from backend.services.server_roster import read_online_counts
+from bot.config import REDIS_URL
 from bot.db import Server, async_session
 
+logger = logging.getLogger(__name__)
+
+_redis: Any = None
+_roster_disabled_logged = False
+
 
 @dataclass(frozen=True)
 class ServerInfo:
@@ -16,10 +25,53 @@ class ServerInfo:
     name: str
     url: str | None
     closed_message: str | None
+    online: int | None = None
+
+
+def _get_redis() -> Any:
+    global _redis
+    if _redis is None and REDIS_URL:
+        from redis import asyncio as redis_asyncio
+
+        _redis = redis_asyncio.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def online_counts() -> dict[str, int]:
+    """Return live player counts per server slug; empty when unavailable.
+
+    The heartbeat roster is shared with the backend only through Redis, so
+    without ``REDIS_URL`` there is nothing to read.
+    """
+
+    global _roster_disabled_logged
+    redis = _get_redis()
+    if redis is None:
+        if not _roster_disabled_logged:
+            logger.info("REDIS_URL is not set; live server counts are unavailable")
+            _roster_disabled_logged = True
+        return {}
+    try:
+        return await read_online_counts(redis)
+    except Exception:  # pragma: no cover - the play menu renders without counts
+        logger.warning("Server roster lookup failed", exc_info=True)
+        return {}
+
+
+async def close_server_roster() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
 
 
 async def get_ordered_servers() -> list[ServerInfo]:
-    """Return all servers ordered by their identifier."""
+    """Return all servers ordered by their identifier.
+
+    Live player counts come from the heartbeat roster in one lookup. Servers
+    without a running job report ``0``; ``online`` stays ``None`` while the
+    roster is empty or unavailable.
+    """
 
     async with async_session() as session:
         servers = (
@@ -27,6 +79,7 @@ async def get_ordered_servers() -> list[ServerInfo]:
         ).all()
 
     ordered = sorted(servers, key=lambda item: item.position or 0)
+    counts = await online_counts()
 
     return [
         ServerInfo(
@@ -34,6 +87,7 @@ async def get_ordered_servers() -> list[ServerInfo]:
             name=server.name,
             url=server.url or None,
             closed_message=server.closed_message or None,
+            online=counts.get(server.slug, 0) if counts else None,
         )
         for server in ordered
     ]
@@ -56,4 +110,10 @@ async def get_server_by_id(server_id: int) -> ServerInfo | None:
     )
 
 
-__all__ = ["ServerInfo", "get_ordered_servers", "get_server_by_id"]
\ No newline at end of file
+__all__ = [
+    "ServerInfo",
+    "close_server_roster",
+    "get_ordered_servers",
+    "get_server_by_id",
+    "online_counts",
+]
\ No newline at end of file
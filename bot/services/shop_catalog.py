@@ -0,0 +1,232 @@
+"""In-memory snapshot of the active shop catalog.
+
+Opening the shop used to query every active product and rebuild the inline
+keyboard on each message. The catalog only changes when an admin adds or
+deletes a product, so the bot keeps a snapshot with the product list and a
+ready ``InlineKeyboardMarkup`` per ``item_type`` and serves the shop without
+touching the database.
+
+Admin edits call :func:`rebuild_shop_catalog`, which reloads the local
+snapshot and, when ``REDIS_URL`` is set, publishes on :data:`CATALOG_CHANNEL`
+so other bot processes drop theirs (:func:`run_shop_catalog_listener`).
+``SHOP_CATALOG_TTL_SECONDS`` bounds staleness for edits made outside the bot.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy import select
+
+from bot.config import REDIS_URL, SHOP_CATALOG_TTL_SECONDS
+from bot.db import Product, async_session
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "shop:catalog"
+_INSTANCE_ID = uuid.uuid4().hex
+_RESUBSCRIBE_DELAY_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """Detached copy of the product fields the shop listing needs."""
+
+    id: int
+    name: str
+    price: int
+    item_type: str
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    items: Tuple[CatalogItem, ...] = ()
+    by_type: Dict[str, Tuple[CatalogItem, ...]] = field(default_factory=dict)
+    keyboards: Dict[Optional[str], InlineKeyboardMarkup] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    def listing(
+        self, item_type: Optional[str] = None
+    ) -> Tuple[Tuple[CatalogItem, ...], Optional[InlineKeyboardMarkup]]:
+        """Return the items of ``item_type`` (all when ``None``) and their keyboard."""
+
+        items = self.items if item_type is None else self.by_type.get(item_type, ())
+        return items, self.keyboards.get(item_type)
+
+
+def build_catalog_keyboard(items: Sequence[CatalogItem]) -> Optional[InlineKeyboardMarkup]:
+    builder = InlineKeyboardBuilder()
+    for item in items:
+        builder.button(
+            text=f"{item.name} — {item.price}💰", callback_data=f"user_buy:{item.id}"
+        )
+    if not builder.export():
+        return None
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+def build_snapshot(items: Sequence[CatalogItem]) -> CatalogSnapshot:
+    by_type: Dict[str, list[CatalogItem]] = {}
+    for item in items:
+        by_type.setdefault(item.item_type, []).append(item)
+
+    keyboards: Dict[Optional[str], InlineKeyboardMarkup] = {}
+    for item_type, group in (None, items), *by_type.items():
+        markup = build_catalog_keyboard(group)
+        if markup is not None:
+            keyboards[item_type] = markup
+
+    return CatalogSnapshot(
+        items=tuple(items),
+        by_type={item_type: tuple(group) for item_type, group in by_type.items()},
+        keyboards=keyboards,
+        loaded_at=time.monotonic(),
+    )
+
+
+async def _load_items() -> list[CatalogItem]:
+    async with async_session() as session:
+        products = await session.scalars(
+            select(Product).where(Product.status == "active").order_by(Product.price)
+        )
+        return [
+            CatalogItem(
+                id=product.id,
+                name=product.name,
+                price=product.price,
+                item_type=product.item_type,
+            )
+            for product in products.all()
+        ]
+
+
+class _CatalogCache:
+    def __init__(self) -> None:
+        self._snapshot: CatalogSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> CatalogSnapshot | None:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if (
+            SHOP_CATALOG_TTL_SECONDS > 0
+            and time.monotonic() - snapshot.loaded_at >= SHOP_CATALOG_TTL_SECONDS
+        ):
+            return None
+        return snapshot
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            snapshot = self._fresh()
+            if snapshot is None:
+                snapshot = self._snapshot = build_snapshot(await _load_items())
+            return snapshot
+
+    async def rebuild(self) -> CatalogSnapshot:
+        async with self._lock:
+            self._snapshot = build_snapshot(await _load_items())
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+
+_catalog = _CatalogCache()
+_redis: Any = None
+
+
+def _get_redis() -> Any:
+    global _redis
+    if _redis is None and REDIS_URL:
+        from redis import asyncio as redis_asyncio
+
+        _redis = redis_asyncio.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def get_shop_catalog() -> CatalogSnapshot:
+    """Return the current catalog snapshot, loading it on first use."""
+
+    return await _catalog.get()
+
+
+def invalidate_shop_catalog() -> None:
+    """Drop the local snapshot; the next shop view reloads it."""
+
+    _catalog.invalidate()
+
+
+async def rebuild_shop_catalog() -> None:
+    """Reload the catalog after an admin edit and tell other processes."""
+
+    await _catalog.rebuild()
+    redis = _get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.publish(CATALOG_CHANNEL, _INSTANCE_ID)
+    except Exception:  # pragma: no cover - depends on Redis availability
+        logger.exception("Failed to publish shop catalog invalidation")
+
+
+def _handle_invalidation(message: Any) -> None:
+    if message and message.get("data") != _INSTANCE_ID:
+        invalidate_shop_catalog()
+
+
+async def run_shop_catalog_listener(stop_event: asyncio.Event | None = None) -> None:
+    """Drop the local snapshot whenever another process rebuilds the catalog."""
+
+    redis = _get_redis()
+    if redis is None:
+        logger.info("REDIS_URL is not set; shop catalog is invalidated by TTL only")
+        return
+
+    while stop_event is None or not stop_event.is_set():
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(CATALOG_CHANNEL)
+                # Edits made while we were not subscribed would be missed.
+                invalidate_shop_catalog()
+                while stop_event is None or not stop_event.is_set():
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    _handle_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pragma: no cover - depends on Redis availability
+            logger.exception("Shop catalog listener failed; resubscribing")
+            await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
+
+
+async def close_shop_catalog() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+__all__ = [
+    "CATALOG_CHANNEL",
+    "CatalogItem",
+    "CatalogSnapshot",
+    "build_catalog_keyboard",
+    "build_snapshot",
+    "close_shop_catalog",
+    "get_shop_catalog",
+    "invalidate_shop_catalog",
+    "rebuild_shop_catalog",
+    "run_shop_catalog_listener",
+]
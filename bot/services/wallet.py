@@ -1,13 +1,25 @@
-"""Minimal async client for the @wallet merchant API."""
+"""Minimal async client for the @wallet merchant API.
+
+All clients share one keep-alive ``httpx.AsyncClient`` pool, so a burst of
+top-ups reuses TLS connections instead of paying a handshake (and a worker
+thread) per invoice. Requests to a store are capped by a per-store semaphore,
+retried with exponential backoff on 429/5xx and transport errors, and stopped
+by a per-store circuit breaker while Wallet Pay keeps failing.
+"""
 from __future__ import annotations
 
 import asyncio
+import random
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
 from typing import Any, Dict, Mapping
 
-import requests
+import httpx
+
+DEFAULT_API_BASE = "https://pay.wallet.tg"
+_MAX_RETRY_AFTER_SECONDS = 10.0
 
 
 @dataclass(slots=True)
@@ -31,8 +43,95 @@ class WalletPayConfigurationError(WalletPayError):
     """Raised when the wallet credentials are missing or invalid."""
 
 
+class WalletPayUnavailableError(WalletPayError):
+    """Raised without a request while the store's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cooldown."""
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._probing):
+            raise WalletPayUnavailableError("Wallet Pay is temporarily unavailable")
+        if state == "half-open":
+            self._probing = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+_http_client: httpx.AsyncClient | None = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _shared_http_client(max_connections: int) -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+    return _http_client
+
+
+def _store_semaphore(store_id: str, limit: int) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(store_id)
+    if semaphore is None:
+        semaphore = _semaphores[store_id] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def _store_breaker(store_id: str) -> CircuitBreaker:
+    breaker = _breakers.get(store_id)
+    if breaker is None:
+        breaker = _breakers[store_id] = CircuitBreaker()
+    return breaker
+
+
+async def close_wallet_client() -> None:
+    """Close the shared connection pool (bot shutdown)."""
+
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _semaphores.clear()
+    _breakers.clear()
+
+
 class WalletPayClient:
-    """Async helper for creating invoices via the Wallet Pay store API."""
+    """Async helper for creating invoices via the Wallet Pay store API.
+
+    Instances are cheap: the connection pool, the concurrency limit and the
+    circuit breaker are shared by every client of the same store.
+    """
 
     def __init__(
         self,
@@ -41,13 +140,22 @@ class WalletPayClient:
         api_key: str,
         store_id: str,
         timeout: float = 10.0,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        http_client: httpx.AsyncClient | None = None,
     ) -> None:
         if not api_key or not store_id:
             raise WalletPayConfigurationError("Wallet Pay credentials are not configured")
-        self._api_base = api_base.rstrip("/") or "https://pay.wallet.tg"
+        self._api_base = api_base.rstrip("/") or DEFAULT_API_BASE
         self._api_key = api_key
         self._store_id = store_id
         self._timeout = timeout
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._http = http_client or _shared_http_client(max_concurrency)
+        self._semaphore = _store_semaphore(store_id, max_concurrency)
+        self._breaker = _store_breaker(store_id)
 
     @property
     def _orders_url(self) -> str:
@@ -78,7 +186,7 @@ class WalletPayClient:
             "X-STORE-ID": self._store_id,
         }
 
-        data = await asyncio.to_thread(self._send_request, payload, headers)
+        data = await self._send_request(payload, headers)
         expires_at_raw = data.get("expiresAt")
         expires_at: datetime | None = None
         if isinstance(expires_at_raw, str) and expires_at_raw:
@@ -100,24 +208,60 @@ class WalletPayClient:
             expires_at=expires_at,
         )
 
-    def _send_request(self, payload: Mapping[str, Any], headers: Mapping[str, str]) -> Dict[str, Any]:
-        try:
-            response = requests.post(
-                self._orders_url,
-                json=payload,
-                headers=headers,
-                timeout=self._timeout,
-            )
-            response.raise_for_status()
-        except requests.HTTPError as exc:  # pragma: no cover - depends on API
-            status_code = exc.response.status_code if exc.response else "unknown"
-            detail = exc.response.text if exc.response else str(exc)
-            raise WalletPayError(
-                f"Wallet Pay responded with {status_code}: {detail}"
-            ) from exc
-        except requests.RequestException as exc:  # pragma: no cover - network failure
-            raise WalletPayError("Cannot reach Wallet Pay API") from exc
-        return response.json()
+    async def _send_request(
+        self, payload: Mapping[str, Any], headers: Mapping[str, str]
+    ) -> Dict[str, Any]:
+        """POST an order; the same ``orderId`` is resent on every retry."""
+
+        attempt = 0
+        while True:
+            self._breaker.before_call()
+            retry_after: float | None = None
+            cause: BaseException | None = None
+            try:
+                async with self._semaphore:
+                    response = await self._http.post(
+                        self._orders_url, json=payload, headers=headers, timeout=self._timeout
+                    )
+            except httpx.HTTPError as exc:
+                self._breaker.record_failure()
+                error = WalletPayError("Cannot reach Wallet Pay API")
+                cause = exc
+            except BaseException:
+                # Cancellation or an unexpected error must not leave a
+                # half-open probe claimed forever.
+                self._breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 429 or response.status_code >= 500:
+                    self._breaker.record_failure()
+                    error = WalletPayError(
+                        f"Wallet Pay responded with {response.status_code}: {response.text}"
+                    )
+                    retry_after = _retry_after_seconds(response)
+                elif response.is_error:
+                    # The request itself was rejected; Wallet Pay is healthy.
+                    self._breaker.record_success()
+                    raise WalletPayError(
+                        f"Wallet Pay responded with {response.status_code}: {response.text}"
+                    )
+                else:
+                    self._breaker.record_success()
+                    return response.json()
+
+            if attempt >= self._max_retries:
+                raise error from cause
+            attempt += 1
+            delay = self._backoff_seconds * 2 ** (attempt - 1)
+            await asyncio.sleep(max(delay * random.uniform(0.5, 1.0), retry_after or 0.0))
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    raw = response.headers.get("Retry-After")
+    try:
+        return min(float(raw), _MAX_RETRY_AFTER_SECONDS) if raw else None
+    except ValueError:
+        return None
 
 
 def _parse_datetime(value: str) -> datetime:
@@ -128,8 +272,11 @@ def _parse_datetime(value: str) -> datetime:
 
 
 __all__ = [
+    "CircuitBreaker",
     "WalletInvoice",
     "WalletPayClient",
     "WalletPayConfigurationError",
     "WalletPayError",
-]
\ No newline at end of file
+    "WalletPayUnavailableError",
+    "close_wallet_client",
+]
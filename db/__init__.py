@@ -3,6 +3,7 @@ from .models import (  # noqa: F401
     Base,
     Achievement,
     AchievementConditionType,
+    AchievementRecalcShard,
     Admin,
     AdminRequest,
     BannedRobloxAccount,
@@ -11,21 +12,29 @@ from .models import (  # noqa: F401
     IdempotencyKey,
     Invoice,
     LogEntry,
+    NotificationOutbox,
+    NutsBalanceCheckpoint,
     NutsTransaction,
     Payment,
+    PaymentInboxEvent,
     PaymentWebhookEvent,
+    PlayerPlaytime,
+    PlayerSession,
     Product,
     PromoCode,
     PromocodeRedemption,
     Purchase,
     Referral,
     ReferralReward,
+    ReferralTopupBonus,
     RobloxSyncEvent,
+    ScheduledAchievementCheck,
     Server,
     Setting,
     TopUpRequest,
     User,
     UserAchievement,
+    UserProductPurchase,
     Withdrawal,
 )
 
@@ -33,6 +42,7 @@ __all__ = [
     "Base",
     "Achievement",
     "AchievementConditionType",
+    "AchievementRecalcShard",
     "Admin",
     "AdminRequest",
     "BannedRobloxAccount",
@@ -41,20 +51,28 @@ __all__ = [
     "IdempotencyKey",
     "Invoice",
     "LogEntry",
+    "NotificationOutbox",
+    "NutsBalanceCheckpoint",
     "NutsTransaction",
     "Payment",
+    "PaymentInboxEvent",
     "PaymentWebhookEvent",
+    "PlayerPlaytime",
+    "PlayerSession",
     "Product",
     "PromoCode",
     "PromocodeRedemption",
     "Purchase",
     "Referral",
     "ReferralReward",
+    "ReferralTopupBonus",
     "RobloxSyncEvent",
+    "ScheduledAchievementCheck",
     "Server",
     "TopUpRequest",
     "Setting",
     "User",
     "UserAchievement",
+    "UserProductPurchase",
     "Withdrawal",
 ]
\ No newline at end of file
@@ -7,10 +7,12 @@ from uuid import uuid4
 from sqlalchemy import (
     BigInteger,
     Boolean,
+    CheckConstraint,
     Column,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -22,7 +24,7 @@ from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 def _generate_request_id() -> str:
     """Generate a short unique identifier suitable for request tracking."""
@@ -59,6 +61,9 @@ class AchievementConditionType(str, Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        CheckConstraint("nuts_balance >= 0", name="ck_users_nuts_balance_non_negative"),
+    )
 
     id = Column(Integer, primary_key=True)
     bot_user_id = Column(
@@ -291,6 +296,7 @@ class Product(Base):
     status = Column(String(32), default="active", nullable=False)
     per_user_limit = Column(Integer)
     stock_limit = Column(Integer)
+    sold_count = Column(Integer, default=0, nullable=False, server_default="0")
     referral_bonus = Column(Integer, default=0, nullable=False)
     metadata_json = Column("metadata", JSONB)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -302,6 +308,16 @@ class Product(Base):
     __table_args__ = (UniqueConstraint("server_id", "slug", name="uq_products_server_slug"),)
 
 
+class UserProductPurchase(Base):
+    __tablename__ = "user_product_purchases"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(
+        Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class Purchase(Base):
     __tablename__ = "purchases"
 
@@ -357,6 +373,7 @@ class NutsTransaction(Base):
     __tablename__ = "nuts_transactions"
     __table_args__ = (
         UniqueConstraint("request_id", name="uq_nuts_transactions_request_id"),
+        Index("ix_nuts_transactions_user_id_id", "user_id", "id"),
     )
 
     id = Column(Integer, primary_key=True)
@@ -383,12 +400,27 @@ class NutsTransaction(Base):
     invoice = relationship("Invoice", foreign_keys=[related_invoice])
 
 
+class NutsBalanceCheckpoint(Base):
+    __tablename__ = "nuts_balance_checkpoints"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    balance = Column(Integer, nullable=False)
+    last_transaction_id = Column(Integer, nullable=False, default=0, server_default="0")
+    drift = Column(Integer, nullable=False, default=0, server_default="0")
+    checked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class Invoice(Base):
     __tablename__ = "invoices"
     __table_args__ = (
         UniqueConstraint("request_id", name="uq_invoices_request_id"),
         UniqueConstraint("provider_invoice_id", name="uq_invoices_provider_invoice_id"),
         UniqueConstraint("external_invoice_id", name="uq_invoices_external_invoice_id"),
+        Index(
+            "ix_invoices_pending_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
     )
 
     id = Column(Integer, primary_key=True)
@@ -440,6 +472,30 @@ class PaymentWebhookEvent(Base):
     )
 
 
+class PaymentInboxEvent(Base):
+    __tablename__ = "payment_inbox_events"
+    __table_args__ = (
+        UniqueConstraint("provider", "idempotency_key", name="uq_payment_inbox_events_key"),
+        Index(
+            "ix_payment_inbox_events_due",
+            "available_at",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    provider = Column(String(32), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(32), default="pending", nullable=False, server_default="pending")
+    attempts = Column(Integer, default=0, nullable=False, server_default="0")
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+
+
 class Withdrawal(Base):
     __tablename__ = "withdrawals"
 
@@ -521,6 +577,24 @@ class ReferralReward(Base):
     payment = relationship("Payment", back_populates="referral_rewards")
 
 
+class ReferralTopupBonus(Base):
+    __tablename__ = "referral_topup_bonuses"
+    __table_args__ = (
+        UniqueConstraint("source_kind", "source_id", name="uq_referral_topup_bonuses_source"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source_kind = Column(String(16), nullable=False)
+    source_id = Column(Integer, nullable=False)
+    referral_id = Column(Integer, ForeignKey("referrals.id"), nullable=False)
+    referrer_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    referred_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    credited_amount = Column(Integer, nullable=False)
+    bonus_amount = Column(Integer, nullable=False)
+    percent = Column(Integer, nullable=False)
+    granted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class LogEntry(Base):
     __tablename__ = "logs"
 
@@ -561,15 +635,42 @@ class GameProgress(Base):
     __tablename__ = "game_progress"
 
     id = Column(Integer, primary_key=True)
-    roblox_user_id = Column(String(255), index=True, nullable=False)
+    roblox_user_id = Column(String(255), unique=True, index=True, nullable=False)
     progress = Column(JSONB, nullable=False)
     version = Column(Integer, nullable=False, default=1)
     metadata_json = Column("metadata", JSONB)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class PlayerPlaytime(Base):
+    __tablename__ = "player_playtime"
+
+    roblox_user_id = Column(String(255), primary_key=True)
+    minutes = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    source = Column(String(32))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class PlayerSession(Base):
+    __tablename__ = "player_sessions"
+
+    roblox_user_id = Column(String(255), primary_key=True)
+    job_id = Column(String(64), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+    minutes = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class GrantEvent(Base):
     __tablename__ = "game_grants"
+    __table_args__ = (
+        Index(
+            "ix_game_grants_undelivered",
+            "roblox_user_id",
+            "id",
+            postgresql_where=text("delivered_at IS NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     roblox_user_id = Column(String(255), index=True, nullable=False)
@@ -577,21 +678,92 @@ class GrantEvent(Base):
     source = Column(String(255))
     request_id = Column(String(64), unique=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True))
 
 
 class RobloxSyncEvent(Base):
     __tablename__ = "roblox_sync_events"
+    __table_args__ = (
+        Index(
+            "ix_roblox_sync_events_due",
+            "available_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+        Index(
+            "uq_roblox_sync_events_pending_progress",
+            "roblox_user_id",
+            "action",
+            unique=True,
+            postgresql_where=text("status = 'pending' AND action = 'progress'"),
+            sqlite_where=text("status = 'pending' AND action = 'progress'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     roblox_user_id = Column(String(255), index=True, nullable=False)
     action = Column(String(255), nullable=False)
     payload = Column(JSONB, nullable=False)
     response = Column(JSONB)
+    status = Column(String(32), default="pending", nullable=False, server_default="pending")
+    attempts = Column(Integer, default=0, nullable=False, server_default="0")
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True))
+
+
+class ScheduledAchievementCheck(Base):
+    __tablename__ = "scheduled_achievement_checks"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "achievement_id", name="uq_scheduled_achievement_checks_user_achievement"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    achievement_id = Column(
+        Integer, ForeignKey("achievements.id", ondelete="CASCADE"), nullable=False
+    )
+    due_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_due",
+            "available_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    chat_id = Column(BigInteger, nullable=False, index=True)
+    kind = Column(String(64), nullable=False)
+    message = Column(Text, nullable=False)
+    parse_mode = Column(String(16))
+    payload = Column(JSONB)
+    status = Column(String(32), default="pending", nullable=False, server_default="pending")
+    attempts = Column(Integer, default=0, nullable=False, server_default="0")
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+
 class IdempotencyKey(Base):
     __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index(
+            "ix_idempotency_keys_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     key = Column(String(255), unique=True, nullable=False, index=True)
@@ -600,6 +772,25 @@ class IdempotencyKey(Base):
     response_body = Column(JSONB)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True))
+
+
+class AchievementRecalcShard(Base):
+    __tablename__ = "achievement_recalc_shards"
+
+    id = Column(Integer, primary_key=True)
+    range_start = Column(Integer, nullable=False, unique=True)
+    range_end = Column(Integer, nullable=False)
+    owner = Column(String(255))
+    lease_expires_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    next_run_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_started_at = Column(DateTime(timezone=True))
+    last_finished_at = Column(DateTime(timezone=True))
+    last_duration_ms = Column(Integer)
+    last_user_count = Column(Integer)
+    last_granted_count = Column(Integer)
+    last_owner = Column(String(255))
 
 
 class Setting(Base):
@@ -10,6 +10,20 @@
             roblox_user_id = tostring(player.UserId),
             progress = {...},
         })
+
+    Progress saves can be buffered and sent as one signed batch per server:
+        client:QueueProgress(tostring(player.UserId), progress)
+        -- flushed automatically every ProgressBatchInterval seconds,
+        -- or explicitly (e.g. from game:BindToClose):
+        client:FlushProgress()
+
+    Once the backend acknowledged a snapshot, later saves are sent as RFC 7396
+    merge patches against that version; a patch larger than
+    ProgressPatchMaxRatio of the full snapshot is sent as the full snapshot.
+
+    Pulls remember the ETag of each player's snapshot and send it back as
+    If-None-Match, so an unchanged snapshot costs a 304 without a body:
+        local snapshot = client:PullProgress(tostring(player.UserId))
 ]]
 
 local HttpService = game:GetService("HttpService")
@@ -20,6 +34,26 @@ export type Config = {
     DefaultHeaders: { [string]: string }?,
     Timeout: number?,
     Endpoints: { [string]: string }?,
+    ProgressBatchInterval: number?,
+    ProgressBatchMaxSize: number?,
+    ProgressPatchMaxRatio: number?,
+}
+
+export type ProgressRecord = {
+    roblox_user_id: string,
+    progress: any,
+    version: number?,
+    metadata: any?,
+}
+
+type AckedProgress = {
+    version: number,
+    snapshot: any,
+}
+
+type PulledProgress = {
+    etag: string,
+    response: any,
 }
 
 export type RequestOptions = {
@@ -31,6 +65,72 @@ export type RequestOptions = {
 local BackendClient = {}
 BackendClient.__index = BackendClient
 
+local DEFAULT_PROGRESS_BATCH_PATH = "/game/progress/push-batch"
+local DEFAULT_PROGRESS_PULL_PATH = "/game/progress/pull"
+local HTTP_NOT_MODIFIED = 304
+
+-- JSONEncode cannot emit `null`, which merge patches use to delete keys; the
+-- sentinel is replaced with a literal null after encoding.
+local JSON_NULL = "__backend_client_json_null__"
+BackendClient.JsonNull = JSON_NULL
+
+local function isArray(value: any): boolean
+    return type(value) == "table" and (#value > 0 or next(value) == nil)
+end
+
+local function deepCopy(value: any): any
+    if type(value) ~= "table" then
+        return value
+    end
+    local copy = {}
+    for key, item in pairs(value) do
+        copy[key] = deepCopy(item)
+    end
+    return copy
+end
+
+local function sameValue(left: any, right: any): boolean
+    if type(left) ~= "table" or type(right) ~= "table" then
+        return left == right
+    end
+    return HttpService:JSONEncode(left) == HttpService:JSONEncode(right)
+end
+
+-- Returns the merge patch turning `old` into `new`, or nil when they match.
+-- Objects are diffed key by key; arrays and scalars are replaced whole.
+local function mergeDiff(old: any, new: any): any
+    if isArray(old) or isArray(new) or type(old) ~= "table" or type(new) ~= "table" then
+        if sameValue(old, new) then
+            return nil
+        end
+        return deepCopy(new)
+    end
+
+    local patch = {}
+    local changed = false
+    for key, newValue in pairs(new) do
+        local oldValue = old[key]
+        local nested
+        if oldValue == nil then
+            nested = deepCopy(newValue)
+        else
+            nested = mergeDiff(oldValue, newValue)
+        end
+        if nested ~= nil then
+            patch[key] = nested
+            changed = true
+        end
+    end
+    for key in pairs(old) do
+        if new[key] == nil then
+            patch[key] = JSON_NULL
+            changed = true
+        end
+    end
+
+    return if changed then patch else nil
+end
+
 local function ensureCryptAvailable()
     if typeof(crypt) ~= "table" or not crypt.hash or not crypt.hash.hmac then
         error("The `crypt` library is not available. Enable `Allow HTTP Requests` and run on the server.")
@@ -57,6 +157,13 @@ function BackendClient.new(config: Config)
     self._timeout = config.Timeout or 10
     self._defaultHeaders = config.DefaultHeaders or {}
     self.Endpoints = config.Endpoints or {}
+    self._progressInterval = config.ProgressBatchInterval or 5
+    self._progressMaxBatch = config.ProgressBatchMaxSize or 100
+    self._progressPatchMaxRatio = config.ProgressPatchMaxRatio or 0.5
+    self._progressBuffer = {} :: { [string]: ProgressRecord }
+    self._ackedProgress = {} :: { [string]: AckedProgress }
+    self._pulledProgress = {} :: { [string]: PulledProgress }
+    self._progressFlushScheduled = false
     return self
 end
 
@@ -86,7 +193,7 @@ function BackendClient:_request(method: string, path: string, bodyTable: any?, o
     options = options or {}
     local body = ""
     if bodyTable ~= nil then
-        body = HttpService:JSONEncode(bodyTable)
+        body = string.gsub(HttpService:JSONEncode(bodyTable), '"' .. JSON_NULL .. '"', "null")
     end
 
     local headers = self:_makeHeaders(body, options.Headers, options.IdempotencyKey)
@@ -110,12 +217,16 @@ function BackendClient:_request(method: string, path: string, bodyTable: any?, o
         error(string.format("Request to %s failed: %s", url, tostring(response)))
     end
 
+    if response.StatusCode == HTTP_NOT_MODIFIED then
+        return nil, response
+    end
+
     if not response.Success then
         error(string.format("Backend responded with HTTP %d: %s", response.StatusCode, response.Body))
     end
 
     if response.Body == nil or response.Body == "" then
-        return nil
+        return nil, response
     end
 
     local ok, decoded = pcall(function()
@@ -126,9 +237,185 @@ function BackendClient:_request(method: string, path: string, bodyTable: any?, o
         error(string.format("Failed to parse JSON response from %s: %s", url, tostring(decoded)))
     end
 
+    return decoded, response
+end
+
+function BackendClient:_scheduleProgressFlush()
+    if self._progressFlushScheduled then
+        return
+    end
+    self._progressFlushScheduled = true
+    task.delay(self._progressInterval, function()
+        self._progressFlushScheduled = false
+        self:FlushProgress()
+    end)
+end
+
+-- Buffers the latest progress of a player; only the newest save per player
+-- is sent with the next batch.
+function BackendClient:QueueProgress(robloxUserId: string, progress: any, version: number?, metadata: any?)
+    self._progressBuffer[robloxUserId] = {
+        roblox_user_id = robloxUserId,
+        progress = deepCopy(progress),
+        version = version,
+        metadata = metadata,
+    }
+
+    local pending = 0
+    for _ in pairs(self._progressBuffer) do
+        pending += 1
+    end
+
+    if pending >= self._progressMaxBatch then
+        task.spawn(function()
+            self:FlushProgress()
+        end)
+    else
+        self:_scheduleProgressFlush()
+    end
+end
+
+-- Drops the acknowledged snapshot of a player (e.g. when they leave), so the
+-- next save is sent in full.
+function BackendClient:ForgetProgress(robloxUserId: string)
+    self._ackedProgress[robloxUserId] = nil
+    self._pulledProgress[robloxUserId] = nil
+end
+
+-- Pulls the stored snapshot of a player, revalidating a previously pulled one
+-- with its ETag. The result also becomes the baseline for merge-patch saves.
+function BackendClient:PullProgress(robloxUserId: string): any
+    local path = self.Endpoints.ProgressPull or DEFAULT_PROGRESS_PULL_PATH
+    local pulled = self._pulledProgress[robloxUserId]
+    local headers = if pulled then { ["If-None-Match"] = pulled.etag } else nil
+
+    local decoded, response = self:Post(path, { roblox_user_id = robloxUserId }, { Headers = headers })
+    if response.StatusCode == HTTP_NOT_MODIFIED and pulled then
+        decoded = pulled.response
+    else
+        local etag = response.Headers and (response.Headers["etag"] or response.Headers["ETag"])
+        if etag then
+            self._pulledProgress[robloxUserId] = { etag = etag, response = decoded }
+        end
+    end
+
+    local acked = self._ackedProgress[robloxUserId]
+    if decoded and (acked == nil or acked.version < decoded.version) then
+        self._ackedProgress[robloxUserId] = {
+            version = decoded.version,
+            snapshot = deepCopy(decoded.progress),
+        }
+    end
     return decoded
 end
 
+-- Builds the wire record: a merge patch against the last acknowledged
+-- snapshot when that is smaller, otherwise the full snapshot.
+function BackendClient:_progressWireRecord(record: ProgressRecord): any
+    local acked = self._ackedProgress[record.roblox_user_id]
+    if acked then
+        local patch = mergeDiff(acked.snapshot, record.progress) or {}
+        local patchSize = #HttpService:JSONEncode(patch)
+        local fullSize = #HttpService:JSONEncode(record.progress)
+        if patchSize < fullSize * self._progressPatchMaxRatio then
+            return {
+                roblox_user_id = record.roblox_user_id,
+                patch = patch,
+                base_version = acked.version,
+                version = record.version,
+                metadata = record.metadata,
+            }
+        end
+    end
+    return record
+end
+
+function BackendClient:_acknowledgeProgress(records: { ProgressRecord }, wireRecords: { any }, response: any)
+    local byId = {}
+    for _, record in ipairs(records) do
+        byId[record.roblox_user_id] = record
+    end
+    local patched = {}
+    for _, wireRecord in ipairs(wireRecords) do
+        if wireRecord.patch ~= nil then
+            patched[wireRecord.roblox_user_id] = true
+        end
+    end
+
+    for _, stored in ipairs(response and response.records or {}) do
+        local record = byId[stored.roblox_user_id]
+        if record then
+            self._ackedProgress[stored.roblox_user_id] = {
+                version = stored.version,
+                snapshot = record.progress,
+            }
+        end
+    end
+
+    -- A patch against an outdated base is resent as the full snapshot with
+    -- its version, so the server still rejects it if a newer save is stored.
+    -- A full snapshot is only stale when its version lost to a newer save,
+    -- which must not be overwritten: drop it.
+    for _, robloxUserId in ipairs(response and response.stale or {}) do
+        self._ackedProgress[robloxUserId] = nil
+        local record = byId[robloxUserId]
+        if not record then
+            continue
+        elseif not patched[robloxUserId] then
+            warn("Dropping stale progress save", robloxUserId, record.version)
+        elseif self._progressBuffer[robloxUserId] == nil then
+            self._progressBuffer[robloxUserId] = {
+                roblox_user_id = record.roblox_user_id,
+                progress = record.progress,
+                version = record.version,
+                metadata = record.metadata,
+            }
+            self:_scheduleProgressFlush()
+        end
+    end
+end
+
+-- Sends every buffered save to /game/progress/push-batch, one request per
+-- ProgressBatchMaxSize records. Failed records are re-queued unless a newer
+-- save for the same player arrived meanwhile. Returns the number sent.
+function BackendClient:FlushProgress(): number
+    local buffered = self._progressBuffer
+    self._progressBuffer = {}
+
+    local records: { ProgressRecord } = {}
+    for _, record in pairs(buffered) do
+        table.insert(records, record)
+    end
+
+    local path = self.Endpoints.ProgressPushBatch or DEFAULT_PROGRESS_BATCH_PATH
+    local sent = 0
+    for start = 1, #records, self._progressMaxBatch do
+        local chunk = table.move(records, start, math.min(start + self._progressMaxBatch - 1, #records), 1, {})
+        local wireRecords = {}
+        for _, record in ipairs(chunk) do
+            table.insert(wireRecords, self:_progressWireRecord(record))
+        end
+        local ok, result = pcall(function()
+            return self:Post(path, { records = wireRecords })
+        end)
+
+        if ok then
+            sent += #chunk
+            self:_acknowledgeProgress(chunk, wireRecords, result)
+        else
+            warn("Progress batch push failed", result)
+            for _, record in ipairs(chunk) do
+                if self._progressBuffer[record.roblox_user_id] == nil then
+                    self._progressBuffer[record.roblox_user_id] = record
+                end
+            end
+            self:_scheduleProgressFlush()
+        end
+    end
+
+    return sent
+end
+
 function BackendClient:Get(path: string, options: RequestOptions?)
     return self:_request("GET", path, nil, options)
 end
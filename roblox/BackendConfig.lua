@@ -23,12 +23,35 @@ local BackendConfig = {
     -- Request timeout in seconds for HttpService calls.
     Timeout = 10,
 
+    -- Progress saves are buffered per server and pushed in batches:
+    -- at most every ProgressBatchInterval seconds or once ProgressBatchMaxSize
+    -- players are waiting (backend limit: 200 records per batch).
+    ProgressBatchInterval = 5,
+    ProgressBatchMaxSize = 100,
+
+    -- Saves after the first acknowledged one are sent as merge patches unless
+    -- the patch is at least this fraction of the full snapshot's size.
+    ProgressPatchMaxRatio = 0.5,
+
+    -- Slug of this place in the bot's server list (servers.slug); live player
+    -- counts in the Telegram play menu are grouped by it.
+    ServerSlug = "server-1",
+
+    -- Seconds between server heartbeats. Keep it well below the backend's
+    -- BACKEND_SERVERS_HEARTBEAT_TTL (90 by default).
+    HeartbeatInterval = 30,
+
     -- Endpoint paths used by the helper modules.
     Endpoints = {
         VerifyCode = "/bot/verification/check",
         VerificationStatus = "/bot/verification/status",
         GrantRewards = "/game/grant",
+        PendingGrants = "/game/grants/pending",
+        AckGrants = "/game/grants/ack",
         ProgressPush = "/game/progress/push",
+        ProgressPushBatch = "/game/progress/push-batch",
+        ProgressPull = "/game/progress/pull",
+        ServerHeartbeat = "/game/servers/heartbeat",
     },
 }
 
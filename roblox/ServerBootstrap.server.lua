@@ -15,10 +15,12 @@ local Config = require(ServerStorage.Backend.BackendConfig)
 local BackendClient = require(ServerStorage.Backend.BackendClient)
 local VerificationService = require(ServerStorage.Backend.VerificationService)
 local ShopGrantService = require(ServerStorage.Backend.ShopGrantService)
+local ServerHeartbeatService = require(ServerStorage.Backend.ServerHeartbeatService)
 
 local client = BackendClient.new(Config)
 local verifier = VerificationService.new(client, Config.Endpoints)
 local grants = ShopGrantService.new(client, Config.Endpoints)
+local heartbeat = ServerHeartbeatService.new(client, Config)
 
 local GrantPurchaseEvent = ReplicatedStorage:FindFirstChild("GrantPurchase")
 
@@ -62,6 +64,35 @@ Players.PlayerAdded:Connect(function(player)
     task.defer(handlePlayerVerification, player)
 end)
 
+-- Grants queued outside this server (other servers, admin tools) are pulled
+-- for the players online here and acknowledged once applied.
+grants:StartDeliveryLoop(function(grant)
+    local player = Players:GetPlayerByUserId(tonumber(grant.roblox_user_id) or 0)
+    if not player then
+        return false
+    end
+    -- Apply grant.rewards to the player's data here.
+    player:SetAttribute("LastGrantRequestId", grant.request_id)
+    return true
+end)
+
+-- One request every Config.HeartbeatInterval seconds reports everyone online;
+-- the backend derives session minutes and the play menu's live counts from it.
+heartbeat:Start()
+
+Players.PlayerRemoving:Connect(function(player)
+    -- A buffered final save is still sent; only the diff baseline is dropped.
+    client:ForgetProgress(tostring(player.UserId))
+end)
+
+-- Progress saves queued with client:QueueProgress(...) are sent in batches;
+-- push whatever is still buffered before the server shuts down.
+game:BindToClose(function()
+    grants:StopDeliveryLoop()
+    heartbeat:Stop()
+    client:FlushProgress()
+end)
+
 if GrantPurchaseEvent and GrantPurchaseEvent:IsA("RemoteEvent") then
     GrantPurchaseEvent.OnServerEvent:Connect(function(player, payload)
         if typeof(payload) ~= "table" or typeof(payload.rewards) ~= "table" then
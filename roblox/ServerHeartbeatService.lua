@@ -0,0 +1,101 @@
+--!strict
+--[[
+    Reports this server and everyone in it to the FastAPI backend.
+
+    One signed request every HeartbeatInterval seconds carries the job id and
+    the full player list; the backend keeps a roster that expires on its own,
+    extends player sessions in bulk and shows live counts in the Telegram
+    play menu.
+
+    Example usage (ServerScriptService Script):
+        local heartbeat = ServerHeartbeatService.new(client, Config)
+        heartbeat:Start()
+        game:BindToClose(function()
+            heartbeat:Stop()
+        end)
+]]
+
+local Players = game:GetService("Players")
+
+local DEFAULT_INTERVAL_SECONDS = 30
+
+local ServerHeartbeatService = {}
+ServerHeartbeatService.__index = ServerHeartbeatService
+
+export type Config = {
+    ServerSlug: string?,
+    HeartbeatInterval: number?,
+    Endpoints: { ServerHeartbeat: string? }?,
+}
+
+export type BackendClient = {
+    Post: (self: any, path: string, body: any?, options: any?) -> any?,
+}
+
+function ServerHeartbeatService.new(client: BackendClient, config: Config)
+    assert(client, "ServerHeartbeatService requires a BackendClient instance")
+    assert(config.ServerSlug, "BackendConfig.ServerSlug is required")
+    local self = setmetatable({}, ServerHeartbeatService)
+    self._client = client
+    self._server = config.ServerSlug
+    self._interval = config.HeartbeatInterval or DEFAULT_INTERVAL_SECONDS
+    self._path = config.Endpoints and config.Endpoints.ServerHeartbeat or "/game/servers/heartbeat"
+    self._running = false
+    return self
+end
+
+-- Job id of this server; Studio play sessions have an empty JobId.
+local function jobId(): string
+    return if game.JobId ~= "" then game.JobId else "studio"
+end
+
+function ServerHeartbeatService:Send(closing: boolean?)
+    local robloxUserIds = {}
+    if not closing then
+        for _, player in ipairs(Players:GetPlayers()) do
+            table.insert(robloxUserIds, tostring(player.UserId))
+        end
+    end
+    return self._client:Post(self._path, {
+        job_id = jobId(),
+        server = self._server,
+        roblox_user_ids = robloxUserIds,
+        closing = closing == true,
+    })
+end
+
+-- Sends a heartbeat right away and then every HeartbeatInterval seconds.
+function ServerHeartbeatService:Start()
+    if self._running then
+        return
+    end
+    self._running = true
+
+    task.spawn(function()
+        while self._running do
+            local ok, err = pcall(function()
+                return self:Send(false)
+            end)
+            if not ok then
+                warn("Server heartbeat failed", err)
+            end
+            task.wait(self._interval)
+        end
+    end)
+end
+
+-- Stops the loop and removes this server from the roster immediately.
+function ServerHeartbeatService:Stop()
+    if not self._running then
+        return
+    end
+    self._running = false
+    local ok, err = pcall(function()
+        return self:Send(true)
+    end)
+    if not ok then
+        warn("Final server heartbeat failed", err)
+    end
+end
+
+return ServerHeartbeatService
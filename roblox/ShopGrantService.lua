@@ -13,15 +13,28 @@
         grants:GrantRewards(tostring(player.UserId), {
             { type = "currency", amount = 250 },
         }, "daily_shop")
+
+    Grants queued elsewhere (other servers, admin tools) are pulled for the players
+    in this server with one long-polling request and acknowledged in batches:
+        grants:StartDeliveryLoop(function(grant)
+            -- apply grant.rewards to the player; return true once applied
+            return true
+        end)
 ]]
 
 local HttpService = game:GetService("HttpService")
+local Players = game:GetService("Players")
+
+local DEFAULT_LONG_POLL_SECONDS = 20
+local RETRY_DELAY_SECONDS = 5
 
 local ShopGrantService = {}
 ShopGrantService.__index = ShopGrantService
 
 export type Endpoints = {
     GrantRewards: string?,
+    PendingGrants: string?,
+    AckGrants: string?,
 }
 
 export type BackendClient = {
@@ -33,6 +46,9 @@ function ShopGrantService.new(client: BackendClient, endpoints: Endpoints?)
     local self = setmetatable({}, ShopGrantService)
     self._client = client
     self._grantPath = endpoints and endpoints.GrantRewards or "/game/grant"
+    self._pendingPath = endpoints and endpoints.PendingGrants or "/game/grants/pending"
+    self._ackPath = endpoints and endpoints.AckGrants or "/game/grants/ack"
+    self._deliveryRunning = false
     return self
 end
 
@@ -42,7 +58,9 @@ export type Reward = {
     item_id: string?,
 }
 
-function ShopGrantService:GrantRewards(robloxUserId: string, rewards: { Reward }, source: string?)
+-- With `queue` the grant is not applied here but handed to whichever server
+-- the player is in through StartDeliveryLoop.
+function ShopGrantService:GrantRewards(robloxUserId: string, rewards: { Reward }, source: string?, queue: boolean?)
     assert(robloxUserId ~= "", "robloxUserId is required")
     assert(#rewards > 0, "at least one reward must be provided")
 
@@ -52,6 +70,7 @@ function ShopGrantService:GrantRewards(robloxUserId: string, rewards: { Reward }
         roblox_user_id = robloxUserId,
         rewards = rewards,
         source = source,
+        queue = queue == true,
     }
 
     return self._client:Post(self._grantPath, payload, {
@@ -59,4 +78,91 @@ function ShopGrantService:GrantRewards(robloxUserId: string, rewards: { Reward }
     })
 end
 
+export type PendingGrant = {
+    id: number,
+    roblox_user_id: string,
+    request_id: string,
+    rewards: { Reward },
+    source: string?,
+}
+
+-- Returns the undelivered grants of the given players. With waitSeconds the
+-- backend holds the request until a grant arrives or the wait runs out.
+function ShopGrantService:FetchPending(robloxUserIds: { string }, waitSeconds: number?): { PendingGrant }
+    if #robloxUserIds == 0 then
+        return {}
+    end
+    local wait = waitSeconds or 0
+    local response = self._client:Post(self._pendingPath, {
+        roblox_user_ids = robloxUserIds,
+        wait_seconds = wait,
+    }, {
+        Timeout = wait + 10,
+    })
+    return response and response.grants or {}
+end
+
+-- Marks applied grants as delivered so they are not returned again.
+function ShopGrantService:Acknowledge(grantIds: { number })
+    if #grantIds == 0 then
+        return nil
+    end
+    return self._client:Post(self._ackPath, { grant_ids = grantIds })
+end
+
+-- Long-polls pending grants for everyone in the server until StopDeliveryLoop.
+-- `applyGrant` returns true once the rewards were applied; only those grants
+-- are acknowledged, the rest come back with the next poll.
+function ShopGrantService:StartDeliveryLoop(applyGrant: (PendingGrant) -> boolean, waitSeconds: number?)
+    if self._deliveryRunning then
+        return
+    end
+    self._deliveryRunning = true
+
+    task.spawn(function()
+        while self._deliveryRunning do
+            local robloxUserIds = {}
+            for _, player in ipairs(Players:GetPlayers()) do
+                table.insert(robloxUserIds, tostring(player.UserId))
+            end
+
+            if #robloxUserIds == 0 then
+                task.wait(RETRY_DELAY_SECONDS)
+                continue
+            end
+
+            local ok, result = pcall(function()
+                return self:FetchPending(robloxUserIds, waitSeconds or DEFAULT_LONG_POLL_SECONDS)
+            end)
+            if not ok then
+                warn("Fetching pending grants failed", result)
+                task.wait(RETRY_DELAY_SECONDS)
+                continue
+            end
+
+            local applied = {}
+            for _, grant in ipairs(result) do
+                local applyOk, done = pcall(applyGrant, grant)
+                if applyOk and done then
+                    table.insert(applied, grant.id)
+                elseif not applyOk then
+                    warn("Applying grant failed", grant.request_id, done)
+                end
+            end
+
+            local ackOk, ackError = pcall(function()
+                return self:Acknowledge(applied)
+            end)
+            if not ackOk then
+                warn("Acknowledging grants failed", ackError)
+                task.wait(RETRY_DELAY_SECONDS)
+            end
+        end
+    end)
+end
+
+function ShopGrantService:StopDeliveryLoop()
+    self._deliveryRunning = false
+end
+
 return ShopGrantService
\ No newline at end of file
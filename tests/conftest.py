@@ -4,11 +4,13 @@ from __future__ import annotations
 
 import os
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 from types import SimpleNamespace
 from typing import Callable, Iterable, List, Sequence
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -154,6 +156,9 @@ class FakeExecuteResult:
     def all(self):
         return list(self._rows)
 
+    def first(self):
+        return self._rows[0] if self._rows else None
+
 
 class FakeAsyncSession:
     """Lightweight async session mimicking common SQLAlchemy APIs."""
@@ -177,6 +182,7 @@ class FakeAsyncSession:
         self.deleted: list = []
         self.executed_statements: list = []
         self.rolled_back = False
+        self.info: dict = {}
 
     async def __aenter__(self):
         return self
@@ -264,6 +270,43 @@ def make_async_session_stub(*sessions: FakeAsyncSession) -> Callable[[], FakeAsy
     return factory
 
 
+def make_session_scope(session_factory: async_sessionmaker) -> Callable:
+    """Return a ``session_scope`` replacement that commits on success."""
+
+    @asynccontextmanager
+    async def scope():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    return scope
+
+
+@pytest.fixture
+async def sqlite_engine(tmp_path):
+    """File-backed SQLite engine with every table created."""
+
+    pytest.importorskip("aiosqlite")
+    from db.models import Base
+
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", connect_args={"timeout": 30}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def sqlite_sessions(sqlite_engine) -> async_sessionmaker:
+    return async_sessionmaker(sqlite_engine, expire_on_commit=False, class_=AsyncSession)
+
+
 @pytest.fixture
 async def mock_bot() -> MockBot:
     return MockBot()
@@ -305,4 +348,5 @@ __all__ = [
     "MockFSMContext",
     "FakeAsyncSession",
     "make_async_session_stub",
+    "make_session_scope",
 ]
\ No newline at end of file
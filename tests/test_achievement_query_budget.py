@@ -0,0 +1,71 @@
+"""Query-budget regression suite for the achievement engine.
+
+Runs against in-memory SQLite by default; set ``ACHIEVEMENT_BENCH_DATABASE_URL``
+to an empty local Postgres database to run the same checks there.
+"""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from backend.benchmarks import achievements as bench
+
+DATABASE_URL = os.getenv("ACHIEVEMENT_BENCH_DATABASE_URL", bench.DEFAULT_DATABASE_URL)
+CONFIG = bench.BenchmarkConfig(users=30, sample_users=10)
+
+
+@pytest.mark.anyio("asyncio")
+@pytest.mark.parametrize("trigger", sorted(bench.TRIGGER_PAYLOADS))
+async def test_evaluation_stays_within_statement_budget(trigger):
+    async with bench.benchmark_database(DATABASE_URL, CONFIG) as (
+        engine,
+        session_factory,
+        user_ids,
+    ):
+        result = await bench.measure_trigger(
+            engine, session_factory, user_ids[: CONFIG.sample_users], trigger
+        )
+
+    assert result.evaluations == CONFIG.sample_users
+    # Exact on both ends, so a change in one trigger's reads cannot hide under
+    # a budget sized for the others.
+    assert result.min_reads == result.max_reads == bench.EVALUATION_READ_BUDGETS[trigger]
+    assert result.max_writes_per_grant <= bench.WRITE_STATEMENTS_PER_GRANT
+    assert result.over_budget == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_scheduled_pass_covers_every_user_without_extra_queries():
+    async with bench.benchmark_database(DATABASE_URL, CONFIG) as (
+        engine,
+        session_factory,
+        user_ids,
+    ):
+        users_per_second, statements_per_user = await bench.measure_scheduled_throughput(
+            engine, session_factory, user_ids
+        )
+
+    assert users_per_second > 0
+    # One user lookup on top of a single evaluation's reads and grant writes.
+    max_grants = len(list(bench.AchievementConditionType))
+    assert statements_per_user <= 1 + bench.EVALUATION_READ_BUDGETS["scheduled"] + (
+        max_grants * bench.WRITE_STATEMENTS_PER_GRANT
+    )
+
+
+def test_every_trigger_has_its_own_budget():
+    assert set(bench.EVALUATION_READ_BUDGETS) == set(bench.TRIGGER_PAYLOADS)
+
+
+@pytest.mark.parametrize("trigger", sorted(bench.TRIGGER_PAYLOADS))
+def test_budget_check_flags_extra_reads_and_writes(trigger):
+    budget = bench.EVALUATION_READ_BUDGETS[trigger]
+
+    assert bench.within_budget(trigger, reads=budget, writes=10, grants=2)
+    assert not bench.within_budget(trigger, reads=budget + 1, writes=0, grants=0)
+    assert not bench.within_budget(
+        trigger, reads=budget, writes=bench.WRITE_STATEMENTS_PER_GRANT + 1, grants=1
+    )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.services import achievements as achievements_service
+from backend.services import shards as shards_service
+from tests.conftest import FakeAsyncSession, FakeExecuteResult
+
+
+class RowResult(FakeExecuteResult):
+    rowcount = 1
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+
+class ShardSession(FakeAsyncSession):
+    async def execute(self, *args, **kwargs):  # type: ignore[override]
+        result = await super().execute(*args, **kwargs)
+        return RowResult(result.all())
+
+
+def _settings(**overrides):
+    values = {
+        "achievements_recalc_interval_seconds": 300,
+        "achievements_recalc_lease_seconds": 60,
+        "instance_id": "replica-a",
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _fake_scope(monkeypatch):
+    @asynccontextmanager
+    async def scope():
+        yield FakeAsyncSession()
+
+    monkeypatch.setattr(achievements_service, "session_scope", scope)
+
+
+def test_shard_ranges_cover_all_user_ids():
+    assert shards_service.shard_ranges(None, 100) == [(0, 100)]
+    assert shards_service.shard_ranges(250, 100) == [(0, 100), (100, 200), (200, 300)]
+    assert shards_service.shard_ranges(200, 100)[-1] == (200, 300)
+
+    with pytest.raises(ValueError):
+        shards_service.shard_ranges(10, 0)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_claim_shard_returns_lease_for_claimed_row():
+    session = ShardSession(execute_results=[[(3, 1000, 1500)]])
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    lease = await shards_service.claim_shard(
+        session, owner="replica-a", lease_seconds=60, now=now
+    )
+
+    assert lease is not None
+    assert (lease.shard_id, lease.range_start, lease.range_end) == (3, 1000, 1500)
+    assert lease.claimed_at == now
+    compiled = session.executed_statements[0].compile(dialect=postgresql.dialect())
+    assert "FOR UPDATE SKIP LOCKED" in str(compiled)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_claim_shard_returns_none_when_nothing_is_due():
+    session = ShardSession(execute_results=[[]])
+
+    assert await shards_service.claim_shard(session, owner="a", lease_seconds=60) is None
+
+
+@pytest.mark.anyio("asyncio")
+async def test_process_next_shard_releases_with_metrics(monkeypatch):
+    _fake_scope(monkeypatch)
+    claimed_at = datetime.now(timezone.utc)
+    lease = shards_service.ShardLease(
+        shard_id=1, range_start=0, range_end=500, owner="replica-a", claimed_at=claimed_at
+    )
+    released: list[dict] = []
+
+    async def fake_claim(session, *, owner, lease_seconds):
+        return lease
+
+    async def fake_recalculate(claimed):
+        assert claimed is lease
+        return 12, 2
+
+    async def fake_release(session, claimed, **kwargs):
+        released.append(kwargs)
+
+    monkeypatch.setattr(achievements_service, "claim_shard", fake_claim)
+    monkeypatch.setattr(achievements_service, "_recalculate_shard", fake_recalculate)
+    monkeypatch.setattr(achievements_service, "release_shard", fake_release)
+
+    assert await achievements_service._process_next_shard(_settings()) is True
+    assert released == [
+        {
+            "next_run_at": claimed_at + timedelta(seconds=300),
+            "user_count": 12,
+            "granted_count": 2,
+        }
+    ]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_process_next_shard_does_not_release_lost_lease(monkeypatch):
+    _fake_scope(monkeypatch)
+    lease = shards_service.ShardLease(
+        shard_id=1,
+        range_start=0,
+        range_end=500,
+        owner="replica-a",
+        claimed_at=datetime.now(timezone.utc),
+    )
+    released: list = []
+
+    async def fake_claim(session, *, owner, lease_seconds):
+        return lease
+
+    async def fake_recalculate(claimed):
+        claimed.lost = True
+        raise shards_service.ShardLeaseLostError("lost")
+
+    async def fake_release(session, claimed, **kwargs):
+        released.append(kwargs)
+
+    monkeypatch.setattr(achievements_service, "claim_shard", fake_claim)
+    monkeypatch.setattr(achievements_service, "_recalculate_shard", fake_recalculate)
+    monkeypatch.setattr(achievements_service, "release_shard", fake_release)
+
+    assert await achievements_service._process_next_shard(_settings()) is True
+    assert released == []
+
+
+@pytest.mark.anyio("asyncio")
+async def test_process_next_shard_reports_idle_when_no_shard_due(monkeypatch):
+    _fake_scope(monkeypatch)
+
+    async def fake_claim(session, *, owner, lease_seconds):
+        return None
+
+    monkeypatch.setattr(achievements_service, "claim_shard", fake_claim)
+
+    assert await achievements_service._process_next_shard(_settings()) is False
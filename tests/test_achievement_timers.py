@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Delete, Insert
+
+from backend.services import achievement_timers
+from bot.db import Achievement, AchievementConditionType, User
+from tests.conftest import FakeAsyncSession
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _phrase_achievement(achievement_id: int, phrase: str, hours: int) -> Achievement:
+    return Achievement(
+        id=achievement_id,
+        name=f"Phrase {achievement_id}",
+        reward=10,
+        condition_type=AchievementConditionType.PROFILE_PHRASE_STREAK.value,
+        condition_threshold=hours,
+        manual_grant_only=False,
+        metadata_json={"phrase": phrase},
+    )
+
+
+def _compiled_params(statement):
+    return statement.compile(dialect=postgresql.dialect()).params
+
+
+@pytest.mark.anyio("asyncio")
+async def test_saving_phrase_schedules_check_at_threshold():
+    user = User(id=5, about_text="I love BigBob", about_text_updated_at=NOW)
+    session = FakeAsyncSession(
+        scalars_results=[
+            [_phrase_achievement(1, "bigbob", 24), _phrase_achievement(2, "absent", 1)],
+            [],
+        ]
+    )
+
+    scheduled = await achievement_timers.schedule_profile_phrase_checks(
+        session, user, now=NOW
+    )
+
+    assert scheduled == 1
+    cancel, upsert = session.executed_statements
+    assert isinstance(cancel, Delete)
+    assert isinstance(upsert, Insert)
+    params = _compiled_params(upsert)
+    assert params["user_id_m0"] == 5
+    assert params["achievement_id_m0"] == 1
+    assert params["due_at_m0"] == NOW + timedelta(hours=24)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_editing_phrase_away_only_cancels_pending_checks():
+    user = User(id=5, about_text="something else", about_text_updated_at=NOW)
+    session = FakeAsyncSession(
+        scalars_results=[[_phrase_achievement(1, "bigbob", 24)], []]
+    )
+
+    scheduled = await achievement_timers.schedule_profile_phrase_checks(
+        session, user, now=NOW
+    )
+
+    assert scheduled == 0
+    assert len(session.executed_statements) == 1
+    assert isinstance(session.executed_statements[0], Delete)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_owned_or_already_due_phrases_are_not_scheduled():
+    user = User(id=5, about_text="bigbob forever", about_text_updated_at=NOW)
+    session = FakeAsyncSession(
+        scalars_results=[
+            [_phrase_achievement(1, "bigbob", 24), _phrase_achievement(2, "forever", 0)],
+            [1],
+        ]
+    )
+
+    scheduled = await achievement_timers.schedule_profile_phrase_checks(
+        session, user, now=NOW
+    )
+
+    assert scheduled == 0
+    assert len(session.executed_statements) == 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_claim_due_checks_groups_by_user():
+    session = FakeAsyncSession(execute_results=[[(1, 10), (2, 10), (1, 11)]])
+
+    due = await achievement_timers.claim_due_checks(session, limit=50, now=NOW)
+
+    assert due == {1: [10, 11], 2: [10]}
+    compiled = str(session.executed_statements[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in compiled
+    assert "RETURNING" in compiled
+
+
+@pytest.mark.anyio("asyncio")
+async def test_process_due_checks_evaluates_only_due_achievements(monkeypatch):
+    user = User(id=1, tg_id=100)
+    session = FakeAsyncSession(scalars_results=[[user]])
+
+    @asynccontextmanager
+    async def scope():
+        yield session
+
+    async def fake_claim(_session, *, limit):
+        return {1: [10, 11]}
+
+    evaluate_mock = AsyncMock(return_value=[])
+    monkeypatch.setattr(achievement_timers, "session_scope", scope)
+    monkeypatch.setattr(achievement_timers, "claim_due_checks", fake_claim)
+    monkeypatch.setattr(achievement_timers, "evaluate_and_grant_achievements", evaluate_mock)
+
+    consumed = await achievement_timers.process_due_checks()
+
+    assert consumed == 2
+    evaluate_mock.assert_awaited_once()
+    assert evaluate_mock.await_args.kwargs["achievement_ids"] == [10, 11]
+    assert evaluate_mock.await_args.kwargs["trigger"] == "scheduled_check"
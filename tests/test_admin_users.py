@@ -6,7 +6,7 @@ from types import SimpleNamespace
 import pytest
 
 from bot.handlers.admin import users
-from bot.states.admin_states import GiveTitleState, RemoveTitleState
+from bot.states.admin_states import GiveTitleState, RemoveMoneyState, RemoveTitleState
 
 from tests.conftest import FakeAsyncSession, make_async_session_stub
 
@@ -142,4 +142,29 @@ async def test_remove_title_confirm_updates_user(
     args, kwargs = call.bot.sent_messages[-1]
     assert args[0] == target_user_id
     assert "Legend" in args[1]
-    assert kwargs.get("parse_mode") == "HTML"
\ No newline at end of file
+    assert kwargs.get("parse_mode") == "HTML"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_process_remove_reason_reports_a_balance_spent_meanwhile(
+    monkeypatch, message_factory, mock_state
+):
+    async def _is_admin_stub(*_args, **_kwargs) -> bool:
+        return True
+
+    monkeypatch.setattr(users, "is_admin", _is_admin_stub)
+
+    user = users.User(id=5, tg_id=777, nuts_balance=50)
+    # The debit UPDATE matches no row; the follow-up lookup finds the user.
+    session = FakeAsyncSession(scalar_results=[user, user.id])
+    monkeypatch.setattr(users, "async_session", make_async_session_stub(session))
+
+    await mock_state.set_state(RemoveMoneyState.waiting_for_reason)
+    await mock_state.update_data(target_user_id=777, remove_amount=50)
+    message = message_factory(text="refund")
+
+    await users.process_remove_reason(message, mock_state)
+
+    assert message.replies[-1][0] == "❌ Баланс пользователя изменился, удержание невозможно"
+    assert session.committed is False
+    assert await mock_state.get_state() is None
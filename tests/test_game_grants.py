@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from backend.routers import game
+from backend.services import grants as grants_service
+from bot.db import RobloxSyncEvent
+from tests.conftest import FakeAsyncSession
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.anyio("asyncio")
+async def test_pending_grants_read_only_undelivered_rows():
+    session = FakeAsyncSession(
+        execute_results=[[(7, "10", "req-7", [{"type": "currency", "amount": 5}], "shop", NOW)]]
+    )
+
+    grants = await grants_service.list_pending_grants(session, ["10", "11"], limit=50)
+
+    assert grants == [
+        {
+            "id": 7,
+            "roblox_user_id": "10",
+            "request_id": "req-7",
+            "rewards": [{"type": "currency", "amount": 5}],
+            "source": "shop",
+            "created_at": NOW,
+        }
+    ]
+    sql = _sql(session.executed_statements[0])
+    assert "game_grants.delivered_at IS NULL" in sql
+    assert "game_grants.roblox_user_id IN" in sql
+    assert "ORDER BY game_grants.id" in sql
+
+
+@pytest.mark.anyio("asyncio")
+async def test_ack_only_marks_pending_grants():
+    session = FakeAsyncSession(execute_results=[[(9,), (4,)]])
+
+    acknowledged = await grants_service.acknowledge_grants(session, [4, 9, 12], now=NOW)
+
+    assert acknowledged == [4, 9]
+    sql = _sql(session.executed_statements[0])
+    assert sql.startswith("UPDATE game_grants SET delivered_at=")
+    assert "AND game_grants.delivered_at IS NULL RETURNING game_grants.id" in sql
+
+
+@pytest.mark.anyio("asyncio")
+async def test_long_poll_returns_when_a_grant_is_committed(monkeypatch):
+    loads = []
+    grant = {"id": 3, "roblox_user_id": "10"}
+
+    async def fake_load(roblox_user_ids):
+        loads.append(list(roblox_user_ids))
+        return [grant] if len(loads) > 1 else []
+
+    monkeypatch.setattr(game, "_load_pending_grants", fake_load)
+    monkeypatch.setattr(
+        game,
+        "get_settings",
+        lambda: SimpleNamespace(grants_long_poll_max_seconds=5, grants_poll_interval_seconds=5),
+    )
+    payload = game.PendingGrantsRequest(roblox_user_ids=["10", "11", "10"], wait_seconds=5)
+
+    async def grant_arrives():
+        await asyncio.sleep(0.05)
+        grants_service.grant_notifier.notify(["10"])
+
+    started = asyncio.get_running_loop().time()
+    response, _ = await asyncio.gather(game.pending_grants(payload), grant_arrives())
+
+    assert response == {"grants": [grant], "count": 1}
+    assert loads == [["10", "11"], ["10", "11"]]
+    assert asyncio.get_running_loop().time() - started < 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_notifier_times_out_and_forgets_waiters():
+    notifier = grants_service.GrantNotifier()
+
+    assert await notifier.wait(["1"], 0.01) is False
+    assert notifier._waiters == {}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_server_grants_are_not_delivered_again(sqlite_sessions, monkeypatch):
+    async def fake_ensure_idempotency(session, request, endpoint):
+        return SimpleNamespace(completed_at=None, key="key-1")
+
+    async def fake_finalize_idempotency(session, entry, response, status_code):
+        return None
+
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure_idempotency)
+    monkeypatch.setattr(game, "finalize_idempotency", fake_finalize_idempotency)
+    session_factory = sqlite_sessions
+    payload = game.GrantRequest(
+        request_id="req-1",
+        roblox_user_id="10",
+        rewards=[{"type": "currency", "amount": 5}],
+        source="shop",
+    )
+
+    async with session_factory() as session:
+        response = await game.grant_rewards(payload, request=None, session=session)
+        await session.commit()
+    async with session_factory() as session:
+        pending = await grants_service.list_pending_grants(session, ["10"], limit=50)
+        outbox = await session.scalar(select(func.count()).select_from(RobloxSyncEvent))
+
+    assert response["grant_id"]
+    assert pending == []
+    assert outbox == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_queued_grants_wake_polls_after_commit(sqlite_sessions, monkeypatch):
+    async def fake_ensure_idempotency(session, request, endpoint):
+        return SimpleNamespace(completed_at=None, key="key-2")
+
+    async def fake_finalize_idempotency(session, entry, response, status_code):
+        return None
+
+    notified = []
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure_idempotency)
+    monkeypatch.setattr(game, "finalize_idempotency", fake_finalize_idempotency)
+    monkeypatch.setattr(game.grant_notifier, "notify", lambda ids: notified.append(list(ids)))
+    payload = game.GrantRequest(
+        request_id="req-2",
+        roblox_user_id="10",
+        rewards=[{"type": "currency", "amount": 5}],
+        source="admin",
+        queue=True,
+    )
+
+    async with sqlite_sessions() as session:
+        response = await game.grant_rewards(payload, request=None, session=session)
+        hooks = session.info.pop("after_commit")
+        assert notified == []
+        await session.commit()
+    for hook in hooks:
+        await hook()
+    async with sqlite_sessions() as session:
+        pending = await grants_service.list_pending_grants(session, ["10"], limit=50)
+
+    assert [grant["id"] for grant in pending] == [response["grant_id"]]
+    assert notified == [["10"]]
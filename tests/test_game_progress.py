@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert
+
+from backend.routers import game
+from backend.services import achievement_timers, progress_cache
+from backend.services.progress import apply_progress_patches, upsert_progress_batch
+from tests.conftest import FakeAsyncSession
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.anyio("asyncio")
+async def test_batch_upsert_uses_one_statement_per_version_mode():
+    session = FakeAsyncSession(
+        execute_results=[[("1", 7, NOW)], [("2", 4, NOW), ("3", 1, NOW)]]
+    )
+
+    stored, stale = await upsert_progress_batch(
+        session,
+        [
+            {"roblox_user_id": "1", "progress": {"coins": 1}, "version": 6},
+            {"roblox_user_id": "2", "progress": {"coins": 2}},
+            {"roblox_user_id": "1", "progress": {"coins": 3}, "version": 7},
+            {"roblox_user_id": "3", "progress": {}},
+        ],
+        now=NOW,
+    )
+
+    assert [row["roblox_user_id"] for row in stored] == ["1", "2", "3"]
+    assert stale == []
+    versioned, bumped = session.executed_statements
+    assert "ON CONFLICT (roblox_user_id) DO UPDATE" in _sql(versioned)
+    assert "version = excluded.version" in _sql(versioned)
+    assert "WHERE game_progress.version < excluded.version" in _sql(versioned)
+    assert "version = (game_progress.version +" in _sql(bumped)
+    assert "WHERE" not in _sql(bumped)
+    params = versioned.compile(dialect=postgresql.dialect()).params
+    assert params["progress_m0"] == {"coins": 3}
+    assert "roblox_user_id_m1" not in params
+
+
+@pytest.mark.anyio("asyncio")
+async def test_batch_upsert_reports_stale_versions():
+    session = FakeAsyncSession(execute_results=[[("1", 7, NOW)]])
+
+    stored, stale = await upsert_progress_batch(
+        session,
+        [
+            {"roblox_user_id": "1", "progress": {}, "version": 7},
+            {"roblox_user_id": "2", "progress": {}, "version": 3},
+        ],
+        now=NOW,
+    )
+
+    assert [row["roblox_user_id"] for row in stored] == ["1"]
+    assert stale == ["2"]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_stale_single_push_is_rejected_without_extra_read(monkeypatch):
+    session = FakeAsyncSession(execute_results=[[]])
+    entry = SimpleNamespace(key="push-key", completed_at=None, response_body=None)
+
+    async def fake_ensure(_session, _request, _endpoint):
+        return entry
+
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure)
+
+    payload = game.ProgressPushPayload(roblox_user_id="1", progress={"coins": 1}, version=2)
+    with pytest.raises(HTTPException) as exc_info:
+        await game.push_progress(payload, SimpleNamespace(), session)
+
+    assert exc_info.value.status_code == 409
+    (statement,) = session.executed_statements
+    assert "RETURNING" in _sql(statement)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_push_batch_writes_once_and_queues_progress_checks(monkeypatch):
+    session = FakeAsyncSession(execute_results=[[("10", 2, NOW), ("11", 1, NOW)]])
+    entry = SimpleNamespace(key="batch-key", completed_at=None, response_body=None)
+    finalized = {}
+
+    async def fake_ensure(_session, _request, endpoint):
+        assert endpoint == "/game/progress/push-batch"
+        return entry
+
+    async def fake_finalize(_session, _entry, response, status_code):
+        finalized["response"] = response
+
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure)
+    monkeypatch.setattr(game, "finalize_idempotency", fake_finalize)
+
+    payload = game.ProgressBatchPayload(
+        records=[
+            {"roblox_user_id": "10", "progress": {"playtime": 120}},
+            {"roblox_user_id": "11", "progress": {"coins": 5}},
+        ]
+    )
+    response = await game.push_progress_batch(payload, SimpleNamespace(), session)
+
+    assert response["count"] == 2
+    assert response["stale"] == []
+    assert finalized["response"] is response
+    upsert, playtime, sync_events, queue = session.executed_statements
+    assert isinstance(upsert, Insert)
+    assert "player_playtime" in _sql(playtime)
+    assert "roblox_sync_events" in _sql(sync_events)
+    queue_sql = _sql(queue)
+    assert "INSERT INTO scheduled_achievement_checks" in queue_sql
+    assert "least(scheduled_achievement_checks.due_at, excluded.due_at)" in queue_sql
+    assert queue.compile(dialect=postgresql.dialect()).params["roblox_id_1"] == ["10"]
+
+
+def test_batch_payload_rejects_empty_and_oversized_batches():
+    with pytest.raises(ValueError):
+        game.ProgressBatchPayload(records=[])
+    with pytest.raises(ValueError):
+        game.ProgressBatchPayload(
+            records=[
+                {"roblox_user_id": str(index), "progress": {}}
+                for index in range(game.MAX_PROGRESS_BATCH_SIZE + 1)
+            ]
+        )
+
+
+@pytest.mark.anyio("asyncio")
+async def test_queue_progress_checks_skips_empty_batches():
+    session = FakeAsyncSession()
+
+    await achievement_timers.queue_progress_checks(session, [])
+
+    assert session.executed_statements == []
+
+
+def test_push_payload_requires_snapshot_or_based_patch():
+    with pytest.raises(ValueError):
+        game.ProgressPushPayload(roblox_user_id="1")
+    with pytest.raises(ValueError):
+        game.ProgressPushPayload(roblox_user_id="1", progress={}, patch={"a": 1}, base_version=1)
+    with pytest.raises(ValueError):
+        game.ProgressPushPayload(roblox_user_id="1", patch={"a": 1})
+    with pytest.raises(ValueError):
+        game.ProgressPushPayload(roblox_user_id="1", patch={"a": 1}, base_version=3, version=3)
+
+    payload = game.ProgressPushPayload(roblox_user_id="1", patch={"a": None}, base_version=3)
+    assert payload.patch == {"a": None}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_patches_merge_in_database_against_base_version():
+    session = FakeAsyncSession(execute_results=[[("1", 4, NOW, {"coins": 9, "playtime": 60})]])
+
+    stored, stale = await apply_progress_patches(
+        session,
+        [
+            {"roblox_user_id": "1", "patch": {"coins": 9, "hat": None}, "base_version": 3},
+            {"roblox_user_id": "2", "patch": {"coins": 1}, "base_version": 5, "version": 9},
+        ],
+        now=NOW,
+    )
+
+    assert stored == [
+        {
+            "roblox_user_id": "1",
+            "version": 4,
+            "updated_at": NOW,
+            "progress": {"coins": 9, "playtime": 60},
+        }
+    ]
+    assert stale == ["2"]
+    (statement,) = session.executed_statements
+    compiled = statement.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "jsonb_merge_patch(game_progress.progress, patches.patch)" in sql
+    assert "game_progress.version = patches.base_version" in sql
+    assert compiled.params["param_2"] == {"coins": 9, "hat": None}
+    assert compiled.params["param_4"] == 4
+    assert compiled.params["param_9"] == 9
+
+
+@pytest.mark.anyio("asyncio")
+async def test_patch_push_uses_merged_snapshot_for_playtime(monkeypatch):
+    session = FakeAsyncSession(execute_results=[[("1", 4, NOW, {"playtime": 75})]])
+    entry = SimpleNamespace(key="patch-key", completed_at=None, response_body=None)
+    finalized = {}
+
+    async def fake_ensure(_session, _request, _endpoint):
+        return entry
+
+    async def fake_finalize(_session, _entry, response, status_code):
+        finalized["response"] = response
+
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure)
+    monkeypatch.setattr(game, "finalize_idempotency", fake_finalize)
+
+    payload = game.ProgressPushPayload(roblox_user_id="1", patch={"coins": 2}, base_version=3)
+    response = await game.push_progress(payload, SimpleNamespace(), session)
+
+    assert response == {"status": "ok", "roblox_user_id": "1", "version": 4, "updated_at": NOW}
+    playtime = session.executed_statements[1]
+    assert playtime.compile(dialect=postgresql.dialect()).params["minutes_m0"] == 75
+
+
+@pytest.fixture
+def memory_progress_cache(monkeypatch):
+    settings = SimpleNamespace(
+        progress_cache_ttl_seconds=60, progress_cache_tombstone_seconds=10
+    )
+    monkeypatch.setattr(progress_cache, "get_settings", lambda: settings)
+    monkeypatch.setattr(progress_cache, "_backend", progress_cache._MemoryBackend(100))
+
+
+def _pull_request(if_none_match=None):
+    headers = {"If-None-Match": if_none_match} if if_none_match else {}
+    return SimpleNamespace(headers=headers)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_pull_is_write_free_and_revalidates_with_etag(monkeypatch, memory_progress_cache):
+    session = FakeAsyncSession(
+        execute_results=[
+            [
+                SimpleNamespace(
+                    roblox_user_id="1", progress={"coins": 3}, version=4, updated_at=NOW
+                )
+            ]
+        ]
+    )
+
+    monkeypatch.setattr(game, "session_scope", lambda: session)
+    payload = game.ProgressPullRequest(roblox_user_id="1")
+
+    response = SimpleNamespace(headers={})
+    body = await game.pull_progress(payload, _pull_request(), response)
+    assert body["progress"] == {"coins": 3}
+    assert response.headers["ETag"] == '"v4"'
+
+    cached = await game.pull_progress(payload, _pull_request(), SimpleNamespace(headers={}))
+    not_modified = await game.pull_progress(
+        payload, _pull_request('W/"v3", "v4"'), SimpleNamespace(headers={})
+    )
+
+    assert cached == body
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == '"v4"'
+    (statement,) = session.executed_statements
+    assert "idempotency" not in _sql(statement)
+    assert session.added == []
+
+
+@pytest.mark.anyio("asyncio")
+async def test_push_tombstone_keeps_racing_pull_out_of_cache(memory_progress_cache):
+    await progress_cache.store("1", {"version": 4})
+
+    await progress_cache.invalidate(["1"])
+    await progress_cache.store("1", {"version": 4})
+
+    assert await progress_cache.lookup("1") is None
+
+
+@pytest.mark.anyio("asyncio")
+async def test_push_invalidates_again_after_commit(monkeypatch, memory_progress_cache):
+    # The tombstone set before the write has already expired when it commits.
+    progress_cache.get_settings().progress_cache_tombstone_seconds = 0
+    session = FakeAsyncSession(execute_results=[[("10", 2, NOW)]])
+    entry = SimpleNamespace(key="batch-key", completed_at=None, response_body=None)
+
+    async def fake_ensure(_session, _request, endpoint):
+        return entry
+
+    async def fake_finalize(_session, _entry, response, status_code):
+        return None
+
+    monkeypatch.setattr(game, "ensure_idempotency", fake_ensure)
+    monkeypatch.setattr(game, "finalize_idempotency", fake_finalize)
+    payload = game.ProgressBatchPayload(records=[{"roblox_user_id": "10", "progress": {"coins": 5}}])
+
+    await game.push_progress_batch(payload, SimpleNamespace(), session)
+    await progress_cache.store("10", {"version": 1})
+    for hook in session.info.pop("after_commit"):
+        await hook()
+
+    assert await progress_cache.lookup("10") is None
+
+
+@pytest.mark.anyio("asyncio")
+@pytest.mark.parametrize("local", [False, True])
+async def test_without_redis_only_a_single_process_caches_pulls(monkeypatch, local):
+    settings = SimpleNamespace(
+        progress_cache_ttl_seconds=60,
+        progress_cache_max_entries=100,
+        progress_cache_local=local,
+    )
+    monkeypatch.setattr(progress_cache, "get_settings", lambda: settings)
+    monkeypatch.setattr(progress_cache, "get_redis", lambda: None)
+    monkeypatch.setattr(progress_cache, "_backend", None)
+
+    await progress_cache.store("1", {"version": 4})
+
+    expected = {"version": 4} if local else None
+    assert await progress_cache.lookup("1") == expected
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from backend import database
+from backend.models import IdempotencyKey
+from backend.services import idempotency
+from tests.conftest import FakeAsyncSession, make_async_session_stub
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def idempotency_settings(monkeypatch):
+    settings = SimpleNamespace(idempotency_ttl_seconds=3600, idempotency_lock_seconds=60)
+    monkeypatch.setattr(idempotency, "get_settings", lambda: settings)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict = {}
+        self.ttls: dict = {}
+
+    async def set(self, key, value, *, px=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.ttls[key] = px
+        return True
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_database_store_sets_expiry_and_keeps_response_as_is():
+    session = FakeAsyncSession()
+    store = idempotency.DatabaseIdempotencyStore()
+
+    entry = await store.claim(session, "key-1", "/game/grant")
+    body = {"status": "ok", "updated_at": NOW}
+    await store.complete(session, entry, body, 200, NOW)
+
+    assert session.added == [entry]
+    assert entry.response_body is body
+    assert entry.completed_at == NOW
+    assert entry.expires_at == NOW + timedelta(seconds=3600)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_database_store_replays_pending_and_reuses_expired_rows():
+    store = idempotency.DatabaseIdempotencyStore()
+    completed = IdempotencyKey(
+        key="done", endpoint="/game/grant", completed_at=NOW, expires_at=NOW + timedelta(days=3650)
+    )
+    pending = IdempotencyKey(key="busy", endpoint="/game/grant", expires_at=None)
+    expired = IdempotencyKey(
+        key="old", endpoint="/game/grant", completed_at=NOW, response_body={"a": 1}, expires_at=NOW
+    )
+    session = FakeAsyncSession(scalar_results=[completed, pending, expired])
+
+    assert await store.claim(session, "done", "/game/grant") is completed
+    with pytest.raises(HTTPException) as exc_info:
+        await store.claim(session, "busy", "/game/grant")
+    assert exc_info.value.status_code == 409
+    reused = await store.claim(session, "old", "/game/progress/push")
+
+    assert reused is expired
+    assert reused.completed_at is None
+    assert reused.response_body is None
+    assert reused.endpoint == "/game/progress/push"
+    assert session.added == []
+
+
+@pytest.mark.anyio("asyncio")
+async def test_redis_store_publishes_response_only_after_commit(monkeypatch):
+    redis = FakeRedis()
+    store = idempotency.RedisIdempotencyStore(redis)
+    session = FakeAsyncSession()
+    monkeypatch.setattr(database, "async_session", lambda: session)
+
+    async with database.session_scope() as scoped:
+        entry = await store.claim(scoped, "key-1", "/game/grant")
+        await store.complete(scoped, entry, {"status": "ok"}, 200, NOW)
+        assert "completed_at" not in redis.values["idempotency:key-1"]
+        assert redis.ttls["idempotency:key-1"] == 60_000
+
+    assert redis.ttls["idempotency:key-1"] == 3_600_000
+    replay = await store.claim(FakeAsyncSession(), "key-1", "/game/grant")
+    assert replay.completed_at == NOW
+    assert replay.response_body == {"status": "ok"}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_redis_store_releases_claim_on_rollback(monkeypatch):
+    redis = FakeRedis()
+    store = idempotency.RedisIdempotencyStore(redis)
+    session = FakeAsyncSession()
+    monkeypatch.setattr(database, "async_session", lambda: session)
+
+    with pytest.raises(HTTPException):
+        async with database.session_scope() as scoped:
+            await store.claim(scoped, "key-1", "/game/grant")
+            with pytest.raises(HTTPException):
+                await store.claim(FakeAsyncSession(), "key-1", "/game/grant")
+            raise HTTPException(status_code=400, detail="boom")
+
+    assert session.rolled_back
+    assert redis.values == {}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_purge_deletes_expired_rows_in_chunks(monkeypatch):
+    sessions = [
+        FakeAsyncSession(execute_results=[[(1,), (2,)]]),
+        FakeAsyncSession(execute_results=[[(3,)]]),
+    ]
+    monkeypatch.setattr(idempotency, "session_scope", make_async_session_stub(*sessions))
+
+    purged = await idempotency.purge_expired_keys(batch_size=2, now=NOW)
+
+    assert purged == 3
+    (statement,) = sessions[0].executed_statements
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("DELETE FROM idempotency_keys WHERE idempotency_keys.id IN")
+    assert "idempotency_keys.expires_at IS NOT NULL" in sql
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert sessions[1].executed_statements
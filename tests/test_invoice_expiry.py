@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+pytest.importorskip("aiosqlite")
+
+from backend.services import invoices, payments
+from bot.db import Invoice, User
+from tests.conftest import FakeAsyncSession, make_async_session_stub, make_session_scope
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+GRACE = timedelta(seconds=120)
+
+
+def _invoice(index: int, *, provider: str, status: str = "pending", expires_at=None) -> Invoice:
+    return Invoice(
+        user_id=1,
+        telegram_id=100,
+        provider=provider,
+        provider_invoice_id=f"{provider}-{index}",
+        payment_method="ton" if provider == "wallet_pay" else "stars",
+        amount_rub=0,
+        amount_nuts=10,
+        status=status,
+        expires_at=expires_at,
+    )
+
+
+@pytest.fixture
+async def invoice_db(sqlite_sessions, monkeypatch):
+    session_factory = sqlite_sessions
+    monkeypatch.setattr(invoices, "session_scope", make_session_scope(session_factory))
+    async with session_factory() as session:
+        session.add(User(id=1, bot_user_id="1", tg_id=100))
+        await session.commit()
+    return session_factory
+
+
+@pytest.mark.anyio("asyncio")
+async def test_sweeper_expires_overdue_pending_invoices_in_batches(invoice_db):
+    session_factory = invoice_db
+    async with session_factory() as session:
+        session.add_all(
+            [
+                *(
+                    _invoice(index, provider="wallet_pay", expires_at=NOW - timedelta(hours=1))
+                    for index in range(5)
+                ),
+                _invoice(5, provider="wallet_pay", expires_at=NOW - timedelta(seconds=30)),
+                _invoice(6, provider="telegram_stars"),
+                _invoice(
+                    7, provider="wallet_pay", status="paid", expires_at=NOW - timedelta(hours=1)
+                ),
+            ]
+        )
+        await session.commit()
+
+    sweep = await invoices.expire_overdue_invoices(batch_size=2, now=NOW, grace=GRACE)
+
+    assert sweep == invoices.ExpirySweep(expired=5, batches=3, by_provider={"wallet_pay": 5})
+    async with session_factory() as session:
+        statuses = dict(
+            (await session.execute(select(Invoice.provider_invoice_id, Invoice.status))).all()
+        )
+    assert [statuses[f"wallet_pay-{index}"] for index in range(5)] == ["expired"] * 5
+    assert statuses["wallet_pay-5"] == "pending"
+    assert statuses["telegram_stars-6"] == "pending"
+    assert statuses["wallet_pay-7"] == "paid"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_sweep_batch_locks_rows_with_skip_locked(monkeypatch):
+    session = FakeAsyncSession(execute_results=[[("wallet_pay",)]])
+    monkeypatch.setattr(invoices, "session_scope", make_async_session_stub(session))
+
+    sweep = await invoices.expire_overdue_invoices(batch_size=50, now=NOW, grace=GRACE)
+
+    assert sweep.expired == 1 and sweep.batches == 1
+    sql = str(session.executed_statements[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE invoices SET status=")
+    assert "WHERE invoices.id IN (SELECT invoices.id" in sql
+    assert "invoices.status = %(status_1)s AND invoices.expires_at IS NOT NULL" in sql
+    assert "LIMIT %(param_1)s FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_webhook_expiry_respects_the_same_grace(monkeypatch):
+    monkeypatch.setattr(
+        invoices, "get_settings", lambda: SimpleNamespace(invoice_expiry_grace_seconds=120)
+    )
+    invoice = _invoice(1, provider="wallet_pay", expires_at=NOW - timedelta(seconds=60))
+
+    assert payments._expire_if_overdue(invoice, NOW) is False
+    assert invoice.status == "pending"
+    assert payments._expire_if_overdue(invoice, NOW + timedelta(seconds=61)) is True
+    assert invoice.status == "expired"
+
+
+@pytest.mark.anyio("asyncio")
+@pytest.mark.parametrize("swept_first", [False, True])
+async def test_late_paid_webhook_never_credits_an_expired_invoice(
+    invoice_db, monkeypatch, swept_first
+):
+    session_factory = invoice_db
+    monkeypatch.setattr(
+        invoices, "get_settings", lambda: SimpleNamespace(invoice_expiry_grace_seconds=120)
+    )
+    invoice = _invoice(1, provider="wallet_pay", expires_at=NOW - timedelta(hours=1))
+    invoice.external_invoice_id = "ext-1"
+    invoice.ton_rate_at_invoice = 10
+    async with session_factory() as session:
+        session.add(invoice)
+        await session.commit()
+    if swept_first:
+        await invoices.expire_overdue_invoices(batch_size=10, now=NOW, grace=GRACE)
+
+    async with session_factory() as session:
+        await payments.process_wallet_payment(
+            session,
+            {"payload": {"external_invoice_id": "ext-1", "status": "PAID", "amount": "1"}},
+        )
+        await session.commit()
+
+    async with session_factory() as session:
+        stored = await session.get(Invoice, invoice.id)
+        user = await session.get(User, 1)
+    assert stored.status == "expired"
+    assert stored.paid_at is None
+    assert (user.nuts_balance or 0) == 0
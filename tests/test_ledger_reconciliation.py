@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, select, update
+
+pytest.importorskip("aiosqlite")
+
+from backend.services import ledger, nuts
+from bot.db import Admin, NotificationOutbox, NutsBalanceCheckpoint, User
+from tests.conftest import make_session_scope
+
+
+@pytest.fixture
+async def ledger_db(sqlite_engine, sqlite_sessions, monkeypatch):
+    session_factory = sqlite_sessions
+    monkeypatch.setattr(ledger, "session_scope", make_session_scope(session_factory))
+    monkeypatch.setattr(ledger, "ROOT_ADMIN_ID", 900)
+
+    async with session_factory() as session:
+        session.add(Admin(telegram_id=901))
+        session.add_all(
+            [User(bot_user_id=str(index), tg_id=100 + index, nuts_balance=0) for index in range(5)]
+        )
+        await session.commit()
+        user_ids = (await session.scalars(select(User.id).order_by(User.id))).all()
+    return sqlite_engine, session_factory, user_ids
+
+
+async def _credit(session_factory, user_id: int, amount: int) -> None:
+    async with session_factory() as session:
+        await nuts.add_nuts(
+            session, user_id=user_id, amount=amount, source="test", transaction_type="test"
+        )
+        await session.commit()
+
+
+async def _debit(session_factory, user_id: int, amount: int) -> None:
+    async with session_factory() as session:
+        await nuts.subtract_nuts(
+            session, user_id=user_id, amount=amount, source="test", transaction_type="test"
+        )
+        await session.commit()
+
+
+async def _checkpoints(session_factory):
+    async with session_factory() as session:
+        rows = (await session.scalars(select(NutsBalanceCheckpoint))).all()
+    return {row.user_id: (row.balance, row.last_transaction_id, row.drift) for row in rows}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_reconcile_walks_all_chunks_and_records_checkpoints(ledger_db):
+    _, session_factory, user_ids = ledger_db
+    await _credit(session_factory, user_ids[0], 50)
+    await _debit(session_factory, user_ids[0], 20)
+    await _credit(session_factory, user_ids[3], 7)
+
+    report = await ledger.reconcile_ledger(batch_size=2)
+
+    assert report == ledger.ReconcileReport(users=5, advanced=5, drifts=0)
+    checkpoints = await _checkpoints(session_factory)
+    assert checkpoints[user_ids[0]] == (30, 2, 0)
+    assert checkpoints[user_ids[3]] == (7, 3, 0)
+    assert checkpoints[user_ids[1]] == (0, 0, 0)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_reconcile_only_sums_transactions_after_the_checkpoint(ledger_db):
+    engine, session_factory, user_ids = ledger_db
+    await _credit(session_factory, user_ids[0], 50)
+    await ledger.reconcile_ledger(batch_size=10)
+    await _credit(session_factory, user_ids[0], 5)
+
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        report = await ledger.reconcile_ledger(batch_size=10)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert report.advanced == 1 and report.drifts == 0
+    assert (await _checkpoints(session_factory))[user_ids[0]] == (55, 2, 0)
+    aggregate = next(sql for sql in statements if "sum(" in sql)
+    assert "nuts_transactions.id > coalesce(nuts_balance_checkpoints.last_transaction_id" in aggregate
+
+    quiet = await ledger.reconcile_ledger(batch_size=10)
+    assert quiet.advanced == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_new_drift_is_reported_to_admins_once(ledger_db):
+    _, session_factory, user_ids = ledger_db
+    await _credit(session_factory, user_ids[2], 10)
+    await ledger.reconcile_ledger(batch_size=10)
+
+    async with session_factory() as session:
+        await session.execute(
+            update(User).where(User.id == user_ids[2]).values(nuts_balance=25)
+        )
+        await session.commit()
+
+    report = await ledger.reconcile_ledger(batch_size=10)
+    again = await ledger.reconcile_ledger(batch_size=10)
+
+    assert report.drifts == 1 and again.drifts == 0
+    assert (await _checkpoints(session_factory))[user_ids[2]] == (10, 1, 15)
+    async with session_factory() as session:
+        notifications = (await session.scalars(select(NotificationOutbox))).all()
+    assert sorted(entry.chat_id for entry in notifications) == [900, 901]
+    assert {entry.kind for entry in notifications} == {"ledger_drift"}
+    assert "баланс 25, по журналу 10 (+15)" in notifications[0].message
+
+
+@pytest.mark.anyio("asyncio")
+async def test_rebuild_replaces_checkpoints_from_the_full_ledger(ledger_db):
+    _, session_factory, user_ids = ledger_db
+    await _credit(session_factory, user_ids[1], 40)
+    await _debit(session_factory, user_ids[1], 15)
+    async with session_factory() as session:
+        session.add(
+            NutsBalanceCheckpoint(
+                user_id=user_ids[1],
+                balance=999,
+                last_transaction_id=1,
+                drift=0,
+                checked_at=datetime.now(tz=timezone.utc),
+            )
+        )
+        await session.execute(
+            update(User).where(User.id == user_ids[4]).values(nuts_balance=3)
+        )
+        await session.commit()
+
+    written = await ledger.rebuild_checkpoints(batch_size=2)
+
+    assert written == 5
+    checkpoints = await _checkpoints(session_factory)
+    assert checkpoints[user_ids[1]] == (25, 2, 0)
+    assert checkpoints[user_ids[4]] == (0, 0, 3)
+    report = await ledger.reconcile_ledger(batch_size=10)
+    assert report.advanced == 0 and report.drifts == 0
+
+
+def test_drift_report_is_truncated():
+    drifts = [
+        ledger.LedgerDrift(user_id=index, telegram_id=index, balance=index + 1, expected=0)
+        for index in range(25)
+    ]
+
+    message = ledger.render_drift_report(drifts)
+
+    assert message.count("\n• ") == 20
+    assert message.endswith("…и ещё 5")
+
+
+@pytest.mark.anyio("asyncio")
+async def test_reconciliation_loop_is_disabled_by_default(monkeypatch):
+    async def fail_reconcile(**kwargs):
+        raise AssertionError("reconciled while disabled")
+
+    monkeypatch.setattr(
+        ledger, "get_settings", lambda: SimpleNamespace(ledger_reconcile_enabled=False)
+    )
+    monkeypatch.setattr(ledger, "try_reconcile_ledger", fail_reconcile)
+
+    await asyncio.wait_for(ledger.run_ledger_reconciliation(asyncio.Event()), 1)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_pass_is_skipped_while_another_replica_holds_the_lock(monkeypatch):
+    @asynccontextmanager
+    async def held_elsewhere():
+        yield False
+
+    async def fail_reconcile(**kwargs):
+        raise AssertionError("reconciled without the pass lock")
+
+    monkeypatch.setattr(ledger, "_reconcile_lock", held_elsewhere)
+    monkeypatch.setattr(ledger, "reconcile_ledger", fail_reconcile)
+
+    assert await ledger.try_reconcile_ledger(batch_size=10) is None
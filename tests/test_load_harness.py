@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hmac
+import json
+from hashlib import sha256
+
+import pytest
+
+from backend.benchmarks import load
+
+
+def test_parse_mix_validates_operations():
+    assert load.parse_mix("push=3, pull=1,grant") == {"push": 3, "pull": 1, "grant": 1}
+    with pytest.raises(ValueError):
+        load.parse_mix("push=1,unknown=2")
+    with pytest.raises(ValueError):
+        load.parse_mix("push=0")
+
+
+def test_plan_is_reproducible_and_follows_weights():
+    config = load.LoadConfig(requests=1000, mix={"push": 3, "pull": 1}, seed=7)
+
+    plan = load.plan_operations(config)
+
+    assert plan == load.plan_operations(config)
+    assert 650 < plan.count("push") < 850
+    assert set(plan) == {"push", "pull"}
+
+
+def test_percentile_uses_nearest_rank():
+    samples = [float(value) for value in range(1, 101)]
+
+    assert load.percentile(samples, 0.50) == 50.0
+    assert load.percentile(samples, 0.95) == 95.0
+    assert load.percentile(samples, 0.99) == 99.0
+    assert load.percentile([], 0.5) == 0.0
+
+
+def test_requests_are_signed_with_unique_idempotency_keys():
+    config = load.LoadConfig(players=10, users=2, mix={"push": 1})
+    fixtures = load.Fixtures(
+        telegram_ids=[1, 2],
+        stars_invoices=[("inv-1", "nuts_pack_50", 1)],
+        wallet_invoices=["ext-1"],
+    )
+    factory = load.RequestFactory("secret", config, fixtures)
+
+    built = [factory.build(operation) for operation in ("push", "payment", "stars", "wallet")]
+
+    for body, headers in built:
+        expected = hmac.new(b"secret", body, sha256).hexdigest()
+        assert headers["X-Signature"] == expected
+    assert len({headers["Idempotency-Key"] for _, headers in built}) == len(built)
+    assert json.loads(built[2][0])["invoice_id"] == "inv-1"
+    assert json.loads(built[3][0])["payload"]["external_invoice_id"] == "ext-1"
+
+
+def test_summary_reports_errors_latency_and_statements():
+    samples = {
+        "push": [(10.0, 200), (20.0, 200), (30.0, 500), (40.0, 0)],
+        "pull": [(1.0, 200), (2.0, 304)],
+    }
+
+    results = {
+        result.operation: result
+        for result in load.summarize(samples, 2.0, {"push": 30, "pull": 1})
+    }
+
+    push = results["push"]
+    assert push.path == "/game/progress/push"
+    assert push.errors == 2
+    assert push.error_rate == 0.5
+    assert push.throughput_rps == 2.0
+    assert push.p50_ms == 20.0
+    assert push.statuses == {"0": 1, "200": 2, "500": 1}
+    assert push.statements_per_request == 7.5
+    assert results["pull"].errors == 0
+    assert load.summarize(samples, 2.0, None)[0].statements_per_request is None
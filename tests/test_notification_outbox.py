@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import notifications as notifications_service
+from backend.services.achievements import notify_user_achievement_granted
+from backend.services.telegram import TelegramNotificationError
+from bot.db import Achievement, NotificationOutbox, User
+from tests.conftest import FakeAsyncSession
+
+
+def _entry(entry_id: int, chat_id: int, message: str, **kwargs) -> NotificationOutbox:
+    kwargs.setdefault("kind", "achievement_granted")
+    kwargs.setdefault("parse_mode", "Markdown")
+    kwargs.setdefault("attempts", 1)
+    return NotificationOutbox(id=entry_id, chat_id=chat_id, message=message, **kwargs)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_achievement_notification_is_staged_in_session():
+    session = FakeAsyncSession()
+    user = User(id=3, tg_id=333)
+    achievement = Achievement(id=9, name="First_Win", description="Win once", reward=5)
+
+    await notify_user_achievement_granted(session, user=user, achievement=achievement)
+
+    (entry,) = session.added
+    assert isinstance(entry, NotificationOutbox)
+    assert entry.chat_id == 333
+    assert entry.user_id == 3
+    assert entry.status == "pending"
+    assert entry.parse_mode == "Markdown"
+    assert entry.message.startswith("🏆 *First\\_Win*")
+
+
+def test_enqueue_notification_skips_missing_chat():
+    session = FakeAsyncSession()
+
+    assert (
+        notifications_service.enqueue_notification(
+            session, chat_id=None, message="hi", kind="referral_topup_bonus"
+        )
+        is None
+    )
+    assert session.added == []
+
+
+def test_coalesce_groups_messages_per_chat_into_digest():
+    entries = [
+        _entry(1, 10, "🏆 *A*"),
+        _entry(2, 20, "🏆 *B*"),
+        _entry(3, 10, "🏆 *C*"),
+        _entry(4, 10, "bonus", kind="referral_topup_bonus", parse_mode=None),
+    ]
+
+    digests = notifications_service.coalesce_notifications(entries)
+
+    by_ids = {tuple(entry.id for entry in batch): text for batch, text in digests}
+    assert by_ids[(1, 3)] == "🎉 Новые достижения:\n\n🏆 *A*\n\n🏆 *C*"
+    assert by_ids[(2,)] == "🏆 *B*"
+    assert by_ids[(4,)] == "bonus"
+
+
+def test_coalesce_splits_digest_over_telegram_limit():
+    long_text = "x" * 3000
+    digests = notifications_service.coalesce_notifications(
+        [_entry(1, 10, long_text), _entry(2, 10, long_text)]
+    )
+
+    assert [[entry.id for entry in batch] for batch, _ in digests] == [[1], [2]]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_dispatch_marks_sent_and_schedules_retry(monkeypatch):
+    entries = [_entry(1, 10, "ok"), _entry(2, 20, "boom", attempts=5)]
+    sessions: list[FakeAsyncSession] = []
+
+    @asynccontextmanager
+    async def scope():
+        session = FakeAsyncSession()
+        sessions.append(session)
+        yield session
+
+    async def fake_claim(session, *, limit):
+        return entries
+
+    sent: list[tuple[int, str]] = []
+
+    async def fake_send(*, chat_id, text, parse_mode=None):
+        if chat_id == 20:
+            raise TelegramNotificationError("down")
+        sent.append((chat_id, text))
+
+    monkeypatch.setattr(notifications_service, "session_scope", scope)
+    monkeypatch.setattr(notifications_service, "claim_notifications", fake_claim)
+    monkeypatch.setattr(notifications_service, "send_message", fake_send)
+    monkeypatch.setattr(
+        notifications_service,
+        "get_settings",
+        lambda: SimpleNamespace(notifications_batch_size=10, notifications_max_attempts=5),
+    )
+
+    claimed = await notifications_service.dispatch_pending_notifications()
+
+    assert claimed == 2
+    assert sent == [(10, "ok")]
+    assert len(sessions[-1].executed_statements) == 2
+    params = [stmt.compile().params for stmt in sessions[-1].executed_statements]
+    assert params[0]["status"] == "sent"
+    assert params[1]["status"] == "failed"
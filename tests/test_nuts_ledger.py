@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+pytest.importorskip("aiosqlite")
+
+from backend.services import nuts
+from bot.db import NutsTransaction, User
+from tests.conftest import FakeAsyncSession
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.anyio("asyncio")
+async def test_add_nuts_updates_balance_in_sql():
+    session = FakeAsyncSession(execute_results=[[(5, 55, 150)]])
+
+    transaction = await nuts.add_nuts(
+        session, user_id=5, amount=50, source="stars", transaction_type="stars"
+    )
+
+    sql = _sql(session.executed_statements[0])
+    assert sql.startswith("UPDATE users SET nuts_balance=(users.nuts_balance +")
+    assert "WHERE users.id = " in sql
+    assert sql.endswith("RETURNING users.id, users.telegram_id, users.nuts_balance")
+    assert session.added == [transaction]
+    assert (transaction.user_id, transaction.telegram_id) == (5, 55)
+    assert transaction.transaction_type == "credit"
+    assert session.flushed
+
+
+@pytest.mark.anyio("asyncio")
+async def test_subtract_nuts_guards_balance_in_the_update():
+    session = FakeAsyncSession(execute_results=[[(5, 55, 10)]])
+
+    transaction = await nuts.subtract_nuts(
+        session, telegram_id=55, amount=40, source="purchase", transaction_type="spend"
+    )
+
+    compiled = session.executed_statements[0].compile(dialect=postgresql.dialect())
+    assert "WHERE users.telegram_id = " in str(compiled)
+    assert "AND users.nuts_balance >= " in str(compiled)
+    assert -40 in compiled.params.values() and 40 in compiled.params.values()
+    assert transaction.transaction_type == "debit"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_subtract_nuts_tells_insufficient_balance_from_missing_user():
+    insufficient = FakeAsyncSession(execute_results=[[]], scalar_results=[5])
+    missing = FakeAsyncSession(execute_results=[[]], scalar_results=[None])
+
+    with pytest.raises(nuts.NutsInsufficientBalanceError):
+        await nuts.subtract_nuts(
+            insufficient, user_id=5, amount=40, source="purchase", transaction_type="spend"
+        )
+    with pytest.raises(nuts.NutsUserNotFoundError):
+        await nuts.subtract_nuts(
+            missing, user_id=5, amount=40, source="purchase", transaction_type="spend"
+        )
+    assert insufficient.added == [] and missing.added == []
+
+
+@pytest.fixture
+async def ledger_db(sqlite_sessions):
+    session_factory = sqlite_sessions
+    async with session_factory() as session:
+        user = User(bot_user_id="1", tg_id=100, nuts_balance=100)
+        session.add(user)
+        await session.commit()
+        user_id = user.id
+    return session_factory, user_id
+
+
+@pytest.mark.anyio("asyncio")
+async def test_concurrent_credits_and_debits_lose_no_updates(ledger_db):
+    session_factory, user_id = ledger_db
+
+    async def credit() -> bool:
+        async with session_factory() as session:
+            await nuts.add_nuts(
+                session, user_id=user_id, amount=7, source="bonus", transaction_type="bonus"
+            )
+            await session.commit()
+        return True
+
+    async def debit() -> bool:
+        async with session_factory() as session:
+            try:
+                await nuts.subtract_nuts(
+                    session, user_id=user_id, amount=13, source="shop", transaction_type="spend"
+                )
+            except nuts.NutsInsufficientBalanceError:
+                await session.rollback()
+                return False
+            await session.commit()
+        return True
+
+    tasks = [credit() for _ in range(40)] + [debit() for _ in range(40)]
+    outcomes = await asyncio.gather(*tasks)
+    debits = sum(outcomes[40:])
+
+    async with session_factory() as session:
+        balance = await session.scalar(select(User.nuts_balance).where(User.id == user_id))
+        ledger = (
+            await session.execute(
+                select(NutsTransaction.transaction_type, func.count(), func.sum(NutsTransaction.amount))
+                .group_by(NutsTransaction.transaction_type)
+            )
+        ).all()
+
+    assert 0 < debits < 40
+    assert balance == 100 + 40 * 7 - debits * 13
+    assert balance >= 0
+    assert dict((kind, (count, total)) for kind, count, total in ledger) == {
+        "credit": (40, 280),
+        "debit": (debits, debits * 13),
+    }
+
+
+@pytest.mark.anyio("asyncio")
+async def test_loaded_user_sees_returned_balance_without_being_dirty(ledger_db):
+    session_factory, user_id = ledger_db
+
+    async with session_factory() as session:
+        user = await session.get(User, user_id)
+        await nuts.add_nuts(
+            session, user_id=user_id, amount=25, source="bonus", transaction_type="bonus"
+        )
+        assert user.nuts_balance == 125
+        await nuts.subtract_nuts(
+            session, user=user, amount=5, source="shop", transaction_type="spend"
+        )
+        assert user.nuts_balance == 120
+        assert user not in session.dirty
+        await session.commit()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_check_constraint_rejects_negative_balance(ledger_db):
+    session_factory, user_id = ledger_db
+
+    async with session_factory() as session:
+        with pytest.raises(IntegrityError):
+            await session.execute(
+                update(User).where(User.id == user_id).values(nuts_balance=-1)
+            )
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+pytest.importorskip("aiosqlite")
+
+from backend.routers import payments as payments_router
+from backend.services import nuts, payment_inbox
+from backend.services.payments import PaymentEventRejected
+from bot.db import PaymentInboxEvent, User
+from tests.conftest import FakeAsyncSession, make_session_scope
+
+
+@pytest.fixture
+async def inbox_db(sqlite_sessions, monkeypatch):
+    session_factory = sqlite_sessions
+    monkeypatch.setattr(payment_inbox, "session_scope", make_session_scope(session_factory))
+    async with session_factory() as session:
+        user = User(bot_user_id="1", tg_id=100, nuts_balance=0)
+        session.add(user)
+        await session.commit()
+    return session_factory, user.id
+
+
+async def _credit(session, payload):
+    await nuts.add_nuts(
+        session,
+        user_id=payload["user_id"],
+        amount=payload["amount"],
+        source="test",
+        transaction_type="test",
+    )
+
+
+async def _events(session_factory):
+    async with session_factory() as session:
+        events = await session.scalars(select(PaymentInboxEvent).order_by(PaymentInboxEvent.id))
+        return events.all()
+
+
+async def _balance(session_factory, user_id):
+    async with session_factory() as session:
+        return await session.scalar(select(User.nuts_balance).where(User.id == user_id))
+
+
+@pytest.mark.anyio("asyncio")
+async def test_webhook_only_stores_the_event_and_acknowledges_redeliveries(inbox_db):
+    session_factory, user_id = inbox_db
+    payload = payments_router.PaymentWebhook(
+        payment_id="tg-1", telegram_user_id=100, amount=50, currency="XTR"
+    )
+    request = SimpleNamespace(headers={})
+
+    responses = []
+    for _ in range(2):
+        async with session_factory() as session:
+            responses.append(
+                await payments_router.telegram_payment_webhook(payload, request, session)
+            )
+            await session.commit()
+
+    assert [response["duplicate"] for response in responses] == [False, True]
+    assert responses[0]["status"] == "accepted"
+    events = await _events(session_factory)
+    assert [(event.provider, event.idempotency_key, event.status) for event in events] == [
+        ("telegram", "payment:tg-1", "pending")
+    ]
+    assert events[0].payload["amount"] == 50
+    assert await _balance(session_factory, user_id) == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_worker_applies_event_and_processed_mark_together(inbox_db, monkeypatch):
+    session_factory, user_id = inbox_db
+    monkeypatch.setitem(payment_inbox.PROCESSORS, "telegram", _credit)
+    async with session_factory() as session:
+        await payment_inbox.enqueue_payment_event(
+            session,
+            provider="telegram",
+            idempotency_key="k1",
+            payload={"user_id": user_id, "amount": 30},
+        )
+        await session.commit()
+
+    claimed = await payment_inbox.dispatch_payment_events(limit=10, max_attempts=3)
+
+    assert claimed == 1
+    (event,) = await _events(session_factory)
+    assert (event.status, event.attempts, event.last_error) == ("processed", 1, None)
+    assert event.processed_at is not None
+    assert await _balance(session_factory, user_id) == 30
+    assert await payment_inbox.dispatch_payment_events(limit=10, max_attempts=3) == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_failures_back_off_and_rejections_are_dead_lettered(inbox_db, monkeypatch):
+    session_factory, user_id = inbox_db
+
+    async def flaky(session, payload):
+        await _credit(session, payload)
+        if payload["reject"]:
+            raise PaymentEventRejected("Invoice not found")
+        raise RuntimeError("provider lookup timed out")
+
+    monkeypatch.setitem(payment_inbox.PROCESSORS, "stars", flaky)
+    async with session_factory() as session:
+        for key, reject in (("retry", False), ("poison", True)):
+            await payment_inbox.enqueue_payment_event(
+                session,
+                provider="stars",
+                idempotency_key=key,
+                payload={"user_id": user_id, "amount": 5, "reject": reject},
+            )
+        await session.commit()
+
+    before = datetime.now(tz=timezone.utc)
+    await payment_inbox.dispatch_payment_events(limit=10, max_attempts=3)
+
+    retry, poison = await _events(session_factory)
+    assert (retry.status, retry.attempts) == ("pending", 1)
+    assert retry.last_error == "RuntimeError: provider lookup timed out"
+    assert retry.available_at.replace(tzinfo=timezone.utc) >= before + timedelta(seconds=5)
+    assert (poison.status, poison.last_error) == ("dead", "PaymentEventRejected: Invoice not found")
+    assert await _balance(session_factory, user_id) == 0
+
+    for _ in range(2):
+        async with session_factory() as session:
+            claimed = await payment_inbox.claim_payment_events(
+                session,
+                limit=10,
+                max_attempts=3,
+                now=datetime.now(tz=timezone.utc) + timedelta(hours=1),
+            )
+            await session.commit()
+        for event_id, attempts in claimed:
+            await payment_inbox.process_payment_event(event_id, attempts, max_attempts=3)
+
+    retry, _ = await _events(session_factory)
+    assert (retry.status, retry.attempts) == ("dead", 3)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_expired_claim_is_not_applied_twice(inbox_db, monkeypatch):
+    session_factory, user_id = inbox_db
+    monkeypatch.setitem(payment_inbox.PROCESSORS, "wallet", _credit)
+    async with session_factory() as session:
+        await payment_inbox.enqueue_payment_event(
+            session,
+            provider="wallet",
+            idempotency_key="w",
+            payload={"user_id": user_id, "amount": 9},
+        )
+        await session.commit()
+
+    async with session_factory() as session:
+        [(event_id, first)] = await payment_inbox.claim_payment_events(
+            session, limit=1, max_attempts=3
+        )
+        await session.commit()
+    async with session_factory() as session:
+        [(_, second)] = await payment_inbox.claim_payment_events(
+            session,
+            limit=1,
+            max_attempts=3,
+            now=datetime.now(tz=timezone.utc) + timedelta(minutes=5),
+        )
+        await session.commit()
+
+    assert await payment_inbox.process_payment_event(event_id, first, max_attempts=3) == "skipped"
+    assert (
+        await payment_inbox.process_payment_event(event_id, second, max_attempts=3) == "processed"
+    )
+    assert await _balance(session_factory, user_id) == 9
+
+
+@pytest.mark.anyio("asyncio")
+async def test_expired_claim_out_of_attempts_is_dead_lettered(inbox_db, monkeypatch):
+    session_factory, user_id = inbox_db
+    monkeypatch.setitem(payment_inbox.PROCESSORS, "wallet", _credit)
+    async with session_factory() as session:
+        await payment_inbox.enqueue_payment_event(
+            session,
+            provider="wallet",
+            idempotency_key="w",
+            payload={"user_id": user_id, "amount": 9},
+        )
+        await session.commit()
+
+    later = datetime.now(tz=timezone.utc)
+    for _ in range(3):
+        # Each claim expires as if the worker had crashed mid-event.
+        later += timedelta(minutes=5)
+        async with session_factory() as session:
+            claimed = await payment_inbox.claim_payment_events(
+                session, limit=1, max_attempts=3, now=later
+            )
+            await session.commit()
+        assert len(claimed) == 1
+
+    async with session_factory() as session:
+        claimed = await payment_inbox.claim_payment_events(
+            session, limit=1, max_attempts=3, now=later + timedelta(minutes=5)
+        )
+        await session.commit()
+
+    assert claimed == []
+    [event] = await _events(session_factory)
+    assert (event.status, event.attempts) == ("dead", 3)
+    assert event.last_error == "Claim expired with no attempts left"
+    assert await _balance(session_factory, user_id) == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_metrics_report_backlog_and_lag(inbox_db):
+    session_factory, _ = inbox_db
+    now = datetime.now(tz=timezone.utc)
+    async with session_factory() as session:
+        session.add_all(
+            [
+                PaymentInboxEvent(
+                    provider="stars",
+                    idempotency_key="a",
+                    payload={},
+                    received_at=now - timedelta(seconds=40),
+                ),
+                PaymentInboxEvent(provider="stars", idempotency_key="b", payload={}, status="dead"),
+                PaymentInboxEvent(
+                    provider="stars", idempotency_key="c", payload={}, status="processed"
+                ),
+            ]
+        )
+        await session.commit()
+
+    async with session_factory() as session:
+        metrics = await payment_inbox.payment_inbox_metrics(session, now=now)
+
+    assert (metrics["pending"], metrics["processing"], metrics["dead"]) == (1, 0, 1)
+    assert metrics["lag_seconds"] == pytest.approx(40, abs=1)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_claim_skips_rows_locked_by_other_workers():
+    session = FakeAsyncSession(execute_results=[[], [(8, 2), (3, 1)]])
+
+    claimed = await payment_inbox.claim_payment_events(session, limit=5, max_attempts=3)
+
+    assert claimed == [(3, 1), (8, 2)]
+    sql = str(session.executed_statements[1].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "payment_inbox_events.status IN" in sql
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql
+
+pytest.importorskip("aiosqlite")
+
+from backend.services import payments
+from bot.db import LogEntry, Payment, PaymentWebhookEvent, User
+from tests.conftest import FakeAsyncSession
+
+
+class _RecordingSession(FakeAsyncSession):
+    async def scalar(self, statement, *args, **kwargs):
+        self.executed_statements.append(statement)
+        return await super().scalar(statement, *args, **kwargs)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_record_payment_resolves_payer_and_dedups_in_one_statement():
+    session = _RecordingSession(scalar_results=[None])
+
+    event = await payments.record_payment(
+        session,
+        payment_id="tg-1",
+        telegram_user_id=100,
+        amount=50,
+        currency="XTR",
+        payload={},
+    )
+
+    assert event is None
+    assert session.added == []
+    (statement,) = session.executed_statements
+    sql = " ".join(str(statement.compile(dialect=postgresql.dialect())).split())
+    assert sql.startswith("WITH payer AS")
+    assert "INSERT INTO payments" in sql
+    assert "(SELECT payer.id FROM payer)" in sql
+    assert "ON CONFLICT (provider_payment_id) DO NOTHING RETURNING" in sql
+
+
+@pytest.fixture
+async def payments_db(sqlite_engine, sqlite_sessions):
+    session_factory = sqlite_sessions
+    async with session_factory() as session:
+        user = User(bot_user_id="1", tg_id=100)
+        session.add(user)
+        await session.commit()
+    return sqlite_engine, session_factory, user.id
+
+
+async def _record(session_factory, payment_id: str, telegram_user_id: int = 100):
+    async with session_factory() as session:
+        event = await payments.record_payment(
+            session,
+            payment_id=payment_id,
+            telegram_user_id=telegram_user_id,
+            amount=50,
+            currency="XTR",
+            payload={"source": "test"},
+        )
+        await session.commit()
+    return event
+
+
+@pytest.mark.anyio("asyncio")
+async def test_replay_is_detected_without_extra_reads(payments_db):
+    engine, session_factory, user_id = payments_db
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        first = await _record(session_factory, "tg-1")
+        recorded = len(statements)
+        replay = await _record(session_factory, "tg-1")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert first is not None and first.payment.user_id == user_id
+    assert replay is None
+    assert not any(sql.lstrip().upper().startswith("SELECT") for sql in statements)
+    assert len(statements) - recorded == 1
+    async with session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(Payment)) == 1
+        assert await session.scalar(select(func.count()).select_from(PaymentWebhookEvent)) == 1
+        assert await session.scalar(select(func.count()).select_from(LogEntry)) == 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_unknown_payer_is_recorded_without_user(payments_db):
+    _, session_factory, _ = payments_db
+
+    recorded = await _record(session_factory, "tg-2", telegram_user_id=555)
+
+    assert recorded is not None
+    assert recorded.payment.user_id is None
+    assert recorded.payment.telegram_id == 555
+
+
+@pytest.mark.anyio("asyncio")
+async def test_concurrent_duplicates_record_one_payment(payments_db):
+    _, session_factory, _ = payments_db
+
+    results = await asyncio.gather(*(_record(session_factory, "tg-3") for _ in range(5)))
+
+    assert sum(result is not None for result in results) == 1
+    async with session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(PaymentWebhookEvent)) == 1
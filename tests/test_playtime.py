@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.services import playtime
+from bot.firebase import firebase_service
+from tests.conftest import FakeAsyncSession
+
+
+def test_extract_playtime_minutes_uses_first_numeric_key():
+    assert playtime.extract_playtime_minutes({"timeInGame": 90.7, "playtime": 5}) == 90
+    assert playtime.extract_playtime_minutes({"time_in_game": True, "playTime": 12}) == 12
+    assert playtime.extract_playtime_minutes({"playtime": "40"}) is None
+    assert playtime.extract_playtime_minutes(None) is None
+
+
+@pytest.mark.anyio("asyncio")
+async def test_upsert_playtime_only_moves_forward():
+    session = FakeAsyncSession()
+
+    await playtime.upsert_playtime(
+        session, {123: 10, "123": 15, "456": -3}, source="firebase"
+    )
+
+    (stmt,) = session.executed_statements
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "ON CONFLICT (roblox_user_id) DO UPDATE" in sql
+    assert "WHERE excluded.minutes > player_playtime.minutes" in sql
+    assert compiled.params["roblox_user_id_m0"] == "123"
+    assert compiled.params["minutes_m0"] == 15
+    assert compiled.params["minutes_m1"] == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_sync_player_times_writes_only_changed_entries(monkeypatch):
+    responses = [
+        {"1": 30, "2": {"minutes": 45}, "3": "bad"},
+        {"1": 30, "2": {"minutes": 50}},
+    ]
+    fetch_calls: list[int | None] = []
+    upserts: list[dict[str, int]] = []
+
+    async def fake_fetch(since=None):
+        fetch_calls.append(since)
+        return responses.pop(0)
+
+    async def fake_upsert(_session, minutes_by_roblox_id, *, source):
+        assert source == "firebase"
+        upserts.append(dict(minutes_by_roblox_id))
+
+    @asynccontextmanager
+    async def fake_session():
+        yield FakeAsyncSession()
+
+    monkeypatch.setattr(firebase_service, "fetch_player_times", fake_fetch)
+    monkeypatch.setattr(firebase_service, "upsert_playtime", fake_upsert)
+    monkeypatch.setattr(firebase_service, "async_session", fake_session)
+    monkeypatch.setattr(firebase_service, "_player_times_seen", {})
+    monkeypatch.setattr(firebase_service, "_player_times_cursor", None)
+
+    assert await firebase_service.sync_player_times() == 2
+    assert await firebase_service.sync_player_times() == 1
+
+    assert upserts == [{"1": 30, "2": 45}, {"2": 50}]
+    assert fetch_calls == [None, None]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_sync_player_times_advances_cursor_when_entries_are_stamped(monkeypatch):
+    async def fake_fetch(since=None):
+        return {"1": {"minutes": 5, "updatedAt": 100}, "2": {"minutes": 6, "updatedAt": 250}}
+
+    async def fake_upsert(_session, minutes_by_roblox_id, *, source):
+        return None
+
+    @asynccontextmanager
+    async def fake_session():
+        yield FakeAsyncSession()
+
+    monkeypatch.setattr(firebase_service, "fetch_player_times", fake_fetch)
+    monkeypatch.setattr(firebase_service, "upsert_playtime", fake_upsert)
+    monkeypatch.setattr(firebase_service, "async_session", fake_session)
+    monkeypatch.setattr(firebase_service, "_player_times_seen", {})
+    monkeypatch.setattr(firebase_service, "_player_times_cursor", None)
+
+    await firebase_service.sync_player_times()
+
+    assert firebase_service._player_times_cursor == 250
+
+
+def test_seen_player_times_forget_the_least_recently_changed(monkeypatch):
+    monkeypatch.setattr(firebase_service, "_PLAYER_TIMES_SEEN_LIMIT", 2)
+    monkeypatch.setattr(firebase_service, "_player_times_seen", {})
+
+    firebase_service._remember_player_times({"1": 10, "2": 20})
+    firebase_service._remember_player_times({"1": 11})
+    firebase_service._remember_player_times({"3": 30})
+
+    assert firebase_service._player_times_seen == {"1": 11, "3": 30}
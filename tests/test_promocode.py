@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 import pytest
+from sqlalchemy import func, select
 
+from bot.db import PromoCode, PromocodeRedemption, User
 from bot.handlers.user import promocode_use
 
 from tests.conftest import FakeAsyncSession, make_async_session_stub
@@ -43,9 +46,13 @@ async def test_redeem_promocode_logs_payload(monkeypatch, message_factory):
         promo_type="money",
         expires_at=None,
     )
-    user_obj = SimpleNamespace(id=9, tg_id=88, nuts_balance=0, is_blocked=False, discount=0)
+    user_obj = User(id=9, tg_id=88, nuts_balance=0, is_blocked=False, discount=0)
 
-    session = FakeAsyncSession(scalar_results=[promo_obj, user_obj, None])
+    # The credit is computed by the UPDATE; its RETURNING row is the new balance.
+    # The last scalar is the claimed use count returned by the promocodes UPDATE.
+    session = FakeAsyncSession(
+        scalar_results=[promo_obj, user_obj, None, 1], execute_results=[[(9, 88, 10)]]
+    )
     monkeypatch.setattr(promocode_use, "async_session", make_async_session_stub(session))
     monkeypatch.setattr(promocode_use, "check_achievements", AsyncMock())
 
@@ -61,4 +68,77 @@ async def test_redeem_promocode_logs_payload(monkeypatch, message_factory):
     log_entry = next(obj for obj in session.added if getattr(obj, "event_type", None) == "promocode_redeemed")
     assert log_entry.data["promo_code"] == "FREE"
     assert log_entry.data["reward_effect"] == {"nuts": 10}
-    assert log_entry.data["redeemed_by_username"] == "hero"
\ No newline at end of file
+    assert log_entry.data["redeemed_by_username"] == "hero"
+
+
+@pytest.fixture(autouse=True)
+def clear_unavailable_codes(monkeypatch):
+    monkeypatch.setattr(promocode_use, "_unavailable_codes", {})
+
+
+@pytest.mark.anyio("asyncio")
+async def test_rejection_is_replied_after_rollback_and_cached(monkeypatch, message_factory):
+    promo_obj = SimpleNamespace(
+        id=1, code="GONE", active=True, max_uses=5, uses=5, expires_at=None
+    )
+    session = FakeAsyncSession(scalar_results=[promo_obj])
+    monkeypatch.setattr(promocode_use, "async_session", make_async_session_stub(session))
+    message = message_factory(user_id=88)
+    replied_after_rollback = []
+    original_reply = message.reply
+
+    async def reply(text, **kwargs):
+        replied_after_rollback.append(session.rolled_back)
+        return await original_reply(text, **kwargs)
+
+    message.reply = reply
+
+    assert await promocode_use.redeem_promocode(message, "gone") is False
+    assert await promocode_use.redeem_promocode(message, "GONE") is False
+
+    assert [text for text, _ in message.replies] == [promocode_use.PROMO_EXHAUSTED] * 2
+    assert replied_after_rollback == [True, True]
+    assert session.committed is False
+
+    promocode_use.forget_unavailable_promocode("gone")
+    assert promocode_use._cached_rejection("GONE") is None
+
+
+@pytest.fixture
+async def promo_db(sqlite_sessions, monkeypatch):
+    session_factory = sqlite_sessions
+    async with session_factory() as session:
+        session.add_all(
+            [User(id=index, bot_user_id=str(index), tg_id=100 + index) for index in range(1, 7)]
+        )
+        session.add(
+            PromoCode(code="DROP", reward_type="nuts", reward_amount=5, max_uses=3, uses=0)
+        )
+        await session.commit()
+    monkeypatch.setattr(promocode_use, "async_session", session_factory)
+    monkeypatch.setattr(promocode_use, "check_achievements", AsyncMock())
+    return session_factory
+
+
+@pytest.mark.anyio("asyncio")
+async def test_flash_drop_never_exceeds_max_uses(promo_db, message_factory):
+    messages = [message_factory(user_id=100 + index) for index in range(1, 7)]
+
+    results = await asyncio.gather(
+        *(promocode_use.redeem_promocode(message, "drop") for message in messages)
+    )
+
+    assert results.count(True) == 3
+    async with promo_db() as session:
+        promo = await session.scalar(select(PromoCode))
+        redemptions = await session.scalar(
+            select(func.count()).select_from(PromocodeRedemption)
+        )
+        credited = await session.scalar(select(func.sum(User.nuts_balance)))
+    assert promo.uses == 3
+    assert redemptions == 3
+    assert credited == 15
+    rejected = [message for message, ok in zip(messages, results) if not ok]
+    assert all(
+        message.replies[-1][0] == promocode_use.PROMO_EXHAUSTED for message in rejected
+    )
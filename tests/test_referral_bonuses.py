@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+pytest.importorskip("aiosqlite")
+
+from backend.services import referrals
+from bot.db import Invoice, NutsTransaction, Referral, ReferralTopupBonus, User
+
+
+@pytest.fixture
+async def referral_db(sqlite_sessions, monkeypatch):
+    async def no_achievements(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(referrals, "evaluate_and_grant_achievements", no_achievements)
+    session_factory = sqlite_sessions
+    async with session_factory() as session:
+        referrer = User(id=1, bot_user_id="1", tg_id=100, nuts_balance=0)
+        payer = User(id=2, bot_user_id="2", tg_id=200, nuts_balance=0)
+        session.add_all([referrer, payer])
+        await session.flush()
+        session.add(
+            Referral(
+                referrer_id=1,
+                referrer_telegram_id=100,
+                referred_id=2,
+                referred_telegram_id=200,
+                referral_code="ref",
+                confirmed=True,
+            )
+        )
+        session.add(
+            Invoice(
+                id=10,
+                user_id=2,
+                telegram_id=200,
+                provider="wallet_pay",
+                provider_invoice_id="inv-10",
+                payment_method="ton",
+                amount_rub=0,
+                amount_nuts=500,
+                status="paid",
+            )
+        )
+        await session.commit()
+    return session_factory
+
+
+async def _grant(session_factory, nuts_amount: int = 500) -> None:
+    async with session_factory() as session:
+        payer = await session.get(User, 2)
+        invoice = await session.get(Invoice, 10)
+        await referrals.grant_referral_topup_bonus(
+            session, payer=payer, nuts_amount=nuts_amount, invoice=invoice
+        )
+        await session.commit()
+
+
+async def _bonus_state(session_factory):
+    async with session_factory() as session:
+        bonuses = (await session.scalars(select(ReferralTopupBonus))).all()
+        balance = await session.scalar(select(User.nuts_balance).where(User.id == 1))
+        credits = await session.scalar(
+            select(func.count())
+            .select_from(NutsTransaction)
+            .where(NutsTransaction.user_id == 1)
+        )
+    return bonuses, balance, credits
+
+
+@pytest.mark.anyio("asyncio")
+async def test_bonus_is_recorded_and_granted_once(referral_db):
+    await _grant(referral_db)
+    await _grant(referral_db)
+
+    bonuses, balance, credits = await _bonus_state(referral_db)
+    assert [(bonus.source_kind, bonus.source_id) for bonus in bonuses] == [("invoice", 10)]
+    assert bonuses[0].bonus_amount == balance > 0
+    assert bonuses[0].credited_amount == 500
+    assert credits == 1
+    async with referral_db() as session:
+        invoice = await session.get(Invoice, 10)
+    assert "referral_bonus_topups" not in (invoice.metadata_json or {})
+
+
+@pytest.mark.anyio("asyncio")
+async def test_concurrent_webhooks_grant_one_bonus(referral_db):
+    await asyncio.gather(*(_grant(referral_db) for _ in range(4)))
+
+    bonuses, balance, credits = await _bonus_state(referral_db)
+    assert len(bonuses) == 1
+    assert balance == bonuses[0].bonus_amount
+    assert credits == 1
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from backend.fakes.roblox_open_cloud import FakeOpenCloud
+from backend.models import RobloxSyncEvent
+from backend.services import roblox as roblox_service
+from tests.conftest import FakeAsyncSession, make_async_session_stub, make_session_scope
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def _event(event_id: int, roblox_user_id: str, **kwargs) -> RobloxSyncEvent:
+    kwargs.setdefault("action", "progress")
+    kwargs.setdefault("payload", {"coins": event_id})
+    kwargs.setdefault("attempts", 1)
+    return RobloxSyncEvent(id=event_id, roblox_user_id=roblox_user_id, **kwargs)
+
+
+@pytest.fixture
+def sync_settings(monkeypatch):
+    settings = SimpleNamespace(
+        roblox_api_base_url="http://open-cloud.test",
+        roblox_sync_path="/sync",
+        roblox_open_cloud_api_key="cloud-key",
+        roblox_sync_batch_size=10,
+        roblox_sync_max_attempts=3,
+    )
+    monkeypatch.setattr(roblox_service, "get_settings", lambda: settings)
+    return settings
+
+
+@pytest.fixture
+def scoped_sessions(monkeypatch):
+    sessions: list[FakeAsyncSession] = []
+
+    @asynccontextmanager
+    async def scope():
+        session = FakeAsyncSession()
+        sessions.append(session)
+        yield session
+
+    monkeypatch.setattr(roblox_service, "session_scope", scope)
+    return sessions
+
+
+@pytest.mark.anyio("asyncio")
+async def test_progress_events_coalesce_into_pending_row():
+    session = FakeAsyncSession()
+
+    await roblox_service.sync_progress_batch(session, {"1": {"coins": 1}, "2": {"coins": 2}})
+
+    (statement,) = session.executed_statements
+    sql = _sql(statement)
+    assert (
+        "ON CONFLICT (roblox_user_id, action) "
+        "WHERE status = 'pending' AND action = 'progress'" in sql
+    )
+    assert "DO UPDATE SET payload = excluded.payload" in sql
+
+
+@pytest.mark.anyio("asyncio")
+async def test_claim_skips_locked_rows_and_hides_them_while_sending():
+    statements = []
+
+    class RecordingSession(FakeAsyncSession):
+        async def scalars(self, statement, *args, **kwargs):
+            statements.append(statement)
+            return await super().scalars(statement, *args, **kwargs)
+
+    session = RecordingSession(scalars_results=[[_event(2, "b"), _event(1, "a")]])
+
+    events = await roblox_service.claim_sync_events(session, limit=5, now=NOW)
+
+    assert [event.id for event in events] == [1, 2]
+    compiled = statements[0].compile(dialect=postgresql.dialect())
+    assert "FOR UPDATE SKIP LOCKED" in str(compiled)
+    assert compiled.params["status"] == "sending"
+    assert compiled.params["available_at"] == NOW + timedelta(seconds=60)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_dispatch_delivers_batch_to_open_cloud_and_records_response(
+    monkeypatch, sync_settings, scoped_sessions
+):
+    fake = FakeOpenCloud(api_key="cloud-key")
+    events = [_event(1, "a"), _event(2, "b", action="grant", payload=[{"type": "currency"}])]
+
+    async def fake_claim(session, *, limit):
+        assert limit == 10
+        return events
+
+    monkeypatch.setattr(roblox_service, "claim_sync_events", fake_claim)
+
+    async with fake.client() as client:
+        claimed = await roblox_service.dispatch_sync_events(client)
+
+    assert claimed == 2
+    assert [event["id"] for event in fake.events] == [1, 2]
+    assert fake.events[1]["payload"] == [{"type": "currency"}]
+    (statement,) = scoped_sessions[-1].executed_statements
+    params = statement.compile().params
+    assert params["status"] == "delivered"
+    assert params["response"] == {
+        "status_code": 200,
+        "body": {"path": "/sync", "accepted": [1, 2]},
+    }
+
+
+@pytest.mark.anyio("asyncio")
+async def test_dispatch_failure_backs_off_and_fails_exhausted_rows(
+    monkeypatch, sync_settings, scoped_sessions
+):
+    fake = FakeOpenCloud(api_key="cloud-key")
+    fake.fail_next = 1
+    events = [_event(1, "a", attempts=1), _event(2, "b", attempts=3)]
+
+    async def fake_claim(session, *, limit):
+        return events
+
+    monkeypatch.setattr(roblox_service, "claim_sync_events", fake_claim)
+
+    async with fake.client() as client:
+        await roblox_service.dispatch_sync_events(client)
+
+    assert fake.batches == []
+    discard, retry, exhausted = (
+        stmt.compile().params for stmt in scoped_sessions[-1].executed_statements
+    )
+    assert discard["status"] == "discarded"
+    assert retry["status"] == "pending"
+    assert exhausted["status"] == "failed"
+    assert retry["response"]["status_code"] == 503
+    assert retry["last_error"] == "Roblox responded with HTTP 503"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_dispatch_failure_discards_superseded_progress_rows(
+    sqlite_sessions, monkeypatch, sync_settings
+):
+    scope = make_session_scope(sqlite_sessions)
+    monkeypatch.setattr(roblox_service, "session_scope", scope)
+    async with scope() as session:
+        session.add_all(
+            [
+                _event(1, "a", status="sending"),
+                _event(2, "b", status="sending"),
+                _event(3, "a", status="pending", attempts=0),
+            ]
+        )
+
+    async def fake_claim(session, *, limit):
+        return [_event(1, "a", status="sending"), _event(2, "b", status="sending")]
+
+    monkeypatch.setattr(roblox_service, "claim_sync_events", fake_claim)
+    fake = FakeOpenCloud(api_key="cloud-key")
+    fake.fail_next = 1
+
+    async with fake.client() as client:
+        await roblox_service.dispatch_sync_events(client)
+    async with scope() as session:
+        rows = (
+            await session.execute(
+                select(RobloxSyncEvent.id, RobloxSyncEvent.status).order_by(RobloxSyncEvent.id)
+            )
+        ).all()
+
+    assert [tuple(row) for row in rows] == [
+        (1, "discarded"),
+        (2, "pending"),
+        (3, "pending"),
+    ]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_compaction_deletes_delivered_rows_in_chunks(monkeypatch):
+    sessions = [
+        FakeAsyncSession(execute_results=[[(1,), (2,)]]),
+        FakeAsyncSession(execute_results=[[]]),
+    ]
+    monkeypatch.setattr(roblox_service, "session_scope", make_async_session_stub(*sessions))
+
+    compacted = await roblox_service.compact_sync_events(
+        retention=timedelta(hours=24), batch_size=2, now=NOW
+    )
+
+    assert compacted == 2
+    compiled = sessions[0].executed_statements[0].compile(dialect=postgresql.dialect())
+    assert "FOR UPDATE SKIP LOCKED" in str(compiled)
+    assert compiled.params["updated_at_1"] == NOW - timedelta(hours=24)
+    assert sessions[1].executed_statements
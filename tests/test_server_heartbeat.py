@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.routers import game
+from backend.services import server_roster
+from tests.conftest import FakeAsyncSession
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def memory_roster(monkeypatch):
+    monkeypatch.setattr(
+        server_roster, "get_settings", lambda: SimpleNamespace(servers_heartbeat_ttl_seconds=90)
+    )
+    monkeypatch.setattr(
+        game, "get_settings", lambda: SimpleNamespace(servers_heartbeat_ttl_seconds=90)
+    )
+    roster = server_roster._MemoryRoster()
+    monkeypatch.setattr(server_roster, "_backend", roster)
+    return roster
+
+
+@pytest.mark.anyio("asyncio")
+async def test_sessions_are_extended_with_one_upsert():
+    session = FakeAsyncSession()
+
+    await server_roster.touch_player_sessions(
+        session, "job-1", ["10", "11", "10"], now=NOW, ttl=timedelta(seconds=90)
+    )
+
+    assert len(session.executed_statements) == 1
+    compiled = session.executed_statements[0].compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert sql.startswith("INSERT INTO player_sessions")
+    assert "ON CONFLICT (roblox_user_id) DO UPDATE" in sql
+    assert "CASE WHEN (player_sessions.last_seen_at <" in sql
+    assert "EXTRACT(epoch FROM excluded.last_seen_at - player_sessions.started_at)" in sql
+    assert compiled.params["roblox_user_id_m0"] == "10"
+    assert compiled.params["roblox_user_id_m1"] == "11"
+    assert "roblox_user_id_m2" not in compiled.params
+    assert NOW - timedelta(seconds=90) in compiled.params.values()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_empty_server_writes_no_sessions():
+    session = FakeAsyncSession()
+
+    await server_roster.touch_player_sessions(
+        session, "job-1", [], now=NOW, ttl=timedelta(seconds=90)
+    )
+
+    assert session.executed_statements == []
+
+
+@pytest.mark.anyio("asyncio")
+async def test_heartbeat_updates_roster_and_sessions(memory_roster):
+    session = FakeAsyncSession()
+    payload = game.ServerHeartbeatRequest(
+        job_id="job-1", server="server-1", roblox_user_ids=["10", "11", "11"]
+    )
+
+    response = await game.server_heartbeat(payload, session)
+    await game.server_heartbeat(
+        game.ServerHeartbeatRequest(job_id="job-2", server="server-1", roblox_user_ids=["12"]),
+        FakeAsyncSession(),
+    )
+    await game.server_heartbeat(
+        game.ServerHeartbeatRequest(job_id="job-3", server="server-2", roblox_user_ids=[]),
+        FakeAsyncSession(),
+    )
+
+    assert response == {"status": "ok", "players": 2}
+    assert len(session.executed_statements) == 1
+    assert await server_roster.online_counts() == {"server-1": 3, "server-2": 0}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_repeated_heartbeat_replaces_job_entry(memory_roster):
+    for players in (["10", "11"], ["10"]):
+        await game.server_heartbeat(
+            game.ServerHeartbeatRequest(job_id="job-1", server="server-1", roblox_user_ids=players),
+            FakeAsyncSession(),
+        )
+
+    assert await server_roster.online_counts() == {"server-1": 1}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_closing_heartbeat_removes_job(memory_roster):
+    await game.server_heartbeat(
+        game.ServerHeartbeatRequest(job_id="job-1", server="server-1", roblox_user_ids=["10"]),
+        FakeAsyncSession(),
+    )
+    session = FakeAsyncSession()
+
+    response = await game.server_heartbeat(
+        game.ServerHeartbeatRequest(job_id="job-1", server="server-1", closing=True), session
+    )
+
+    assert response == {"status": "ok", "players": 0}
+    assert session.executed_statements == []
+    assert await server_roster.online_counts() == {}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_roster_entries_expire(monkeypatch):
+    roster = server_roster._MemoryRoster()
+    clock = [1000.0]
+    monkeypatch.setattr(server_roster.time, "monotonic", lambda: clock[0])
+
+    await roster.put("job-1", "server-1", 5, 90)
+    await roster.put("job-2", "server-1", 2, 30)
+    clock[0] += 60
+
+    assert await roster.counts() == {"server-1": 5}
+    clock[0] += 60
+    assert await roster.counts() == {}
+
+
+def test_heartbeat_rejects_oversized_player_list():
+    with pytest.raises(ValueError):
+        game.ServerHeartbeatRequest(
+            job_id="job-1",
+            server="server-1",
+            roblox_user_ids=[str(index) for index in range(game.MAX_ONLINE_PLAYERS + 1)],
+        )
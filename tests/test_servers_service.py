@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from unittest.mock import AsyncMock
+
 import pytest
 
 from bot.services import servers as servers_service
@@ -24,15 +26,32 @@ async def test_get_ordered_servers_returns_sorted(monkeypatch):
     monkeypatch.setattr(
         servers_service, "async_session", make_async_session_stub(session)
     )
+    monkeypatch.setattr(servers_service, "online_counts", AsyncMock(return_value={}))
 
     result = await servers_service.get_ordered_servers()
 
     assert [entry.id for entry in result] == [1, 2]
+    assert [entry.online for entry in result] == [None, None]
     assert result[0].url is None
     assert result[1].url == "https://two.example"
     assert result[1].closed_message == "Закрыто"
 
 
+@pytest.mark.anyio("asyncio")
+async def test_get_ordered_servers_adds_live_counts(monkeypatch):
+    session = FakeAsyncSession(scalars_results=[[_make_server(1), _make_server(2)]])
+    monkeypatch.setattr(
+        servers_service, "async_session", make_async_session_stub(session)
+    )
+    counts = AsyncMock(return_value={"server-1": 12})
+    monkeypatch.setattr(servers_service, "online_counts", counts)
+
+    result = await servers_service.get_ordered_servers()
+
+    assert [entry.online for entry in result] == [12, 0]
+    counts.assert_awaited_once()
+
+
 @pytest.mark.anyio("asyncio")
 async def test_get_server_by_id_returns_closed_message(monkeypatch):
     server = _make_server(5, url=None, closed=SERVER_DEFAULT_CLOSED_MESSAGE)
@@ -58,4 +77,20 @@ async def test_get_server_by_id_handles_missing(monkeypatch):
 
     result = await servers_service.get_server_by_id(123)
 
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+@pytest.mark.anyio("asyncio")
+async def test_online_counts_need_the_shared_redis_roster(monkeypatch):
+    read = AsyncMock(return_value={"server-1": 4})
+    monkeypatch.setattr(servers_service, "read_online_counts", read)
+    monkeypatch.setattr(servers_service, "_redis", None)
+    monkeypatch.setattr(servers_service, "REDIS_URL", "")
+
+    assert await servers_service.online_counts() == {}
+    read.assert_not_awaited()
+
+    redis = object()
+    monkeypatch.setattr(servers_service, "_redis", redis)
+
+    assert await servers_service.online_counts() == {"server-1": 4}
+    read.assert_awaited_once_with(redis)
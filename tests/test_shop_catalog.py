@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from bot.handlers.user import shop
+from bot.services import shop_catalog
+
+from tests.conftest import FakeAsyncSession
+
+
+def _product(product_id: int, item_type: str, price: int):
+    return SimpleNamespace(
+        id=product_id, name=f"P{product_id}", price=price, item_type=item_type
+    )
+
+
+PRODUCTS = [_product(1, "item", 10), _product(2, "privilege", 20), _product(3, "item", 30)]
+
+
+@pytest.fixture
+def catalog_sessions(monkeypatch):
+    sessions: list[FakeAsyncSession] = []
+
+    def factory():
+        session = FakeAsyncSession(scalars_results=[PRODUCTS])
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(shop_catalog, "async_session", factory)
+    monkeypatch.setattr(shop_catalog, "_catalog", shop_catalog._CatalogCache())
+    monkeypatch.setattr(shop_catalog, "_redis", None)
+    monkeypatch.setattr(shop_catalog, "REDIS_URL", "")
+    return sessions
+
+
+def _message():
+    return SimpleNamespace(answer=AsyncMock())
+
+
+@pytest.mark.anyio("asyncio")
+async def test_shop_views_are_served_from_one_snapshot(catalog_sessions):
+    first = _message()
+    await shop.user_shop(first, "item")
+    second = _message()
+    await shop.user_shop(second, "item")
+    everything = _message()
+    await shop.user_shop(everything)
+
+    assert len(catalog_sessions) == 1
+    markup = first.answer.await_args.kwargs["reply_markup"]
+    assert second.answer.await_args.kwargs["reply_markup"] is markup
+    assert [row[0].callback_data for row in markup.inline_keyboard] == [
+        "user_buy:1",
+        "user_buy:3",
+    ]
+    assert len(everything.answer.await_args.kwargs["reply_markup"].inline_keyboard) == 3
+
+
+@pytest.mark.anyio("asyncio")
+async def test_empty_category_has_no_keyboard(catalog_sessions):
+    message = _message()
+
+    await shop.user_shop(message, "money")
+
+    message.answer.assert_awaited_once_with("📦 В этой категории пока пусто.")
+
+
+@pytest.mark.anyio("asyncio")
+async def test_rebuild_reloads_and_publishes(catalog_sessions, monkeypatch):
+    redis = SimpleNamespace(publish=AsyncMock())
+    monkeypatch.setattr(shop_catalog, "_redis", redis)
+    await shop_catalog.get_shop_catalog()
+
+    await shop_catalog.rebuild_shop_catalog()
+    await shop_catalog.get_shop_catalog()
+
+    assert len(catalog_sessions) == 2
+    redis.publish.assert_awaited_once_with(
+        shop_catalog.CATALOG_CHANNEL, shop_catalog._INSTANCE_ID
+    )
+
+
+@pytest.mark.anyio("asyncio")
+async def test_only_foreign_invalidations_drop_the_snapshot(catalog_sessions):
+    await shop_catalog.get_shop_catalog()
+
+    shop_catalog._handle_invalidation({"data": shop_catalog._INSTANCE_ID})
+    await shop_catalog.get_shop_catalog()
+    assert len(catalog_sessions) == 1
+
+    shop_catalog._handle_invalidation({"data": "other-process"})
+    await shop_catalog.get_shop_catalog()
+    assert len(catalog_sessions) == 2
+
+
+@pytest.mark.anyio("asyncio")
+async def test_snapshot_expires_after_ttl(catalog_sessions, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(shop_catalog.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(shop_catalog, "SHOP_CATALOG_TTL_SECONDS", 60)
+    await shop_catalog.get_shop_catalog()
+
+    clock[0] += 59
+    await shop_catalog.get_shop_catalog()
+    clock[0] += 1
+    await shop_catalog.get_shop_catalog()
+
+    assert len(catalog_sessions) == 2
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import hmac
+import json
+from hashlib import sha256
+from types import SimpleNamespace
+from typing import Annotated
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from backend import security
+
+SECRET = "pipeline-secret"
+
+
+class Echo(BaseModel):
+    name: str
+    count: int
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        security,
+        "get_settings",
+        lambda: SimpleNamespace(hmac_secret=SECRET, max_request_body_bytes=64),
+    )
+    router = APIRouter(default_response_class=ORJSONResponse)
+
+    @router.post("/echo")
+    async def echo(payload: Annotated[Echo, Depends(security.signed_body(Echo))]):
+        return {"name": payload.name, "count": payload.count}
+
+    app = FastAPI()
+    app.include_router(router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _signed(body: bytes) -> dict:
+    return {"X-Signature": hmac.new(SECRET.encode(), body, sha256).hexdigest()}
+
+
+@pytest.mark.anyio("asyncio")
+async def test_signed_body_verifies_and_parses_the_same_bytes(client):
+    body = json.dumps({"name": "bob", "count": 2}).encode()
+
+    async with client:
+        ok = await client.post("/echo", content=body, headers=_signed(body))
+        forged = await client.post("/echo", content=body, headers=_signed(b"other"))
+        unsigned = await client.post("/echo", content=body)
+
+    assert ok.status_code == 200
+    assert ok.headers["content-type"] == "application/json"
+    assert ok.json() == {"name": "bob", "count": 2}
+    assert forged.status_code == 401
+    assert unsigned.json()["detail"] == "Missing HMAC signature"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_signed_body_rejects_invalid_and_oversized_bodies(client):
+    invalid = json.dumps({"name": "bob"}).encode()
+    oversized = json.dumps({"name": "b" * 80, "count": 1}).encode()
+
+    async with client:
+        unprocessable = await client.post("/echo", content=invalid, headers=_signed(invalid))
+        too_large = await client.post("/echo", content=oversized, headers=_signed(oversized))
+
+    assert unprocessable.status_code == 422
+    assert unprocessable.json()["detail"][0]["loc"] == ["body", "count"]
+    assert too_large.status_code == 413
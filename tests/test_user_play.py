@@ -42,6 +42,27 @@ async def test_open_play_menu_builds_inline_keyboard(monkeypatch, message_factor
     assert second_button.callback_data == "server_closed:2"
 
 
+@pytest.mark.anyio("asyncio")
+async def test_open_play_menu_shows_live_counts(monkeypatch, message_factory, mock_state):
+    servers = [
+        ServerInfo(id=1, name="Сервер 1", url="https://one.example", closed_message=None, online=12),
+        ServerInfo(id=2, name="Сервер 2", url=None, closed_message=None, online=0),
+    ]
+    monkeypatch.setattr(
+        user_menu,
+        "get_ordered_servers",
+        AsyncMock(return_value=servers),
+    )
+
+    message = message_factory(text="🎮 Играть")
+    await user_menu.open_play_menu(message, mock_state)
+
+    _, params = message.answers[-1]
+    rows = params["reply_markup"].inline_keyboard
+    assert rows[0][0].text == "Сервер 1 · 12 онлайн"
+    assert rows[1][0].text == "Сервер 2 · 0 онлайн"
+
+
 @pytest.mark.anyio("asyncio")
 async def test_open_play_menu_handles_empty_list(monkeypatch, message_factory, mock_state):
     monkeypatch.setattr(
@@ -1,8 +1,10 @@
+import asyncio
 from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 import pytest
 
+from bot.db import Product, User
 from bot.handlers.user import shop
 
 from tests.conftest import FakeAsyncSession, make_async_session_stub
@@ -58,10 +60,11 @@ async def test_user_buy_finish_logs_root_notification_failure(
         referral_bonus=0,
         server_id=1,
     )
-    user = SimpleNamespace(id=3, tg_id=55, nuts_balance=200, discount=0)
+    user = User(id=3, tg_id=55, nuts_balance=200, discount=0)
 
     session = FakeAsyncSession(
         scalar_results=[product, user, None],
+        execute_results=[[(3, 55, 100)]],
     )
     monkeypatch.setattr(shop, "async_session", make_async_session_stub(session))
     monkeypatch.setattr(shop, "Purchase", DummyPurchase)
@@ -154,3 +157,96 @@ async def test_user_buy_finish_grants_referral_bonus_without_lazy_load(
     assert kwargs["user"] is referrer_user
     assert kwargs["amount"] == product.referral_bonus
     assert any("реферер получил" in text for text, _ in call.message.answers)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_user_buy_finish_answers_when_a_concurrent_spend_wins(
+    monkeypatch, callback_query_factory
+):
+    product = SimpleNamespace(
+        id=12,
+        name="Hat",
+        price=100,
+        item_type="item",
+        value="hat",
+        status="active",
+        per_user_limit=None,
+        stock_limit=None,
+        referral_bonus=0,
+        server_id=1,
+    )
+    user = User(id=6, tg_id=42, nuts_balance=100, discount=0)
+
+    # The debit UPDATE matches no row; the follow-up lookup finds the user.
+    session = FakeAsyncSession(scalar_results=[product, user, user.id])
+    monkeypatch.setattr(shop, "async_session", make_async_session_stub(session))
+    monkeypatch.setattr(shop, "Purchase", DummyPurchase)
+    check_mock = AsyncMock()
+    monkeypatch.setattr(shop, "check_achievements", check_mock)
+
+    call = callback_query_factory("user_buy_ok:12", from_user_id=user.tg_id)
+
+    await shop.user_buy_finish(call)
+
+    assert call.answers == [("❌ Не хватает валюты!", True)]
+    assert session.committed is False
+    check_mock.assert_not_awaited()
+
+
+@pytest.fixture
+async def shop_db(sqlite_sessions):
+    session_factory = sqlite_sessions
+    async with session_factory() as session:
+        session.add_all(
+            [User(id=index, bot_user_id=str(index), tg_id=100 + index) for index in range(1, 7)]
+        )
+        session.add(
+            Product(
+                id=1,
+                slug="vip",
+                name="VIP",
+                item_type="privilege",
+                price=10,
+                per_user_limit=2,
+                stock_limit=3,
+            )
+        )
+        await session.commit()
+    return session_factory
+
+
+async def _reserve(session_factory, user_id: int):
+    async with session_factory() as session:
+        user = await session.get(User, user_id)
+        product = await session.get(Product, 1)
+        error = await shop._reserve_purchase_limits(session, user, product)
+        if error is None:
+            await session.commit()
+    return error
+
+
+@pytest.mark.anyio("asyncio")
+async def test_reserve_purchase_limits_enforces_per_user_limit(shop_db):
+    assert await _reserve(shop_db, 1) is None
+    assert await _reserve(shop_db, 1) is None
+    assert await _reserve(shop_db, 1) == "⚠️ Вы достигли лимита покупок этого товара"
+
+    async with shop_db() as session:
+        user = await session.get(User, 1)
+        product = await session.get(Product, 1)
+        assert product.sold_count == 2
+        assert await shop._check_purchase_limits(session, user, product) == (
+            "⚠️ Вы достигли лимита покупок этого товара"
+        )
+        other = await session.get(User, 2)
+        assert await shop._check_purchase_limits(session, other, product) is None
+
+
+@pytest.mark.anyio("asyncio")
+async def test_reserve_purchase_limits_never_oversells(shop_db):
+    errors = await asyncio.gather(*(_reserve(shop_db, user_id) for user_id in range(1, 7)))
+
+    assert errors.count(None) == 3
+    assert set(errors) == {None, "❌ Этот товар распродан"}
+    async with shop_db() as session:
+        assert (await session.get(Product, 1)).sold_count == 3
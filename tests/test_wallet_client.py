@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from bot.services import wallet
+from bot.services.wallet import (
+    CircuitBreaker,
+    WalletPayClient,
+    WalletPayError,
+    WalletPayUnavailableError,
+    close_wallet_client,
+)
+
+ORDER = {
+    "invoiceId": "inv-1",
+    "payLink": "https://t.me/wallet/start?startapp=inv-1",
+    "status": "ACTIVE",
+    "amount": "1.5",
+    "currencyCode": "TON",
+    "expiresAt": "2026-03-01T12:00:00Z",
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_wallet_state(monkeypatch):
+    monkeypatch.setattr(wallet, "_http_client", None)
+    monkeypatch.setattr(wallet, "_semaphores", {})
+    monkeypatch.setattr(wallet, "_breakers", {})
+
+
+def _client(handler, **kwargs) -> WalletPayClient:
+    kwargs.setdefault("backoff_seconds", 0)
+    return WalletPayClient(
+        api_base="https://wallet.test",
+        api_key="key",
+        store_id=kwargs.pop("store_id", "store"),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        **kwargs,
+    )
+
+
+async def _create(client: WalletPayClient, order_id: str = "order-1"):
+    return await client.create_invoice(
+        external_invoice_id=order_id,
+        amount=Decimal("1.5"),
+        currency_code="TON",
+        description="Top-up",
+        expires_in=3600,
+        customer_telegram_id=100,
+    )
+
+
+@pytest.mark.anyio("asyncio")
+async def test_retries_throttling_and_server_errors_with_the_same_order():
+    responses = iter(
+        [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(503),
+            httpx.Response(200, json=ORDER),
+        ]
+    )
+    order_ids = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        order_ids.append(request.read())
+        return next(responses)
+
+    invoice = await _create(_client(handler))
+
+    assert invoice.provider_invoice_id == "inv-1"
+    assert invoice.status == "active"
+    assert len(order_ids) == 3 and len(set(order_ids)) == 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, text="bad amount")
+
+    with pytest.raises(WalletPayError, match="400: bad amount"):
+        await _create(_client(handler))
+
+    assert len(calls) == 1
+    assert wallet._store_breaker("store").state == "closed"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_gives_up_after_max_retries_and_keeps_the_cause():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    with pytest.raises(WalletPayError, match="Cannot reach") as excinfo:
+        await _create(_client(handler, max_retries=2))
+
+    assert isinstance(excinfo.value.__cause__, httpx.ConnectError)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_open_breaker_rejects_without_a_request():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(502)
+
+    client = _client(handler, max_retries=10)
+    with pytest.raises(WalletPayUnavailableError):
+        await _create(client)
+    assert len(calls) == CircuitBreaker().failure_threshold
+
+    with pytest.raises(WalletPayUnavailableError):
+        await _create(client, "order-2")
+    assert len(calls) == CircuitBreaker().failure_threshold
+
+
+def test_half_open_breaker_lets_one_probe_through(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(wallet.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 30
+    breaker.before_call()
+    with pytest.raises(WalletPayUnavailableError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_store_semaphore_caps_in_flight_requests():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=ORDER)
+
+    clients = [_client(handler, max_concurrency=3) for _ in range(2)]
+    await asyncio.gather(
+        *(_create(clients[index % 2], f"order-{index}") for index in range(12))
+    )
+
+    assert peak == 3
+
+
+@pytest.mark.anyio("asyncio")
+async def test_clients_share_one_pool_until_closed():
+    first = WalletPayClient(api_base="https://wallet.test", api_key="key", store_id="a")
+    second = WalletPayClient(api_base="https://wallet.test", api_key="key", store_id="b")
+
+    assert first._http is second._http
+    assert first._breaker is not second._breaker
+
+    await close_wallet_client()
+
+    assert first._http.is_closed
+    assert WalletPayClient(
+        api_base="https://wallet.test", api_key="key", store_id="a"
+    )._http is not first._http
+
+
+@pytest.mark.anyio("asyncio")
+async def test_cancelled_probe_releases_the_half_open_breaker(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(wallet.time, "monotonic", lambda: clock[0])
+    started = asyncio.Event()
+    responses = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if not responses:
+            responses.append("hang")
+            started.set()
+            await asyncio.sleep(3600)
+        return httpx.Response(200, json=ORDER)
+
+    client = _client(handler, max_retries=0)
+    breaker = wallet._store_breaker("store")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    clock[0] += breaker.reset_timeout
+
+    probe = asyncio.create_task(_create(client))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == "open"
+    clock[0] += breaker.reset_timeout
+    invoice = await _create(client, "order-2")
+    assert invoice.provider_invoice_id == "inv-1"
+    assert breaker.state == "closed"